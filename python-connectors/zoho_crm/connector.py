@@ -6,10 +6,27 @@ from dataiku.connector import Connector
 from safe_logger import SafeLogger
 from plugin_details import get_initialization_string
 from zoho_client import ZohoClient
-from zoho_common import get_zoho_token, RecordsLimit
+from zoho_common import get_zoho_token, get_zoho_token_refresher, get_state_directory, get_state_key, RecordsLimit
+from zoho_state_store import ZohoStateStore
+from zoho_checkpoint import ZohoCheckpoint
+from zoho_crm_incremental import ZohoCRMIncrementalSync, DELETED_COLUMN, DELETED_TIME_COLUMN
+from zoho_crm_bulk_read import ZohoCRMBulkReader, get_record_count, DEFAULT_BULK_THRESHOLD
+from zoho_crm_metadata import ZohoCRMMetadata, MAX_FIELDS_PER_REQUEST
+from zoho_crm_field_groups import ZohoCRMFieldGroupReader, get_field_groups, MAX_IDS_PER_REQUEST
+from zoho_crm_partitioning import (
+    ZohoCRMCOQLReader, get_partitioning_schema, get_month_partition_criteria,
+    get_month_partition_ids, get_next_row_in_parallel
+)
 
 
 logger = SafeLogger("zoho CRM", ["password", "zoho_oauth"])
+DEFAULT_PREFETCH_DEPTH = 2
+ENDPOINTS = {
+    "contacts": {"endpoint": "Contacts", "data_path": ["data"], "params": {"fields": "Last_Name,Email"}, "is_module": True},
+    "apis": {"endpoint": "__apis", "data_path": ["__apis"], "params": {}},
+    "users": {"endpoint": "users", "data_path": ["users"], "params": {}},
+    "events": {"endpoint": "Events", "data_path": ["data"], "params": {"fields": "Owner,Venue,Description"}, "is_module": True}
+}
 
 """
 A custom Python dataset is a subclass of Connector.
@@ -32,12 +49,34 @@ class ZohoCRMConnector(Connector):
         object 'plugin_config' to the constructor
         """
         Connector.__init__(self, config, plugin_config)  # pass the parameters to the base class
-        logger.info("Starting Zoho Workdrive FS with config={}".format(logger.filter_secrets(config)))
-        logger.info("{}".format(get_initialization_string()))
+        logger.info("Starting Zoho CRM connector", config=config)
+        logger.info(get_initialization_string())
         # perform some more initialization
         self.table = self.config.get("table", "users")
         access_token = get_zoho_token(config)
-        self.client = ZohoClient(access_token=access_token, endpoint="crm")
+        self.client = ZohoClient(
+            access_token=access_token,
+            endpoint="crm",
+            pool_size=self.config.get("connection_pool_size"),
+            token_refresher=get_zoho_token_refresher(config),
+            rate_limit=self.config.get("rate_limit"),
+            rate_limit_burst=self.config.get("rate_limit_burst")
+        )
+        self.prefetch_depth = self.config.get("prefetch_depth", DEFAULT_PREFETCH_DEPTH)
+        self.partitioning = self.config.get("partitioning", "none")
+        self.partition_workers = self.config.get("partition_workers", 1)
+        self.sync_mode = self.config.get("sync_mode", "full")
+        self.is_resumable = self.config.get("resumable", False)
+        self.read_mode = self.config.get("read_mode", "rest")
+        self.bulk_threshold = self.config.get("bulk_threshold") or DEFAULT_BULK_THRESHOLD
+        self.configured_fields = self.config.get("fields")
+        self.endpoint = get_endpoint(self.table)
+        self.coql_reader = ZohoCRMCOQLReader(self.client)
+        self.metadata = ZohoCRMMetadata(self.client)
+        self.metrics_file = self.config.get("metrics_file")
+
+    def is_partitionable(self):
+        return self.endpoint.get("is_module", False)
 
     def get_read_schema(self):
         """
@@ -59,9 +98,40 @@ class ZohoCRMConnector(Connector):
         Supported types are: string, int, bigint, float, double, date, boolean
         """
 
-        # In this example, we don't specify a schema here, so DSS will infer the schema
-        # from the columns actually returned by the generate_rows method
-        return None
+        if not self.is_partitionable():
+            # users and __apis are not modules, DSS infers their schema
+            return None
+        schema = self.metadata.get_schema(self.endpoint.get("endpoint"), field_names=self.get_fields())
+        if self.sync_mode == "incremental":
+            schema["columns"].append({"name": DELETED_COLUMN, "type": "boolean"})
+            schema["columns"].append({"name": DELETED_TIME_COLUMN, "type": "date"})
+        return schema
+
+    def get_fields(self, dataset_schema=None):
+        """
+        Fields requested from the module: the dataset columns if known,
+        then the fields set by the user, the default fields of the table, or every field of the module
+        """
+        if not self.is_partitionable():
+            return None
+        module_field_names = self.metadata.get_field_names(self.endpoint.get("endpoint"))
+        if dataset_schema and dataset_schema.get("columns"):
+            column_names = [column.get("name") for column in dataset_schema.get("columns")]
+            fields = [field_name for field_name in module_field_names if field_name in column_names]
+            if fields:
+                return fields
+        fields = self.configured_fields or self.endpoint.get("params", {}).get("fields")
+        if fields:
+            return [field.strip() for field in fields.split(",") if field.strip()]
+        return module_field_names
+
+    def get_endpoint_with_fields(self, fields):
+        endpoint = dict(self.endpoint)
+        params = dict(endpoint.get("params", {}))
+        if fields:
+            params["fields"] = ",".join(fields)
+        endpoint["params"] = params
+        return endpoint
 
     def generate_rows(self, dataset_schema=None, dataset_partitioning=None,
                       partition_id=None, records_limit=-1):
@@ -74,17 +144,121 @@ class ZohoCRMConnector(Connector):
         The dataset schema and partitioning are given for information purpose.
         """
         limit = RecordsLimit(records_limit)
-        endpoints = {
-            "contacts": {"endpoint": "Contacts", "data_path": ["data"], "params": {"fields": "Last_Name,Email"}},
-            "apis": {"endpoint": "__apis", "data_path": ["__apis"], "params": {}},
-            "users": {"endpoint": "users", "data_path": ["users"], "params": {}},
-            "events": {"endpoint": "Events", "data_path": ["data"], "params": {"fields": "Owner,Venue,Description"}}
-        }
-        endpoint = endpoints.get(self.table, {})
-        for item in self.client.client.get_next_row(endpoint.get("endpoint"), data_path=endpoint.get("data_path"), params=endpoint.get("params")):
-            yield item
-            if limit.is_reached():
-                break
+        incremental_sync = None
+        fields = self.get_fields(dataset_schema)
+        if partition_id:
+            rows = self.get_next_row_from_partition(partition_id, fields)
+        elif self.sync_mode == "incremental" and self.is_partitionable():
+            # Modified_Time is added to the requested fields
+            field_groups = get_field_groups(fields, MAX_FIELDS_PER_REQUEST - 1)
+            incremental_sync = ZohoCRMIncrementalSync(
+                self.client.client,
+                ZohoStateStore(get_state_directory(self.config), "crm_sync"),
+                self.table,
+                self.get_endpoint_with_fields(field_groups[0]),
+                prefetch_depth=self.prefetch_depth,
+                state_key=self.get_state_key()
+            )
+            rows = self.get_next_row_with_all_fields(incremental_sync.get_next_row(), field_groups)
+        elif self.should_use_bulk_read(records_limit, fields):
+            # Bulk read has no limit on the number of fields, unlike the other APIs
+            rows = ZohoCRMBulkReader(self.client).get_next_row(
+                self.endpoint.get("endpoint"),
+                fields=fields,
+                checkpoint=self.get_checkpoint(records_limit, {"api": "bulk", "fields": fields})
+            )
+        elif self.is_partitionable() and self.partition_workers and self.partition_workers > 1:
+            rows = self.get_next_row_from_all_partitions(fields)
+        else:
+            field_groups = get_field_groups(fields)
+            endpoint = self.get_endpoint_with_fields(field_groups[0])
+            rows = self.get_next_row_with_all_fields(self.client.client.get_next_row(
+                endpoint.get("endpoint"),
+                data_path=endpoint.get("data_path"),
+                params=endpoint.get("params"),
+                prefetch_depth=self.prefetch_depth,
+                checkpoint=self.get_checkpoint(records_limit, endpoint.get("params"))
+            ), field_groups)
+        is_complete = True
+        try:
+            for item in rows:
+                yield item
+                if limit.is_reached():
+                    is_complete = False
+                    break
+            if incremental_sync and is_complete:
+                # Only a complete read moves the sync mark forward, not a preview
+                incremental_sync.commit()
+        finally:
+            self.client.client.metrics.log_summary(export_path=self.metrics_file)
+
+    def get_next_row_with_all_fields(self, rows, field_groups):
+        """
+        Completes rows read with the first group of fields with the fields of the other groups
+        """
+        if len(field_groups) < 2:
+            return rows
+        logger.info("%s fields requested, %s more requests per %s records", sum(len(fields) for fields in field_groups),
+                    len(field_groups) - 1, MAX_IDS_PER_REQUEST)
+        return ZohoCRMFieldGroupReader(self.client.client, self.endpoint.get("endpoint"), field_groups[1:]).get_next_row(rows)
+
+    def get_state_key(self, **key):
+        return get_state_key(
+            self.config,
+            self.metadata.get_current_user_id(),
+            table=self.table,
+            endpoint=self.endpoint.get("endpoint"),
+            **key
+        )
+
+    def get_checkpoint(self, records_limit, params):
+        if not self.is_resumable or records_limit != -1:
+            # A preview must neither resume a previous read nor leave a checkpoint behind
+            return None
+        return ZohoCheckpoint(
+            ZohoStateStore(get_state_directory(self.config), "crm_checkpoint"),
+            # The pages saved are only valid for the same requested fields
+            self.get_state_key(params=params)
+        )
+
+    def should_use_bulk_read(self, records_limit, fields):
+        if not self.is_partitionable() or self.read_mode == "rest":
+            return False
+        if self.read_mode == "bulk":
+            return True
+        if records_limit != -1:
+            # Previews and samples are faster through the records API
+            return False
+        if fields and len(fields) > MAX_FIELDS_PER_REQUEST:
+            logger.info("%s fields requested, more than the records API allows", len(fields))
+            return True
+        record_count = get_record_count(self.client, self.endpoint.get("endpoint"))
+        logger.info("%s records in %s, bulk read threshold is %s", record_count, self.table, self.bulk_threshold)
+        return record_count > self.bulk_threshold
+
+    def get_next_row_from_partition(self, partition_id, fields):
+        logger.info("Reading partition %s", partition_id)
+        field_groups = get_field_groups(fields)
+        return self.get_next_row_with_all_fields(self.coql_reader.get_next_row(
+            self.endpoint.get("endpoint"),
+            field_groups[0],
+            criteria=get_month_partition_criteria(partition_id)
+        ), field_groups)
+
+    def get_next_row_from_all_partitions(self, fields):
+        partition_ids = self.list_month_partitions()
+        logger.info("Reading %s partitions with %s threads", len(partition_ids), self.partition_workers)
+
+        def get_row_generator_factory(partition_id):
+            return lambda: self.get_next_row_from_partition(partition_id, fields)
+        return get_next_row_in_parallel(
+            [get_row_generator_factory(partition_id) for partition_id in partition_ids],
+            max_workers=self.partition_workers
+        )
+
+    def list_month_partitions(self):
+        oldest_modified_time = self.coql_reader.get_oldest_modified_time(self.endpoint.get("endpoint"))
+        return get_month_partition_ids(oldest_modified_time)
 
     def get_writer(self, dataset_schema=None, dataset_partitioning=None,
                    partition_id=None):
@@ -101,11 +275,15 @@ class ZohoCRMConnector(Connector):
         """
         Return the partitioning schema that the connector defines.
         """
+        if self.partitioning == "modified_month" and self.is_partitionable():
+            return get_partitioning_schema()
         raise NotImplementedError
 
     def list_partitions(self, partitioning):
         """Return the list of partitions for the partitioning scheme
         passed as parameter"""
+        if self.partitioning == "modified_month" and self.is_partitionable():
+            return self.list_month_partitions()
         return []
 
     def partition_exists(self, partitioning, partition_id):
@@ -114,7 +292,7 @@ class ZohoCRMConnector(Connector):
         Implementation is only required if the corresponding flag is set to True
         in the connector definition
         """
-        raise NotImplementedError
+        return partition_id in self.list_partitions(partitioning)
 
     def get_records_count(self, partitioning=None, partition_id=None):
         """
@@ -126,6 +304,14 @@ class ZohoCRMConnector(Connector):
         raise NotImplementedError
 
 
+def get_endpoint(table):
+    endpoint = ENDPOINTS.get(table)
+    if endpoint:
+        return endpoint
+    # Any other table is the API name of a module
+    return {"endpoint": table, "data_path": ["data"], "params": {}, "is_module": True}
+
+
 class CustomDatasetWriter(object):
     def __init__(self):
         pass
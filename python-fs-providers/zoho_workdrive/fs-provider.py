@@ -1,14 +1,29 @@
 from dataiku.fsprovider import FSProvider
 from zoho_client import ZohoClient
-from zoho_common import get_zoho_token
+from api_client import MAX_ERROR_CONTENT_LENGTH
+from zoho_common import get_zoho_token, get_zoho_token_refresher, get_state_directory
+from zoho_chunk_uploader import ZohoChunkUploader, UPLOAD_URL, DEFAULT_UPLOAD_WORKERS, DEFAULT_CHUNK_RETRIES
+from zoho_workdrive_enumerator import ZohoWorkDriveEnumerator, DEFAULT_ENUMERATION_WORKERS
+from zoho_cache import LRUCache, DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL
+from zoho_metadata_index import ZohoMetadataIndex, get_modified_time
+from zoho_content_cache import ZohoContentCache
+from zoho_mutation_batch import TRASHED_STATUS
+from zoho_workdrive_snapshot import get_workdrive_snapshot
+import hashlib
 import os
 import shutil
-from io import BytesIO
+import tempfile
 from safe_logger import SafeLogger
 from plugin_details import get_initialization_string
 
 
 logger = SafeLogger("zoho workdrive", ["password", "zoho_oauth"])
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 1048576
+DEFAULT_FOLDER_INDEX_CACHE_SIZE = 100
+DEFAULT_UPLOAD_SPOOL_SIZE = 8388608
+COPY_BUFFER_SIZE = 1048576
+STREAM_UPLOAD_MAX_SIZE = 1073741824
+DEFAULT_CONTENT_CACHE_SIZE_MB = 1024
 
 
 class ZohoWorkDriveFSProvider(FSProvider):
@@ -18,15 +33,60 @@ class ZohoWorkDriveFSProvider(FSProvider):
         :param config: the dict of the configuration of the object
         :param plugin_config: contains the plugin settings
         """
-        logger.info("Starting Zoho Workdrive FS with config={}".format(logger.filter_secrets(config)))
-        logger.info("{}".format(get_initialization_string()))
+        logger.info("Starting Zoho Workdrive FS", config=config)
+        logger.info(get_initialization_string())
         if len(root) > 0 and root[0] == '/':
             root = root[1:]
         self.root = root
         self.provider_root = "/"
         access_token = get_zoho_token(config)
-        self.client = ZohoClient(access_token=access_token, endpoint="workdrive")
+        self.path_cache = None
+        self.folder_index_cache = None
+        path_cache_ttl = config.get("path_cache_ttl", DEFAULT_CACHE_TTL)
+        if path_cache_ttl:
+            self.path_cache = LRUCache(
+                max_size=config.get("path_cache_size", DEFAULT_CACHE_SIZE),
+                ttl=path_cache_ttl
+            )
+            self.folder_index_cache = LRUCache(
+                max_size=DEFAULT_FOLDER_INDEX_CACHE_SIZE,
+                ttl=path_cache_ttl
+            )
         self.folder_id = config.get("folder_id", "me")
+        self.config = config
+        self.metadata_index = None
+        self.incremental_enumeration = config.get("incremental_enumeration", False)
+        self.account_id = None
+        # Incremental enumerations rely on the index to only list the folders modified since the last one
+        if config.get("metadata_index", False) or self.incremental_enumeration:
+            self.metadata_index = ZohoMetadataIndex(
+                get_metadata_index_path(config, self.folder_id),
+                validation_ttl=path_cache_ttl
+            )
+        self.client = ZohoClient(
+            access_token=access_token,
+            endpoint="workdrive",
+            path_cache=self.path_cache,
+            folder_index_cache=self.folder_index_cache,
+            pool_size=config.get("connection_pool_size"),
+            token_refresher=get_zoho_token_refresher(config),
+            metadata_index=self.metadata_index,
+            mutation_batch_size=config.get("mutation_batch_size"),
+            rate_limit=config.get("rate_limit"),
+            rate_limit_burst=config.get("rate_limit_burst")
+        )
+        self.download_chunk_size = config.get("download_chunk_size") or DEFAULT_DOWNLOAD_CHUNK_SIZE
+        self.upload_spool_size = config.get("upload_spool_size") or DEFAULT_UPLOAD_SPOOL_SIZE
+        self.upload_workers = config.get("upload_workers") or DEFAULT_UPLOAD_WORKERS
+        self.upload_chunk_retries = config.get("upload_chunk_retries", DEFAULT_CHUNK_RETRIES)
+        self.enumeration_workers = config.get("enumeration_workers") or DEFAULT_ENUMERATION_WORKERS
+        self.metrics_file = config.get("metrics_file")
+        self.content_cache = None
+        if config.get("content_cache", False):
+            self.content_cache = ZohoContentCache(
+                os.path.join(get_state_directory(config), "workdrive_content"),
+                max_size=config.get("content_cache_size", DEFAULT_CONTENT_CACHE_SIZE_MB) * 1048576
+            )
 
     def get_rel_path(self, path):
         if len(path) > 0 and path[0] == '/':
@@ -50,6 +110,16 @@ class ZohoWorkDriveFSProvider(FSProvider):
         Perform any necessary cleanup
         """
         logger.info('close')
+        if self.path_cache:
+            logger.info("close:path cache", stats=self.path_cache.get_stats())
+        if self.folder_index_cache:
+            logger.info("close:folder index", stats=self.folder_index_cache.get_stats())
+        if self.metadata_index:
+            logger.info("close:metadata index", stats=self.metadata_index.get_stats())
+            self.metadata_index.close()
+        if self.content_cache:
+            logger.info("close:content cache", stats=self.content_cache.get_stats())
+        self.client.client.metrics.log_summary(export_path=self.metrics_file)
 
     def stat(self, path):
         """
@@ -57,7 +127,7 @@ class ZohoWorkDriveFSProvider(FSProvider):
         if the object doesn't exist
         """
         full_path = self.get_full_path(path)
-        logger.info("stat:path={}, full_path={}".format(path, full_path))
+        logger.info("stat", path=path, full_path=full_path)
         item = self.client.get_item_from_path(self.folder_id, full_path)
         if not item:
             logger.info("stat:no item found")
@@ -90,7 +160,7 @@ class ZohoWorkDriveFSProvider(FSProvider):
         List the file or directory at the given path, and its children (if directory)
         """
         full_path = self.get_full_path(path)
-        logger.info("browse:path={}, full_path={}".format(path, full_path))
+        logger.info("browse", path=path, full_path=full_path)
         item = self.client.get_item_from_path(self.folder_id, full_path)
         if not item:
             logger.info("no item found")
@@ -128,7 +198,7 @@ class ZohoWorkDriveFSProvider(FSProvider):
         If the prefix doesn't denote a file or folder, return None
         """
         full_path = self.get_full_path(path)
-        logger.info("enumerate:path={}, full_path={}".format(path, full_path))
+        logger.info("enumerate", path=path, full_path=full_path)
         item = self.client.get_item_from_path(self.folder_id, full_path)
         if not item:
             return None
@@ -141,52 +211,50 @@ class ZohoWorkDriveFSProvider(FSProvider):
                 }
             ]
         else:
-            paths = self.get_all_paths(item, "", first_non_empty)
+            paths = list(self.get_next_path(item, "", first_non_empty))
+            if self.incremental_enumeration and not first_non_empty:
+                self.get_snapshot(full_path).update(paths)
         return paths
 
-    def get_all_paths(self, input_folder_id, folder_path, first_non_empty):
-        paths = []
-        for item in self.client.get_next_folder_item(input_folder_id.get("id")):
-            if is_folder(item):
-                paths = paths + self.get_all_paths(item, folder_path + "/" + item.get("attributes", {}).get("display_html_name"), first_non_empty)
-            else:
-                paths.append(
-                    {
-                        'path': "{}{}".format(folder_path, self.get_lnt_path(item.get("attributes", {}).get("display_html_name"))),
-                        'size': item_size(item),
-                        'lastModified': int(epoch_last_modified(item))
-                    }
-                )
-        return paths
+    def get_snapshot(self, full_path):
+        if self.account_id is None:
+            # Folders such as "me" are not the same for two Zoho accounts
+            self.account_id = self.client.get_current_user_id()
+            logger.info("Tracking changes", account_id=self.account_id, folder_id=self.folder_id)
+        return get_workdrive_snapshot(
+            self.folder_id, full_path, account_id=self.account_id, state_directory=get_state_directory(self.config)
+        )
+
+    def get_next_path(self, input_folder, folder_path, first_non_empty):
+        enumerator = ZohoWorkDriveEnumerator(self.client, max_workers=self.enumeration_workers)
+        for item_folder_path, item in enumerator.get_next_file(input_folder, first_non_empty):
+            yield {
+                'path': "{}{}{}".format(folder_path, item_folder_path, self.get_lnt_path(item.get("attributes", {}).get("display_html_name"))),
+                'size': item_size(item),
+                'lastModified': int(epoch_last_modified(item))
+            }
 
     def delete_recursive(self, path):
         """
         Delete recursively from path. Return the number of deleted files (optional)
         """
         full_path = self.get_full_path(path)
-        logger.info("delete_recursive:path={}, full_path={}".format(path, full_path))
+        logger.info("delete_recursive", path=path, full_path=full_path)
         item = self.client.get_item_from_path(self.folder_id, full_path)
         if not item:
             return 0
-        response = self.client.patch(
-            "files",
-            json={
-                "data": [
-                    {
-                        "attributes": {
-                            "status": "51"
-                        },
-                        "id": item.get("id"),
-                        "type": "files"
-                    }
-                ]
-            }
-        )
-        logger.info("delete_recursive:response={}".format(response))
-        if is_folder(item):
-            return 0
+        if item.get("id") == self.folder_id:
+            # The configured folder stays, only its content goes
+            items = list(self.client.get_next_folder_item(self.folder_id))
+            paths_by_id = {child.get("id"): os.path.join(full_path, child.get("attributes", {}).get("display_html_name")) for child in items}
         else:
-            return 1
+            items = [item]
+            paths_by_id = {item.get("id"): full_path}
+        try:
+            self.update_items([(child.get("id"), {"status": TRASHED_STATUS}) for child in items], paths_by_id, "delete")
+        finally:
+            self.client.invalidate_path(self.folder_id, full_path)
+        return len([child for child in items if not is_folder(child)])
 
     def move(self, from_path, to_path):
         """
@@ -194,55 +262,86 @@ class ZohoWorkDriveFSProvider(FSProvider):
         """
         full_from_path = self.get_full_path(from_path)
         full_to_path = self.get_full_path(to_path)
-        logger.info("delete_recursive:from_path={}, full_from_path={}".format(from_path, full_from_path))
+        logger.info("move", from_path=from_path, full_from_path=full_from_path)
         item_to_change = self.client.get_item_from_path(self.folder_id, full_from_path)
         if not item_to_change:
             return False
         from_base_path, from_file_name = os.path.split(full_from_path)
         to_base_path, to_file_name = os.path.split(full_to_path)
+        attributes = {}
         if from_file_name != to_file_name:
-            response = self.client.patch(
-                "files/{}".format(item_to_change.get("id")),
-                json={
-                    "data": {
-                        "attributes": {
-                            "name": "{}".format(to_file_name)
-                        },
-                        "type": "files"
-                    }
-                }
-            )
+            attributes["name"] = "{}".format(to_file_name)
         if from_base_path != to_base_path:
             to_base_path_item = self.client.get_item_from_path(self.folder_id, to_base_path)
-            response = self.client.patch(
-                "files/{}".format(item_to_change.get("id")),
-                json={
-                    "data": {
-                        "attributes": {
-                            "parent_id": "{}".format(to_base_path_item.get("id"))
-                        },
-                        "type": "files"
-                    }
-                }
-            )
-            logger.info("move:response={}".format(response))
+            attributes["parent_id"] = "{}".format(to_base_path_item.get("id"))
+        try:
+            if attributes:
+                # Rename and move go in the same update
+                self.update_items([(item_to_change.get("id"), attributes)], {item_to_change.get("id"): full_from_path}, "move")
+        finally:
+            self.client.invalidate_path(self.folder_id, full_from_path)
+            self.client.invalidate_path(self.folder_id, full_to_path)
         return True
 
+    def update_items(self, mutations, paths_by_id, action):
+        results = self.client.update_items(mutations)
+        failed_results = [result for result in results if not result.get("is_successful")]
+        if failed_results:
+            raise Exception("Could not {} {}".format(action, ", ".join(
+                "'{}' ({})".format(paths_by_id.get(result.get("id")), result.get("error")) for result in failed_results
+            )))
+
     def read(self, path, stream, limit):
         """
         Read the object denoted by path into the stream. Limit is an optional bound on the number of bytes to send
         """
         full_path = self.get_full_path(path)
-        logger.info("read:path={}, full_path={}, limit={}".format(path, full_path, limit))
+        logger.info("read", path=path, full_path=full_path, limit=limit)
         item = self.client.get_item_from_path(self.folder_id, full_path)
         if not item:
             raise Exception("Path doesn't exist")
+        if self.read_from_content_cache(item, path, stream, limit):
+            return
         download_url = "https://download.zoho.com/v1/workdrive/download/{}".format(item.get("id"))
-        data = self.client.get(None, url=download_url, raw=True)
-        file_handle = BytesIO()
-        file_handle.write(data.content)
-        file_handle.seek(0)
-        shutil.copyfileobj(file_handle, stream)
+        headers = None
+        cache_entry = None
+        if limit is not None and limit > 0:
+            headers = {"Range": "bytes=0-{}".format(limit - 1)}
+        elif self.content_cache:
+            # Only complete downloads are cached
+            cache_entry = self.content_cache.create_entry(item.get("id"), get_modified_time(item), size=item_size(item))
+        response = self.client.get(None, url=download_url, raw=True, headers=headers, stream=True)
+        try:
+            if response.status_code == 416:
+                # Range not satisfiable: the file is empty
+                logger.info("read:empty file")
+                return
+            if response.status_code >= 400:
+                raise Exception("Error {} while downloading '{}': {}".format(
+                    response.status_code, path, response.content[:MAX_ERROR_CONTENT_LENGTH]
+                ))
+            bytes_written = copy_response_to_stream(response, stream, self.download_chunk_size, limit, cache_entry=cache_entry)
+            if cache_entry:
+                cache_entry.commit()
+                cache_entry = None
+        finally:
+            response.close()
+            if cache_entry:
+                cache_entry.abort()
+        logger.info("read", path=path, bytes_written=bytes_written)
+
+    def read_from_content_cache(self, item, path, stream, limit):
+        if not self.content_cache:
+            return False
+        cached_file = self.content_cache.open(item.get("id"), get_modified_time(item))
+        if not cached_file:
+            return False
+        with cached_file:
+            chunks = iter(lambda: cached_file.read(self.download_chunk_size), b"")
+            bytes_written = copy_chunks_to_stream(chunks, stream, limit)
+        self.content_cache.record_bytes_served(bytes_written)
+        logger.info("read:from content cache", path=path, bytes_written=bytes_written)
+        return True
 
     def write(self, path, stream):
         """
@@ -250,55 +349,55 @@ class ZohoWorkDriveFSProvider(FSProvider):
         """
         full_path = self.get_full_path(path)
         full_path_parent = os.path.dirname(full_path)
-        logger.info("write:path={}, full_path={}, full_path_parent={}".format(path, full_path, full_path_parent))
+        logger.info("write", path=path, full_path=full_path, full_path_parent=full_path_parent)
         base_path, file_name = os.path.split(full_path)
         parent_item = self.client.get_item_from_path(self.folder_id, base_path)
         parent_id = parent_item.get("id")
-        bio = BytesIO()
-        shutil.copyfileobj(stream, bio)
-        buffer_size = bio.getbuffer().nbytes
-        bio.seek(0)
-        logger.info("write:buffer_size={}".format(buffer_size))
-        data = bio.read()
-        if buffer_size < 1073741824:
-            # https://github.com/rclone/rclone/issues/5995
-            url = "https://upload.zoho.com/workdrive-api/v1/stream/upload"
-            headers = {
-                'x-filename': file_name,
-                'x-parent_id': parent_id,
-                'x-streammode': '1',
-                'Content-Type': 'text/plain'
-            }
-            response = self.client.post(None, url=url, headers=headers, data=data)
-        else:
-            response = self.client.post("uploadsession/create", params={"size": buffer_size, "file_name": file_name, "parent_id": parent_id})
-            logger.info("response={}".format(response))
-            upload_id = response.get("upload_id")
-            chunk_size = response.get("chunk_size")
-            logger.info("write:upload_id={}, chunk_size={}".format(upload_id, chunk_size))
-            save_upload_offset = 0
-            while save_upload_offset < buffer_size:
-                next_save_upload_offset = save_upload_offset + chunk_size
-                if next_save_upload_offset >= buffer_size:
-                    next_save_upload_offset = buffer_size
-                response = self.client.post(
-                    None,
-                    url="https://upload.zoho.com/workdrive-api/v1/stream/upload",
-                    data=data[save_upload_offset:next_save_upload_offset],
-                    headers={
-                        "upload-id": upload_id,
-                        "Content-Range": "bytes {} - {}/{}".format(save_upload_offset, next_save_upload_offset, buffer_size),
-                        "x-streammode": "1"
-                    },
-                    raw=True
-                )
-                logger.info("upload:response={}".format(response.content))
-            response = self.client.post("uploadsession/commit", params={
-                    "upload-id": upload_id,
-                    "parent_id": parent_id
-                }
+        with tempfile.SpooledTemporaryFile(max_size=self.upload_spool_size) as spool:
+            shutil.copyfileobj(stream, spool, COPY_BUFFER_SIZE)
+            buffer_size = spool.tell()
+            spool.seek(0)
+            logger.info("write", path=path, buffer_size=buffer_size)
+            uploader = ZohoChunkUploader(
+                self.client,
+                upload_url=UPLOAD_URL,
+                max_workers=self.upload_workers,
+                max_chunk_retries=self.upload_chunk_retries
             )
-            logger.info("write:commit:response={}".format(response))
+            if buffer_size < STREAM_UPLOAD_MAX_SIZE:
+                uploader.upload_stream(spool, buffer_size, file_name, parent_id)
+            else:
+                uploader.upload_session(spool, buffer_size, file_name, parent_id)
+        self.client.invalidate_path(self.folder_id, full_path)
+
+
+def copy_response_to_stream(response, stream, chunk_size, limit=None, cache_entry=None):
+    return copy_chunks_to_stream(response.iter_content(chunk_size=chunk_size), stream, limit, cache_entry=cache_entry)
+
+
+def copy_chunks_to_stream(chunks, stream, limit=None, cache_entry=None):
+    # Stops as soon as limit bytes are written, in case the server ignored the Range header
+    bytes_written = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if limit is not None and limit > 0:
+            bytes_remaining = limit - bytes_written
+            if len(chunk) >= bytes_remaining:
+                stream.write(chunk[:bytes_remaining])
+                bytes_written += bytes_remaining
+                break
+        stream.write(chunk)
+        if cache_entry:
+            cache_entry.write(chunk)
+        bytes_written += len(chunk)
+    return bytes_written
+
+
+def get_metadata_index_path(config, folder_id):
+    # One database per root folder, so that connections to unrelated folders never share listings
+    folder_hash = hashlib.sha1("{}".format(folder_id).encode("utf-8")).hexdigest()
+    return os.path.join(get_state_directory(config), "workdrive_index_{}.sqlite".format(folder_hash))
 
 
 def item_size(item):
@@ -309,7 +408,6 @@ def item_size(item):
 
 
 def epoch_last_modified(item):
-    print("ALX:item={}".format(item))
     return int(item.get("attributes", {}).get("modified_time_in_millisecond"))
 
 
@@ -1,121 +1,241 @@
 import requests
+import threading
+import time
+import queue
 from safe_logger import SafeLogger
+from rate_limiter import is_retryable, get_retry_delay
+from json_decoder import decode_response
+from api_metrics import APIMetrics
 
 
 logger = SafeLogger("api-client")
+MAX_ERROR_CONTENT_LENGTH = 500
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
 
 
 class APIClient():
-    def __init__(self, server_url, auth, pagination=None, max_number_of_retries=None, should_fail_silently=False):
-        self.session = requests.Session()
+    def __init__(self, server_url, auth, pagination=None, max_number_of_retries=None, should_fail_silently=False,
+                 rate_limiter=None, backoff_base=None, max_backoff=None, session=None, metrics=None):
+        self.session = session or requests.Session()
         self.server_url = server_url
-        self.session.auth = auth
-        self.number_of_retries = None
+        # The session can be shared between clients, so the auth goes with each request
+        self.auth = auth
         self.page_offset = None
         self.pagination = pagination or DefaultPagination()
         self.max_number_of_retries = max_number_of_retries or 1
         self.should_fail_silently = should_fail_silently
+        self.rate_limiter = rate_limiter
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.metrics = metrics or APIMetrics(server_url)
 
-    def get(self, endpoint, url=None, params=None, raw=False):
-        if url:
-            full_url = url
-        else:
-            full_url = self.get_full_url(endpoint)
-        print("ALX:get:full_url={}".format(full_url))
-        response = None
-        while self.should_try_again(response):
-            try:
-                logger.info("geting url={}, params={}".format(full_url, params))
-                response = self.session.get(full_url, params=params)
-            except Exception as error:
-                error_message = "Error on get: {}".format(error)
-                logger.error(error_message)
-                self.raise_if_necessary(error_message)
-        display_response_error(response)
+    def get(self, endpoint, url=None, params=None, headers=None, raw=False, stream=False):
+        full_url = url or self.get_full_url(endpoint)
+        response = self.request("GET", full_url, params=params, headers=headers, stream=stream)
         if raw:
+            # Raw answers are checked by the caller, for which some error statuses are expected
             return response
-        json_response = response.json()
+        display_response_error(response)
+        if not self.is_successful(response, full_url):
+            return None
+        json_response = decode_response(response)
         return json_response
 
-    def post(self, endpoint, url=None, params=None, json=None, data=None, headers=None, raw=False):
-        if url:
-            full_url = url
-        else:
-            full_url = self.get_full_url(endpoint)
-        response = self.session.post(
-            full_url,
-            params=params,
-            json=json,
-            data=data,
-            headers=headers
+    def post(self, endpoint, url=None, params=None, json=None, data=None, headers=None, raw=False, is_idempotent=False,
+             max_number_of_retries=None):
+        full_url = url or self.get_full_url(endpoint)
+        response = self.request(
+            "POST", full_url, params=params, json=json, data=data, headers=headers,
+            is_idempotent=is_idempotent, max_number_of_retries=max_number_of_retries
         )
-        display_response_error(response)
         if raw:
             return response
-        json_response = response.json()
+        display_response_error(response)
+        if not self.is_successful(response, full_url):
+            return None
+        json_response = decode_response(response)
         return json_response
 
-    def patch(self, endpoint, url=None, params=None, json=None, data=None, headers=None, raw=False):
-        if url:
-            full_url = url
-        else:
-            full_url = self.get_full_url(endpoint)
-        response = self.session.patch(
-            full_url,
-            params=params,
-            json=json,
-            data=data,
-            headers=headers
-        )
-        display_response_error(response)
+    def patch(self, endpoint, url=None, params=None, json=None, data=None, headers=None, raw=False, is_idempotent=False):
+        full_url = url or self.get_full_url(endpoint)
+        response = self.request("PATCH", full_url, params=params, json=json, data=data, headers=headers, is_idempotent=is_idempotent)
         if raw:
             return response
-        json_response = response.json()
+        display_response_error(response)
+        if not self.is_successful(response, full_url):
+            return None
+        json_response = decode_response(response)
         return json_response
 
+    def request(self, method, full_url, is_idempotent=None, max_number_of_retries=None, **kwargs):
+        """
+        Sends the request through the shared rate limiter, and retries it on connection errors,
+        429 and 5xx answers, waiting for Retry-After or an exponential backoff with jitter.
+        Requests that are not idempotent, by default POST and PATCH, are only retried when the server
+        cannot have processed them: on 429 answers, and on errors while connecting.
+        Retry state is local so that several threads can share the client.
+        max_number_of_retries overrides the number of retries of the client for this request.
+        """
+        if is_idempotent is None:
+            is_idempotent = method in IDEMPOTENT_METHODS
+        data = kwargs.get("data")
+        body_position = get_body_position(data)
+        number_of_retries = 0
+        has_refreshed_token = False
+        # Sampled once, so that a traced request is traced through its retries
+        is_traced = logger.should_sample()
+        while True:
+            if self.rate_limiter:
+                self.metrics.record_throttle_wait(self.rate_limiter.acquire())
+            response = None
+            request_start = time.time()
+            try:
+                if is_traced:
+                    logger.debug("request", method=method, url=full_url, params=kwargs.get("params"), retry=number_of_retries)
+                response = self.session.request(method, full_url, auth=self.auth, **kwargs)
+            except Exception as error:
+                self.metrics.record_request(full_url, time.time() - request_start)
+                error_message = "Error on {} {}: {}".format(method.lower(), full_url, error)
+                logger.error(error_message)
+                if not self.should_try_again(response, number_of_retries, is_idempotent, max_number_of_retries, error=error):
+                    self.raise_if_necessary(error_message)
+                    return None
+            else:
+                self.metrics.record_request(full_url, time.time() - request_start, response, is_streamed=kwargs.get("stream"))
+                if is_traced:
+                    logger.debug("response", method=method, url=full_url, status_code=response.status_code,
+                                 elapsed=response.elapsed.total_seconds())
+                if self.rate_limiter:
+                    self.rate_limiter.update_from_headers(response.headers)
+                if response.status_code == 401 and not has_refreshed_token and self.refresh_token(response):
+                    # Replay the same request, a page being read resumes where it failed
+                    has_refreshed_token = True
+                    response.close()
+                    if body_position is not None:
+                        data.seek(body_position)
+                    continue
+                if not self.should_try_again(response, number_of_retries, is_idempotent, max_number_of_retries):
+                    return response
+            delay = get_retry_delay(response, number_of_retries, self.backoff_base, self.max_backoff)
+            if response is not None:
+                if response.status_code == 429 and self.rate_limiter:
+                    # Every thread sharing the limiter holds off, not just this one
+                    self.rate_limiter.pause(delay)
+                response.close()
+            number_of_retries += 1
+            self.metrics.record_retry(full_url)
+            if response is not None and response.status_code == 429:
+                self.metrics.record_throttle_wait(delay)
+            logger.warning("Retry %s in %.1fs", number_of_retries, delay, method=method, url=full_url)
+            time.sleep(delay)
+            if body_position is not None:
+                data.seek(body_position)
+
     def get_full_url(self, endpoint):
         full_url = "{}/{}".format(self.server_url, endpoint)
         return full_url
 
-    def get_next_row(self, endpoint, url=None, data_path=None, params=None):
-        params = params or {}
-        print("ALX:params={}".format(params))
-        response = None
-        items_retrieved = 0
-        while self.pagination.has_next_page(response, items_retrieved):
-            params = self.pagination.get_paging_parameters(params)
-            response = self.get(endpoint, url=url, params=params, raw=True)
-            print("ALX:response={}".format(response.content))
-            items_retrieved = 0
-            json_response = response.json()
-            for row in get_next_row_from_response(json_response, data_path):
-                items_retrieved += 1
+    def get_next_row(self, endpoint, url=None, data_path=None, params=None, pagination=None, prefetch_depth=None, headers=None,
+                     checkpoint=None):
+        """
+        A pagination object can be passed to paginate concurrent listings independently.
+        With a prefetch_depth, up to that many pages are fetched in a background thread
+        while the rows of the current page are being consumed.
+        With a checkpoint, the paging state is saved once the rows of each page are consumed,
+        and a read interrupted before its end resumes from the last saved page.
+        """
+        params = dict(params or {})
+        pagination = pagination or self.pagination
+        checkpoint_state = checkpoint.load() if checkpoint else None
+        checkpoint_state = checkpoint_state or {}
+        rows_emitted = checkpoint_state.get("rows_emitted", 0)
+        if checkpoint_state:
+            logger.info("Resuming from checkpoint", checkpoint=checkpoint_state)
+        pages = self.get_next_page(
+            endpoint, url, data_path, params, pagination,
+            headers=headers, pagination_state=checkpoint_state.get("pagination")
+        )
+        if prefetch_depth:
+            pages = get_prefetched(pages, prefetch_depth)
+        for rows, pagination_state in pages:
+            # Time spent in the yields is time spent by the consumer on the rows
+            consumer_start = time.time()
+            for row in rows:
                 yield row
+            self.metrics.record_consumer_wait(time.time() - consumer_start)
+            rows_emitted += len(rows)
+            if checkpoint:
+                checkpoint.save({"pagination": pagination_state, "rows_emitted": rows_emitted})
+        if checkpoint:
+            checkpoint.clear()
 
-    def should_try_again(self, response):
-        if response is not None:
-            self.number_of_retries = None
+    def get_next_page(self, endpoint, url, data_path, params, pagination, headers=None, pagination_state=None):
+        """
+        Yields the rows of each page along with the paging state needed to carry on after it
+        """
+        has_next_page = pagination.has_next_page(None, 0)
+        if pagination_state:
+            has_next_page = pagination.restore_checkpoint(pagination_state)
+        while has_next_page:
+            params = pagination.get_paging_parameters(params)
+            response = self.get(endpoint, url=url, params=params, headers=headers, raw=True)
+            if not self.is_successful(response, url or self.get_full_url(endpoint)):
+                # Parsing the error as a page would silently truncate the read
+                return
+            if response.status_code in [204, 304]:
+                # No content, or nothing modified since the If-Modified-Since header
+                return
+            # The body is parsed once, the pagination reads its paging info from the same document
+            parse_start = time.time()
+            json_response = decode_response(response)
+            rows = list(get_next_row_from_response(json_response, data_path))
+            self.metrics.record_page(response.url, len(rows), time.time() - parse_start)
+            has_next_page = pagination.has_next_page(json_response, len(rows))
+            yield rows, pagination.get_checkpoint(has_next_page)
+
+    def refresh_token(self, response):
+        if not hasattr(self.auth, "refresh"):
             return False
-        if self.number_of_retries is None:
-            logger.warning("Retrying")
-            self.number_of_retries = 1
-        else:
-            logger.warning("Retry {}".format(self.number_of_retries))
-            self.number_of_retries += 1
-        if self.number_of_retries > self.max_number_of_retries:
-            self.number_of_retries = None
+        return self.auth.refresh(response.request)
+
+    def should_try_again(self, response, number_of_retries, is_idempotent=True, max_number_of_retries=None, error=None):
+        if not is_retryable(response, is_idempotent=is_idempotent, error=error):
+            return False
+        if max_number_of_retries is None:
+            max_number_of_retries = self.max_number_of_retries
+        if number_of_retries >= max_number_of_retries:
             logger.error("Max number of retries")
             return False
         return True
 
+    def is_successful(self, response, full_url):
+        """
+        Raises when the retries ran out on an error answer, unless failing silently
+        """
+        if response is None:
+            self.raise_if_necessary("No response from {}".format(full_url))
+            return False
+        if response.status_code >= 400:
+            self.raise_if_necessary("Error {} on {}: {}".format(
+                response.status_code, full_url, response.content[:MAX_ERROR_CONTENT_LENGTH]
+            ))
+            return False
+        return True
+
     def raise_if_necessary(self, error_message):
         if self.should_fail_silently:
             return
-        else:
-            if self.max_number_of_retries == self.max_number_of_retries:
-                raise Exception(error_message)
-            else:
-                return
+        raise Exception(error_message)
+
+
+def get_body_position(data):
+    # File like bodies have to be rewound before being sent again
+    if data is not None and hasattr(data, "seek") and hasattr(data, "tell"):
+        try:
+            return data.tell()
+        except Exception:
+            return None
+    return None
 
 
 def get_next_row_from_response(response, data_path=None):
@@ -137,23 +257,74 @@ def get_next_row_from_response(response, data_path=None):
         yield data
 
 
+PREFETCH_ITEM, PREFETCH_END, PREFETCH_ERROR = range(3)
+PREFETCH_POLL_INTERVAL = 0.1
+
+
+def get_prefetched(iterator, depth):
+    """
+    Runs iterator in a background thread, keeping at most depth items ready in advance
+    """
+    prefetched_items = queue.Queue(maxsize=depth)
+    stop_event = threading.Event()
+
+    def put(kind, value=None):
+        while not stop_event.is_set():
+            try:
+                prefetched_items.put((kind, value), timeout=PREFETCH_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterator:
+                if not put(PREFETCH_ITEM, item):
+                    break
+            else:
+                put(PREFETCH_END)
+        except Exception as error:
+            put(PREFETCH_ERROR, error)
+        finally:
+            iterator.close()
+
+    producer = threading.Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            kind, value = prefetched_items.get()
+            if kind == PREFETCH_END:
+                return
+            if kind == PREFETCH_ERROR:
+                raise value
+            yield value
+    finally:
+        stop_event.set()
+
+
 class DefaultPagination():
     def __init__(self):
         # No pagination, just stops after the first page
-        logger.info("Single page pagination used")
+        logger.debug("Single page pagination used")
         pass
 
-    def has_next_page(self, response, items_retrieved):
-        logger.info("DefaultPagination:has_next_page")
-        if response is None:
-            logger.info("DefaultPagination:has_next_page initialisation")
+    def has_next_page(self, json_response, items_retrieved):
+        if json_response is None:
+            logger.debug("DefaultPagination:has_next_page initialisation")
             return True
-        logger.info("DefaultPagination:has_next_page Stop here")
+        logger.debug("DefaultPagination:has_next_page Stop here")
         return False
 
-    def get_paging_parameters(self):
-        logger.info("DefaultPagination:get_paging_parameters")
-        return {}
+    def get_paging_parameters(self, current_params):
+        return current_params
+
+    def get_checkpoint(self, has_next_page):
+        return {"has_next_page": has_next_page}
+
+    def restore_checkpoint(self, state):
+        return state.get("has_next_page", False)
 
 
 def display_response_error(response):
@@ -161,8 +332,7 @@ def display_response_error(response):
         logger.error("Empty response")
     elif isinstance(response, requests.Response):
         status_code = response.status_code
-        logger.info("status_code={}".format(status_code))
         if status_code >= 400:
-            logger.error("Error {}. Dumping response:{}".format(status_code, response.content))
+            logger.error("Error %s. Dumping response:%s", status_code, response.content, url=response.url)
     else:
         logger.error("Not a requests.Response object")
@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("api metrics")
+MAX_LATENCY_SAMPLES = 10000
+PERCENTILES = [50, 95, 99]
+ID_SEGMENT = re.compile(r"^(?=.*[0-9])[A-Za-z0-9_\-]{12,}$")
+
+
+class APIMetrics():
+    """
+    Counters and latency samples per endpoint, shared by every thread of a client.
+    Times are in seconds, sizes in bytes. Ids found in the URL paths are replaced by {id},
+    so that the calls to the same endpoint are grouped together.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.endpoints = {}
+        self.throttle_wait = 0.0
+        self.consumer_wait = 0.0
+
+    def get_endpoint_metrics(self, url):
+        endpoint_key = get_endpoint_key(url)
+        endpoint_metrics = self.endpoints.get(endpoint_key)
+        if endpoint_metrics is None:
+            endpoint_metrics = EndpointMetrics()
+            self.endpoints[endpoint_key] = endpoint_metrics
+        return endpoint_metrics
+
+    def record_request(self, url, latency, response=None, is_streamed=False):
+        with self.lock:
+            self.get_endpoint_metrics(url).add_request(latency, response, is_streamed)
+
+    def record_retry(self, url):
+        with self.lock:
+            self.get_endpoint_metrics(url).retries += 1
+
+    def record_throttle_wait(self, wait):
+        if not wait:
+            return
+        with self.lock:
+            self.throttle_wait += wait
+
+    def record_page(self, url, number_of_rows, parse_time):
+        with self.lock:
+            endpoint_metrics = self.get_endpoint_metrics(url)
+            endpoint_metrics.pages += 1
+            endpoint_metrics.rows += number_of_rows
+            endpoint_metrics.parse_time += parse_time
+
+    def record_consumer_wait(self, wait):
+        with self.lock:
+            self.consumer_wait += wait
+
+    def get_summary(self):
+        with self.lock:
+            endpoints = {
+                endpoint_key: endpoint_metrics.get_summary()
+                for endpoint_key, endpoint_metrics in self.endpoints.items()
+            }
+            return {
+                "name": self.name,
+                "duration": round(time.time() - self.start_time, 3),
+                "requests": sum(endpoint.get("requests") for endpoint in endpoints.values()),
+                "retries": sum(endpoint.get("retries") for endpoint in endpoints.values()),
+                "bytes_received": sum(endpoint.get("bytes_received") for endpoint in endpoints.values()),
+                "bytes_sent": sum(endpoint.get("bytes_sent") for endpoint in endpoints.values()),
+                "throttle_wait": round(self.throttle_wait, 3),
+                "consumer_wait": round(self.consumer_wait, 3),
+                "endpoints": endpoints
+            }
+
+    def log_summary(self, export_path=None):
+        summary = self.get_summary()
+        if not summary.get("requests"):
+            return summary
+        logger.info(
+            "summary", name=self.name, duration=summary.get("duration"), requests=summary.get("requests"),
+            retries=summary.get("retries"), bytes_received=summary.get("bytes_received"),
+            bytes_sent=summary.get("bytes_sent"), throttle_wait=summary.get("throttle_wait"),
+            consumer_wait=summary.get("consumer_wait")
+        )
+        for endpoint_key, endpoint in summary.get("endpoints").items():
+            logger.info("endpoint", endpoint=endpoint_key, **endpoint)
+        if export_path:
+            export_summary(summary, export_path)
+        return summary
+
+
+class EndpointMetrics():
+    def __init__(self):
+        self.requests = 0
+        self.status_codes = {}
+        self.errors = 0
+        self.retries = 0
+        self.pages = 0
+        self.rows = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.parse_time = 0.0
+        self.total_latency = 0.0
+        self.latencies = []
+
+    def add_request(self, latency, response, is_streamed):
+        self.requests += 1
+        self.total_latency += latency
+        self.add_latency_sample(latency)
+        if response is None:
+            self.errors += 1
+            return
+        status_code = "{}".format(response.status_code)
+        self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+        if is_streamed:
+            # The body is not read yet, and reading .content would load it in memory
+            self.bytes_received += get_content_length(response.headers)
+        else:
+            self.bytes_received += len(response.content or b"")
+        self.bytes_sent += get_content_length(response.request.headers) if response.request is not None else 0
+
+    def add_latency_sample(self, latency):
+        if len(self.latencies) < MAX_LATENCY_SAMPLES:
+            self.latencies.append(latency)
+            return
+        # Reservoir sampling keeps a uniform sample of every latency seen
+        index = random.randint(0, self.requests - 1)
+        if index < MAX_LATENCY_SAMPLES:
+            self.latencies[index] = latency
+
+    def get_summary(self):
+        summary = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "pages": self.pages,
+            "rows": self.rows,
+            "bytes_received": self.bytes_received,
+            "bytes_sent": self.bytes_sent,
+            "parse_time": round(self.parse_time, 3),
+            "total_latency": round(self.total_latency, 3),
+            "status_codes": dict(self.status_codes)
+        }
+        sorted_latencies = sorted(self.latencies)
+        for percentile in PERCENTILES:
+            summary["p{}".format(percentile)] = round(get_percentile(sorted_latencies, percentile), 3)
+        return summary
+
+
+def get_endpoint_key(url):
+    parsed_url = urlparse(url or "")
+    path_tokens = [
+        "{id}" if ID_SEGMENT.match(path_token) else path_token
+        for path_token in parsed_url.path.split("/")
+    ]
+    return "{}{}".format(parsed_url.netloc, "/".join(path_tokens))
+
+
+def get_content_length(headers):
+    try:
+        return int(headers.get("Content-Length", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return 0.0
+    # Nearest rank
+    rank = max(1, int(math.ceil(percentile / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def export_summary(summary, export_path):
+    directory = os.path.dirname(export_path) or "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=".metrics")
+        with os.fdopen(file_descriptor, "w") as file:
+            json.dump(summary, file, indent=2)
+        os.replace(temporary_path, export_path)
+        logger.info("Metrics exported", export_path=export_path)
+    except Exception as error:
+        logger.error("Could not export the metrics: %s", error, export_path=export_path)
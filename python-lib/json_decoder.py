@@ -0,0 +1,45 @@
+import json
+
+
+try:
+    import orjson
+    JSON_BACKEND = "orjson"
+except ImportError:
+    orjson = None
+    try:
+        import simdjson
+        JSON_BACKEND = "simdjson"
+    except ImportError:
+        simdjson = None
+        JSON_BACKEND = "json"
+
+
+def loads(content):
+    """
+    Parses a JSON document with the fastest backend installed, orjson then simdjson, falling back to json.
+    Bytes are parsed as they are, without being decoded to a string first.
+    """
+    if not content:
+        raise ValueError("Empty JSON document")
+    if orjson:
+        return orjson.loads(content)
+    if simdjson:
+        return simdjson.loads(content)
+    return json.loads(content)
+
+
+def decode_response(response):
+    """
+    Parses the body of a requests response once, in place of response.json()
+    """
+    try:
+        return loads(response.content)
+    except ValueError:
+        if JSON_BACKEND == "json":
+            raise
+        # Bodies that are not UTF-8 are left to the standard library, which detects their encoding
+        return response.json()
+
+
+def get_backend():
+    return JSON_BACKEND
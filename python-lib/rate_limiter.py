@@ -0,0 +1,169 @@
+import email.utils
+import random
+import requests
+import threading
+import time
+import urllib3
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("rate limiter")
+DEFAULT_RATE = 10
+DEFAULT_BURST = 20
+MINIMUM_RATE = 0.2
+RETRYABLE_STATUS_CODES = [429, 500, 502, 503, 504]
+DEFAULT_BACKOFF_BASE = 1
+DEFAULT_MAX_BACKOFF = 60
+
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name, rate=None, burst=None):
+    """
+    Returns the token bucket shared by every thread of the process for name and these limits.
+    A rate of 0 sets no limit on the client side, only the server's rate limit headers and 429 answers throttle the requests.
+    """
+    key = (name, rate, burst)
+    with rate_limiters_lock:
+        rate_limiter = rate_limiters.get(key)
+        if rate_limiter is None:
+            rate_limiter = TokenBucket(rate=rate, burst=burst, name=name)
+            rate_limiters[key] = rate_limiter
+        return rate_limiter
+
+
+class TokenBucket():
+    """
+    Token bucket refilled at rate tokens per second, up to burst tokens.
+    The rate adapts to the credits left announced by the server,
+    and the whole bucket can be paused when the server asks to retry later.
+    """
+    def __init__(self, rate=None, burst=None, name=None):
+        self.name = name
+        self.configured_rate = DEFAULT_RATE if rate is None else rate
+        self.rate = self.configured_rate
+        self.burst = burst or DEFAULT_BURST
+        self.tokens = float(self.burst)
+        self.last_refill = time.time()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+        self.total_wait = 0.0
+
+    def acquire(self):
+        """
+        Blocks until a token is available, returns the time spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.time()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif not self.rate:
+                    # No limit until the server announces one
+                    self.total_wait += waited
+                    return waited
+                else:
+                    self.refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.total_wait += waited
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def pause(self, delay):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + delay)
+            self.tokens = 0
+
+    def update_from_headers(self, headers):
+        remaining = get_int_header(headers, "X-RATELIMIT-REMAINING")
+        seconds_to_reset = get_seconds_to_reset(get_int_header(headers, "X-RATELIMIT-RESET"))
+        if remaining is None or seconds_to_reset is None:
+            return
+        if remaining <= 0:
+            logger.warning("No credit left, pausing for %.1fs", seconds_to_reset, rate_limiter=self.name)
+            self.pause(seconds_to_reset)
+            return
+        with self.lock:
+            # Spread the remaining credits over the time left before the reset
+            configured_rate = self.configured_rate or float("inf")
+            self.rate = max(MINIMUM_RATE, min(configured_rate, remaining / max(seconds_to_reset, 1.0)))
+
+
+def get_int_header(headers, name):
+    value = headers.get(name) if headers else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_seconds_to_reset(reset):
+    if reset is None:
+        return None
+    now = time.time()
+    if reset > 1e12:
+        # Epoch in milliseconds
+        return max(0.0, reset / 1000.0 - now)
+    if reset > 1e9:
+        return max(0.0, reset - now)
+    return float(reset)
+
+
+def is_retryable(response, is_idempotent=True, error=None):
+    """
+    A request that may have been processed is only sent again if doing it twice is harmless.
+    A 429 answer means the server rejected it, an error while connecting that it was never sent.
+    """
+    if response is None:
+        return is_idempotent or is_connection_error(error)
+    if is_idempotent:
+        return response.status_code in RETRYABLE_STATUS_CODES
+    return response.status_code == 429
+
+
+def is_connection_error(error):
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        # Raised by urllib3 as the reason of the MaxRetryError wrapped in the requests error
+        return isinstance(getattr(error.args[0], "reason", None), urllib3.exceptions.NewConnectionError)
+    return False
+
+
+def get_retry_delay(response, number_of_retries, backoff_base=None, max_backoff=None):
+    """
+    Retry-After when the server sends it, exponential backoff with full jitter otherwise
+    """
+    backoff_base = backoff_base or DEFAULT_BACKOFF_BASE
+    max_backoff = max_backoff or DEFAULT_MAX_BACKOFF
+    if response is not None:
+        retry_after = get_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(retry_after, max_backoff)
+        seconds_to_reset = get_seconds_to_reset(get_int_header(response.headers, "X-RATELIMIT-RESET"))
+        if response.status_code == 429 and seconds_to_reset:
+            return min(seconds_to_reset, max_backoff)
+    return random.uniform(0, min(max_backoff, backoff_base * 2 ** number_of_retries))
+
+
+def get_retry_after(retry_after):
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_date = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_date.timestamp() - time.time())
+    except Exception:
+        return None
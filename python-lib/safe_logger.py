@@ -1,10 +1,26 @@
 import logging
 import copy
+import os
+import random
+import re
 
 MESSAGE_TEMPLATE = "{} - {}"
+DEFAULT_FORBIDDEN_KEYS = [
+    "password", "zoho_oauth", "access_token", "refresh_token", "client_secret", "authorization"
+]
+SECRET_PATTERNS = [
+    (re.compile(r"(Zoho-oauthtoken|Bearer)\s+[^\s'\",}]+", re.IGNORECASE), r"\1 HASHED_SECRET"),
+    (re.compile(r"((?:access|refresh)_token['\"]?\s*[=:]\s*['\"]?)[^\s'\",&}]+", re.IGNORECASE), r"\1HASHED_SECRET")
+]
+DEBUG_SAMPLING_RATE_VARIABLE = "ZOHO_DEBUG_SAMPLING_RATE"
 
 
 class SafeLogger(object):
+    """
+    Messages are only formatted when their level is enabled: pass the values as %-style args
+    or as key=value fields, rather than formatting them beforehand.
+    Values of forbidden keys and tokens found in messages are replaced before anything is written.
+    """
     def __init__(self, name, forbiden_keys=None):
         self.name = name
         self.logger = logging.getLogger(self.name)
@@ -12,19 +28,60 @@ class SafeLogger(object):
             level=logging.INFO,
             format='{} %(levelname)s - %(message)s'.format(self.name)
         )
-        self.forbiden_keys = forbiden_keys
+        self.forbiden_keys = [key.lower() for key in (forbiden_keys or []) + DEFAULT_FORBIDDEN_KEYS]
+        self.debug_sampling_rate = get_debug_sampling_rate()
 
-    def info(self, message):
-        self.logger.info(MESSAGE_TEMPLATE.format(self.name, message))
+    def info(self, message, *args, **fields):
+        self.log(logging.INFO, message, args, fields)
 
-    def debug(self, message):
-        self.logger.debug(MESSAGE_TEMPLATE.format(self.name, message))
+    def debug(self, message, *args, **fields):
+        self.log(logging.DEBUG, message, args, fields)
 
-    def warning(self, message):
-        self.logger.warning(MESSAGE_TEMPLATE.format(self.name, message))
+    def warning(self, message, *args, **fields):
+        self.log(logging.WARNING, message, args, fields)
 
-    def error(self, message):
-        self.logger.error(MESSAGE_TEMPLATE.format(self.name, message))
+    def error(self, message, *args, **fields):
+        self.log(logging.ERROR, message, args, fields)
+
+    def is_enabled_for(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def is_debug_enabled(self):
+        return self.logger.isEnabledFor(logging.DEBUG)
+
+    def should_sample(self):
+        """
+        Draws whether the debug messages of one request are logged,
+        so that only a fraction of the requests are traced when debug is on
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return False
+        return self.debug_sampling_rate >= 1 or random.random() < self.debug_sampling_rate
+
+    def set_debug_sampling_rate(self, debug_sampling_rate):
+        self.debug_sampling_rate = debug_sampling_rate
+
+    def log(self, level, message, args, fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(level, MESSAGE_TEMPLATE.format(self.name, self.format_message(message, args, fields)))
+
+    def format_message(self, message, args, fields):
+        message = "{}".format(message)
+        if args:
+            message = message % args
+        if fields:
+            message = " ".join([message] + [
+                "{}={}".format(key, self.filter_value(key, value)) for key, value in fields.items()
+            ])
+        return filter_secrets_in_text(message)
+
+    def filter_value(self, key, value):
+        if key.lower() in self.forbiden_keys:
+            return hash(value)
+        if isinstance(value, dict):
+            return self.filter_secrets(value)
+        return value
 
     def filter_secrets(self, dictionary):
         ret = copy.deepcopy(dictionary)
@@ -35,11 +92,24 @@ class SafeLogger(object):
         for key in dictionary:
             if isinstance(dictionary[key], dict):
                 dictionary[key] = self.filter_secrets(dictionary[key])
-            if key in self.forbiden_keys:
+            if "{}".format(key).lower() in self.forbiden_keys:
                 dictionary[key] = hash(dictionary[key])
         return dictionary
 
 
+def filter_secrets_in_text(text):
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def get_debug_sampling_rate():
+    try:
+        return float(os.environ.get(DEBUG_SAMPLING_RATE_VARIABLE, 1))
+    except ValueError:
+        return 1.0
+
+
 def hash(data):
     data_type = type(data).__name__
     if data_type in ["str", "dict", "list", "unicode"]:
@@ -0,0 +1,52 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from requests import Session
+from requests.adapters import HTTPAdapter
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("session registry")
+DEFAULT_POOL_SIZE = 32
+DEFAULT_POOL_CONNECTIONS = 10
+MAX_NUMBER_OF_SESSIONS = 16
+
+sessions = OrderedDict()
+sessions_lock = threading.Lock()
+
+
+def get_session(host, access_token, pool_size=None):
+    """
+    Returns the requests session shared by every client of the process for this host and token,
+    so that kept alive connections to zohoapis.com, download.zoho.com and upload.zoho.com are reused.
+    """
+    pool_size = pool_size or DEFAULT_POOL_SIZE
+    key = (host, get_token_hash(access_token), pool_size)
+    with sessions_lock:
+        session = sessions.get(key)
+        if session is None:
+            logger.info("New session for %s with a pool of %s connections per host", host, pool_size)
+            session = build_session(pool_size)
+            sessions[key] = session
+            while len(sessions) > MAX_NUMBER_OF_SESSIONS:
+                # Sessions of expired tokens are dropped, not closed, in case a client still uses them
+                sessions.popitem(last=False)
+        sessions.move_to_end(key)
+        return session
+
+
+def build_session(pool_size):
+    session = Session()
+    # pool_block is off: a burst of threads opens extra sockets instead of waiting for a free one
+    adapter = HTTPAdapter(
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=pool_size,
+        pool_block=False
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_token_hash(access_token):
+    return hashlib.sha256("{}".format(access_token).encode("utf-8")).hexdigest()
@@ -1,22 +1,62 @@
 import requests
+import threading
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho auth")
+TOKEN_PREFIX = "Zoho-oauthtoken "
 
 
 class ZohoAuth(requests.auth.AuthBase):
-    def __init__(self, access_token=None):
-        print("ALX:access_token3={}".format(access_token))
+    def __init__(self, access_token=None, token_refresher=None):
+        """
+        :param token_refresher: optional function returning a fresh access token
+        """
         self.access_token = access_token
+        self.token_refresher = token_refresher
+        self.lock = threading.Lock()
 
     def __call__(self, request):
-        print("ALX:access_token4={}".format(self.access_token))
-        request.headers["Authorization"] = "Zoho-oauthtoken {}".format(
+        request.headers["Authorization"] = "{}{}".format(
+            TOKEN_PREFIX,
             self.access_token
         )
         request.headers["Accept"] = "application/vnd.api+json"
         # request.headers["Authorization"] = "Bearer {}".format(
         #     self.access_token
         # )
-        print("ALX:request.headers={}".format(request.headers))
         return request
 
+    def refresh(self, failed_request):
+        """
+        Gets a new token after failed_request was rejected. Threads that failed with the same token
+        wait for the first one to refresh it, and then simply replay with the new token.
+        Returns True if the request can be replayed.
+        """
+        failed_token = get_token_from_request(failed_request)
+        with self.lock:
+            if failed_token != self.access_token:
+                return True
+            if not self.token_refresher:
+                return False
+            logger.warning("Access token rejected, refreshing it")
+            try:
+                new_access_token = self.token_refresher()
+            except Exception as error:
+                logger.error("Could not refresh the access token: %s", error)
+                return False
+            if not new_access_token or new_access_token == failed_token:
+                logger.error("No new access token available")
+                return False
+            self.access_token = new_access_token
+            return True
+
+
+def get_token_from_request(request):
+    authorization = "{}".format(request.headers.get("Authorization", "")) if request is not None else ""
+    if authorization.startswith(TOKEN_PREFIX):
+        return authorization[len(TOKEN_PREFIX):]
+    return None
+
 # Get Folders List
 # https://{zohoapis_domain}/writer/api/v1/folders
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 300
+
+
+class LRUCache():
+    """
+    Size bounded, least recently used cache with a time to live on each entry.
+    Safe to share between threads.
+    """
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or DEFAULT_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else DEFAULT_CACHE_TTL
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        # Same as get, without counting towards the stats
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.time():
+                return None
+            return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.time() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_if(self, predicate):
+        with self.lock:
+            keys_to_remove = [key for key in self.entries if predicate(key)]
+            for key in keys_to_remove:
+                del self.entries[key]
+            return len(keys_to_remove)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_hit_ratio(self):
+        total = self.hits + self.misses
+        if not total:
+            return 0.0
+        return float(self.hits) / total
+
+    def get_stats(self):
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.get_hit_ratio(), 3)
+        }
@@ -0,0 +1,24 @@
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho checkpoint")
+
+
+class ZohoCheckpoint():
+    """
+    Progress of one paginated read, saved after each page so that a restarted read
+    with the same configuration carries on from there.
+    """
+    def __init__(self, state_store, key):
+        self.state_store = state_store
+        self.key = key
+
+    def load(self):
+        return self.state_store.load(self.key)
+
+    def save(self, state):
+        self.state_store.save(self.key, state)
+
+    def clear(self):
+        logger.info("Read complete, clearing checkpoint")
+        self.state_store.delete(self.key)
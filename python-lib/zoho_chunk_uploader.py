@@ -0,0 +1,147 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho chunk uploader")
+UPLOAD_URL = "https://upload.zoho.com/workdrive-api/v1/stream/upload"
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_CHUNK_RETRIES = 3
+
+
+class ZohoChunkUploader():
+    """
+    Sends the chunks of a WorkDrive upload session with a bounded pool of threads.
+    Each chunk is retried on its own, up to max_chunk_retries times with the backoff of the client,
+    and the session is only committed once every chunk is acknowledged.
+    """
+    def __init__(self, client, upload_url=None, max_workers=None, max_chunk_retries=None):
+        self.client = client
+        self.upload_url = upload_url or UPLOAD_URL
+        self.max_workers = max_workers or DEFAULT_UPLOAD_WORKERS
+        self.max_chunk_retries = max_chunk_retries if max_chunk_retries is not None else DEFAULT_CHUNK_RETRIES
+        self.file_lock = threading.Lock()
+        self.thread_data = threading.local()
+
+    def upload_stream(self, file_handle, buffer_size, file_name, parent_id):
+        """
+        Sends a file below the stream upload size limit in a single request
+        """
+        # https://github.com/rclone/rclone/issues/5995
+        headers = {
+            "x-filename": file_name,
+            "x-parent_id": parent_id,
+            "x-streammode": "1",
+            "Content-Type": "text/plain",
+            "Content-Length": str(buffer_size)
+        }
+        response = self.client.post(None, url=self.upload_url, headers=headers, data=UploadBody(file_handle, buffer_size), raw=True)
+        if response is None:
+            raise Exception("No response while uploading '{}'".format(file_name))
+        if response.status_code >= 400:
+            raise Exception("Error {} while uploading '{}': {}".format(response.status_code, file_name, response.content))
+        return response
+
+    def upload_session(self, file_handle, buffer_size, file_name, parent_id):
+        response = self.client.post("uploadsession/create", params={"size": buffer_size, "file_name": file_name, "parent_id": parent_id})
+        logger.info("upload_session:create", response=response)
+        upload_id = response.get("upload_id")
+        chunk_size = int(response.get("chunk_size"))
+        logger.info("upload_session", upload_id=upload_id, chunk_size=chunk_size, max_workers=self.max_workers)
+        self.upload_chunks(file_handle, buffer_size, chunk_size, upload_id)
+        response = self.client.post("uploadsession/commit", params={
+                "upload-id": upload_id,
+                "parent_id": parent_id
+            }
+        )
+        logger.info("upload_session:commit", response=response)
+        return response
+
+    def upload_chunks(self, file_handle, buffer_size, chunk_size, upload_id):
+        offsets = range(0, buffer_size, chunk_size)
+        failed_offsets = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.upload_chunk, file_handle, offset, chunk_size, buffer_size, upload_id): offset
+                for offset in offsets
+            }
+            for future, offset in futures.items():
+                try:
+                    future.result()
+                except Exception as error:
+                    logger.error("Chunk at offset %s failed: %s", offset, error)
+                    failed_offsets.append(offset)
+        if failed_offsets:
+            raise Exception("Upload {} failed for chunks at offsets {}".format(upload_id, sorted(failed_offsets)))
+
+    def upload_chunk(self, file_handle, offset, chunk_size, buffer_size, upload_id):
+        chunk_length = min(chunk_size, buffer_size - offset)
+        chunk_buffer = self.get_chunk_buffer(chunk_size)[:chunk_length]
+        with self.file_lock:
+            file_handle.seek(offset)
+            bytes_read = read_chunk_into(file_handle, chunk_buffer)
+        if bytes_read != chunk_length:
+            raise Exception("Could only read {} bytes out of {} at offset {}".format(bytes_read, chunk_length, offset))
+        headers = {
+            "upload-id": upload_id,
+            "Content-Range": "bytes {} - {}/{}".format(offset, offset + chunk_length, buffer_size),
+            "x-streammode": "1"
+        }
+        response = self.client.post(
+            None, url=self.upload_url, data=chunk_buffer, headers=headers, raw=True,
+            # Sending the chunk at its offset again overwrites the same bytes
+            is_idempotent=True,
+            max_number_of_retries=self.max_chunk_retries
+        )
+        if response is None:
+            raise Exception("No response")
+        if response.status_code >= 400:
+            raise Exception("Error {}: {}".format(response.status_code, response.content))
+        return offset
+
+    def get_chunk_buffer(self, chunk_size):
+        # One buffer per worker thread, reused for every chunk it sends
+        chunk_buffer = getattr(self.thread_data, "chunk_buffer", None)
+        if chunk_buffer is None or len(chunk_buffer) != chunk_size:
+            chunk_buffer = memoryview(bytearray(chunk_size))
+            self.thread_data.chunk_buffer = chunk_buffer
+        return chunk_buffer
+
+
+class UploadBody():
+    """
+    Request body reading from file_handle. requests measures a body with fileno() when it has one,
+    which makes a SpooledTemporaryFile roll over to disk, so the length is given by __len__ instead.
+    """
+    def __init__(self, file_handle, length):
+        self.file_handle = file_handle
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        return self.file_handle.read(size)
+
+    def seek(self, offset, whence=0):
+        return self.file_handle.seek(offset, whence)
+
+    def tell(self):
+        return self.file_handle.tell()
+
+
+def read_chunk_into(file_handle, buffer_view):
+    bytes_read = 0
+    buffer_length = len(buffer_view)
+    while bytes_read < buffer_length:
+        if hasattr(file_handle, "readinto"):
+            size = file_handle.readinto(buffer_view[bytes_read:])
+        else:
+            # SpooledTemporaryFile only has readinto from python 3.11
+            data = file_handle.read(buffer_length - bytes_read)
+            size = len(data)
+            buffer_view[bytes_read:bytes_read + size] = data
+        if not size:
+            break
+        bytes_read += size
+    return bytes_read
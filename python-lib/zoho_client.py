@@ -1,11 +1,25 @@
 from zoho_auth import ZohoAuth
 from zoho_workdrive_pagination import ZohoWorkdrivePagination
 from zoho_crm_pagination import ZohoCRMPagination
+from zoho_folder_index import ZohoFolderIndex
+from zoho_metadata_index import get_modified_time
+from zoho_mutation_batch import ZohoMutationBatch
 from api_client import APIClient
+from rate_limiter import get_rate_limiter
+from session_registry import get_session
+from urllib.parse import urlparse
+import threading
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho client")
+DEFAULT_MAX_NUMBER_OF_RETRIES = 5
+UNKNOWN_MODIFIED_TIME = -1
 
 
 class ZohoClient():
-    def __init__(self, access_token=None, endpoint=None):
+    def __init__(self, access_token=None, endpoint=None, path_cache=None, folder_index_cache=None, pool_size=None, token_refresher=None,
+                 metadata_index=None, mutation_batch_size=None, rate_limit=None, rate_limit_burst=None):
         endpoint = endpoint or "workdrive"
         if endpoint == "workdrive":
             pagination = ZohoWorkdrivePagination()
@@ -15,10 +29,17 @@ class ZohoClient():
             server_url = "https://www.zohoapis.com/crm/v7"
         self.client = APIClient(
             server_url=server_url,
-            auth=ZohoAuth(access_token=access_token),
+            auth=ZohoAuth(access_token=access_token, token_refresher=token_refresher),
             pagination=pagination,
-            max_number_of_retries=1
+            max_number_of_retries=DEFAULT_MAX_NUMBER_OF_RETRIES,
+            rate_limiter=get_rate_limiter(endpoint, rate=rate_limit, burst=rate_limit_burst),
+            session=get_session(urlparse(server_url).netloc, access_token, pool_size=pool_size)
         )
+        self.path_cache = path_cache
+        self.folder_index_cache = folder_index_cache
+        self.folder_index_lock = threading.Lock()
+        self.metadata_index = metadata_index
+        self.mutation_batch = ZohoMutationBatch(self, max_batch_size=mutation_batch_size)
 
     def get_item_from_path(self, root_folder_id, path):
         if path == "/":
@@ -32,12 +53,64 @@ class ZohoClient():
         next_item_id = root_folder_id
         next_item = {}
         countdown = len(path_tokens)
-        for path_token in path_tokens:
+        for index, path_token in enumerate(path_tokens):
             countdown -= 1
-            next_item = self.find_folder(next_item_id, path_token, can_be_file=(countdown == 0))
+            is_last_token = (countdown == 0)
+            cache_key = get_path_cache_key(root_folder_id, path_tokens[:index + 1])
+            cached_item = self.get_cached_item(cache_key)
+            if cached_item and (is_last_token or cached_item.get("attributes", {}).get("type") == "folder"):
+                next_item = cached_item
+            else:
+                next_item = self.find_folder(next_item_id, path_token, can_be_file=is_last_token)
+                self.set_cached_item(cache_key, next_item)
             next_item_id = next_item.get("id")
         return next_item
 
+    def get_cached_item(self, cache_key):
+        if self.path_cache is None:
+            return None
+        return self.path_cache.get(cache_key)
+
+    def peek_cached_item(self, cache_key):
+        if self.path_cache is None:
+            return {}
+        return self.path_cache.peek(cache_key) or {}
+
+    def set_cached_item(self, cache_key, item):
+        if self.path_cache is None or not item:
+            return
+        self.path_cache.set(cache_key, item)
+
+    def invalidate_path(self, root_folder_id, path):
+        """
+        Drops the cached item at path, and every cached item below it
+        """
+        path = path.rstrip("/")
+        path_tokens = path.split("/")
+        path_tokens.pop(0)
+        if path_tokens:
+            # The listing of the parent folder and of the item itself are no longer accurate
+            parent_item = self.peek_cached_item(get_path_cache_key(root_folder_id, path_tokens[:-1]))
+            parent_id = parent_item.get("id") if len(path_tokens) > 1 else root_folder_id
+            self.invalidate_folder_index(parent_id)
+            item = self.peek_cached_item(get_path_cache_key(root_folder_id, path_tokens))
+            self.invalidate_folder_index(item.get("id"))
+        else:
+            self.invalidate_folder_index(root_folder_id)
+        if self.path_cache is None:
+            return 0
+        cache_key = get_path_cache_key(root_folder_id, path_tokens)
+        folder_id, cached_path = cache_key
+
+        def is_affected(key):
+            key_folder_id, key_path = key
+            if key_folder_id != folder_id:
+                return False
+            if cached_path == "/":
+                return True
+            return key_path == cached_path or key_path.startswith(cached_path + "/")
+        return self.path_cache.invalidate_if(is_affected)
+
     def get_next_folder_item_from_path(self, root_folder_id, path):
         path_tokens = path.strip("/").split("/")
         next_folder_id = root_folder_id
@@ -52,19 +125,112 @@ class ZohoClient():
                     yield row
 
     def find_folder(self, root_folder_id, folder_name, can_be_file=False):
-        for next_item in self.get_next_folder_item(root_folder_id):
-            if not folder_name:
-                # Probably asking the root folder
+        if not folder_name:
+            # Probably asking the root folder
+            for next_item in self.get_next_folder_item(root_folder_id):
                 return next_item
-            item_type = next_item.get("attributes", {}).get("type")
-            item_name = next_item.get("attributes", {}).get("display_html_name")
-            if (item_type == "folder" or can_be_file) and item_name == folder_name:
+        else:
+            if self.is_indexed(root_folder_id):
+                next_item = self.metadata_index.find_child(root_folder_id, folder_name, can_be_file=can_be_file)
+            else:
+                folder_index = self.get_folder_index(root_folder_id)
+                try:
+                    next_item = folder_index.find(folder_name, can_be_file=can_be_file)
+                except Exception:
+                    # The next lookup lists the folder again rather than reusing a failed listing
+                    self.drop_folder_index(root_folder_id, folder_index)
+                    raise
+            if next_item:
                 return next_item
         raise Exception("Path element '{}' not found".format(folder_name))
 
+    def get_folder_index(self, folder_id):
+        if self.folder_index_cache is None:
+            return ZohoFolderIndex(self.get_next_folder_item(folder_id))
+        with self.folder_index_lock:
+            folder_index = self.folder_index_cache.get(folder_id)
+            if folder_index is None:
+                folder_index = ZohoFolderIndex(self.get_next_folder_item(folder_id))
+                self.folder_index_cache.set(folder_id, folder_index)
+        return folder_index
+
+    def drop_folder_index(self, folder_id, folder_index):
+        if self.folder_index_cache is None:
+            return
+        with self.folder_index_lock:
+            # Another thread may already have replaced it with a new listing
+            if self.folder_index_cache.peek(folder_id) is folder_index:
+                self.folder_index_cache.invalidate(folder_id)
+
+    def invalidate_folder_index(self, folder_id):
+        if not folder_id:
+            return
+        if self.metadata_index:
+            self.metadata_index.invalidate(folder_id)
+        if self.folder_index_cache is None:
+            return
+        self.folder_index_cache.invalidate(folder_id)
+
+    def is_indexed(self, folder_id):
+        if self.metadata_index is None:
+            return False
+        return self.metadata_index.is_fresh(folder_id, self.get_folder_modified_time(folder_id))
+
+    def get_folder_modified_time(self, folder_id):
+        modified_time = self.metadata_index.get_checked_modified_time(folder_id)
+        if modified_time is None:
+            try:
+                response = self.get("files/{}".format(folder_id))
+                modified_time = get_modified_time((response or {}).get("data") or {})
+            except Exception as error:
+                logger.warning("Could not get the modified time of folder %s: %s", folder_id, error)
+                modified_time = None
+            # Folders without a modified time, such as "me", are not checked again and never indexed
+            self.metadata_index.set_checked_modified_time(folder_id, UNKNOWN_MODIFIED_TIME if modified_time is None else modified_time)
+        if modified_time == UNKNOWN_MODIFIED_TIME:
+            return None
+        return modified_time
+
     def get_next_folder_item(self, folder_id):
+        if self.metadata_index is None:
+            for row in self.get_next_listed_folder_item(folder_id):
+                yield row
+            return
+        modified_time = self.get_folder_modified_time(folder_id)
+        if self.metadata_index.is_fresh(folder_id, modified_time):
+            for row in self.metadata_index.get_children(folder_id):
+                yield row
+            return
+        children = []
+        for row in self.get_next_listed_folder_item(folder_id):
+            if row.get("attributes", {}).get("type") == "folder":
+                # Just listed, so the modified time of sub folders is current and needs no extra call
+                self.metadata_index.set_checked_modified_time(row.get("id"), get_modified_time(row))
+            children.append(row)
+            yield row
+        # Only a complete listing is indexed
+        self.metadata_index.set_children(folder_id, modified_time, children)
+
+    def update_items(self, mutations):
+        """
+        Changes the attributes of several items in multi-item updates, see ZohoMutationBatch.update
+        """
+        return self.mutation_batch.update(mutations)
+
+    def get_current_user_id(self):
+        """
+        Identifies the WorkDrive user the token belongs to
+        """
+        response = self.get("users/me")
+        user_id = ((response or {}).get("data") or {}).get("id")
+        if not user_id:
+            raise Exception("Could not identify the Zoho user of the preset: {}".format(response))
+        return user_id
+
+    def get_next_listed_folder_item(self, folder_id):
         endpoint = "files/{}/files".format(folder_id)
-        for row in self.client.get_next_row(endpoint, data_path=["data"]):
+        pagination = ZohoWorkdrivePagination()
+        for row in self.client.get_next_row(endpoint, data_path=["data"], pagination=pagination):
             yield row
 
     def get_next_item(self, endpoint, ):
@@ -76,14 +242,22 @@ class ZohoClient():
         response = self.get(endpoint)
         return response
 
-    def get(self, endpoint, url=None, raw=False):
-        response = self.client.get(endpoint, url=url, raw=raw)
+    def get(self, endpoint, url=None, raw=False, params=None, headers=None, stream=False):
+        response = self.client.get(endpoint, url=url, raw=raw, params=params, headers=headers, stream=stream)
         return response
 
-    def post(self, endpoint, url=None, raw=False, params=None, data=None, json=None, headers=None):
-        response = self.client.post(endpoint, url=url, raw=raw, params=params, data=data, json=json, headers=headers)
+    def post(self, endpoint, url=None, raw=False, params=None, data=None, json=None, headers=None, is_idempotent=False,
+             max_number_of_retries=None):
+        response = self.client.post(
+            endpoint, url=url, raw=raw, params=params, data=data, json=json, headers=headers,
+            is_idempotent=is_idempotent, max_number_of_retries=max_number_of_retries
+        )
         return response
 
-    def patch(self, endpoint, url=None, raw=False, params=None, data=None, json=None, headers=None):
-        response = self.client.patch(endpoint, url=url, raw=raw, params=params, data=data, json=json, headers=headers)
+    def patch(self, endpoint, url=None, raw=False, params=None, data=None, json=None, headers=None, is_idempotent=False):
+        response = self.client.patch(endpoint, url=url, raw=raw, params=params, data=data, json=json, headers=headers, is_idempotent=is_idempotent)
         return response
+
+
+def get_path_cache_key(root_folder_id, path_tokens):
+    return (root_folder_id, "/" + "/".join(path_tokens))
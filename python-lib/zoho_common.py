@@ -1,8 +1,76 @@
+import hashlib
+import json
+import os
+import tempfile
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho common", ["zoho_oauth"])
+ZOHO_OAUTH_SECRET_KEY = "zoho_oauth"
+# Parameters that change neither what is read nor where, and secrets that must not end up in a state file name
+STATE_KEY_IGNORED_PARAMETERS = [
+    ZOHO_OAUTH_SECRET_KEY, "show_advanced_parameters", "prefetch_depth", "partition_workers", "bulk_threshold",
+    "connection_pool_size", "rate_limit", "rate_limit_burst", "metrics_file", "state_directory"
+]
+
+
 def get_zoho_token(config):
     # auth_type = config.get("auth_type", "sso")
     return config.get("zoho_oauth", {}).get("zoho_oauth")
 
 
+def get_zoho_token_refresher(config):
+    """
+    Returns a function asking DSS for the current token of the preset.
+    DSS refreshes OAuth2 credentials when they are read, so this gives a valid token once the first one expired.
+    The credential of the preset is the secret holding the token it was configured with,
+    looked up now since its value changes once refreshed.
+    """
+    access_token = get_zoho_token(config)
+    if not access_token:
+        return None
+    try:
+        secret_key = get_secret_key(get_secrets(), access_token)
+    except Exception as error:
+        logger.warning("Could not identify the credential of the preset: %s", error)
+        secret_key = None
+
+    def refresh_zoho_token():
+        return get_secret_value(get_secrets(), secret_key)
+    return refresh_zoho_token
+
+
+def get_secrets():
+    import dataiku
+    auth_info = dataiku.api_client().get_auth_info(with_secrets=True)
+    return auth_info.get("secrets", [])
+
+
+def get_secret_key(secrets, access_token):
+    for secret in secrets:
+        if secret.get("value") == access_token:
+            return secret.get("key")
+    return None
+
+
+def get_secret_value(secrets, secret_key=None):
+    """
+    Value of the secret secret_key, or of the only Zoho credential when the key is not known
+    """
+    if secret_key:
+        for secret in secrets:
+            if secret.get("key") == secret_key:
+                return secret.get("value")
+        return None
+    zoho_secrets = [
+        secret for secret in secrets
+        if "{}".format(secret.get("key", "")).split(".")[-1] == ZOHO_OAUTH_SECRET_KEY
+    ]
+    if len(zoho_secrets) != 1:
+        raise Exception("{} Zoho credentials found, cannot tell which one belongs to the preset".format(len(zoho_secrets)))
+    return zoho_secrets[0].get("value")
+
+
 class RecordsLimit():
     def __init__(self, records_limit=-1):
         self.has_no_limit = (records_limit == -1)
@@ -14,3 +82,36 @@ class RecordsLimit():
             return False
         self.counter += 1
         return self.counter > self.records_limit
+
+
+def get_state_directory(config):
+    """
+    Folder where the plugin keeps its state between runs (sync marks, checkpoints, caches...)
+    """
+    state_directory = config.get("state_directory")
+    if not state_directory:
+        base_directory = os.environ.get("DIP_HOME") or tempfile.gettempdir()
+        state_directory = os.path.join(base_directory, "tmp", "zoho-plugin")
+    os.makedirs(state_directory, exist_ok=True)
+    return state_directory
+
+
+def get_state_key(config, connection_id, **key):
+    """
+    Key of a state kept between runs. The same table read through another Zoho account,
+    from another project or with other parameters gets a state of its own.
+    """
+    state_key = dict(key)
+    state_key["connection"] = connection_id
+    state_key["project"] = os.environ.get("DKU_CURRENT_PROJECT_KEY")
+    state_key["config"] = get_config_hash(config)
+    return state_key
+
+
+def get_config_hash(config):
+    config = {
+        name: value for name, value in (config or {}).items()
+        if name not in STATE_KEY_IGNORED_PARAMETERS
+    }
+    serialized_config = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(serialized_config.encode("utf-8")).hexdigest()
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import tempfile
+import threading
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho content cache")
+DEFAULT_CONTENT_CACHE_SIZE = 1073741824
+TEMPORARY_PREFIX = ".download"
+
+
+class ZohoContentCache():
+    """
+    Size bounded cache of downloaded files on the local disk, keyed by item id and modified time,
+    so that an updated file is never served from the cache.
+    Files are written under a temporary name and renamed once complete, so several jobs can share the directory.
+    The least recently read files are evicted first, their modification time being updated on each hit.
+    """
+    def __init__(self, directory, max_size=None):
+        self.directory = directory
+        self.max_size = max_size or DEFAULT_CONTENT_CACHE_SIZE
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        self.bytes_stored = 0
+
+    def get_file_path(self, item_id, modified_time):
+        return os.path.join(self.directory, "{}_{}".format(get_item_hash(item_id), modified_time))
+
+    def open(self, item_id, modified_time):
+        """
+        Returns the cached content as a file opened for reading, or None
+        """
+        if not item_id or modified_time is None:
+            return None
+        file_path = self.get_file_path(item_id, modified_time)
+        try:
+            cached_file = open(file_path, "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            with self.lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(file_path)
+        except OSError:
+            pass
+        with self.lock:
+            self.hits += 1
+        return cached_file
+
+    def create_entry(self, item_id, modified_time, size=None):
+        if not item_id or modified_time is None:
+            return None
+        if size is not None and size > self.max_size:
+            return None
+        return ZohoContentCacheEntry(self, item_id, modified_time)
+
+    def store(self, temporary_path, item_id, modified_time, size):
+        file_path = self.get_file_path(item_id, modified_time)
+        os.replace(temporary_path, file_path)
+        with self.lock:
+            self.bytes_stored += size
+        self.remove_other_versions(item_id, file_path)
+        self.evict()
+
+    def record_bytes_served(self, size):
+        with self.lock:
+            self.bytes_served += size
+
+    def remove_other_versions(self, item_id, file_path):
+        item_prefix = "{}_".format(get_item_hash(item_id))
+        for file_name in os.listdir(self.directory):
+            other_file_path = os.path.join(self.directory, file_name)
+            if file_name.startswith(item_prefix) and other_file_path != file_path:
+                remove_file(other_file_path)
+
+    def evict(self):
+        cached_files = []
+        total_size = 0
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(TEMPORARY_PREFIX):
+                continue
+            file_path = os.path.join(self.directory, file_name)
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            cached_files.append((file_stat.st_mtime, file_stat.st_size, file_path))
+            total_size += file_stat.st_size
+        if total_size <= self.max_size:
+            return
+        for _, file_size, file_path in sorted(cached_files):
+            if total_size <= self.max_size:
+                break
+            if remove_file(file_path):
+                total_size -= file_size
+                with self.lock:
+                    self.evictions += 1
+
+    def get_stats(self):
+        with self.lock:
+            number_of_reads = self.hits + self.misses
+            return {
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bytes_served": self.bytes_served,
+                "bytes_stored": self.bytes_stored,
+                "hit_ratio": round(float(self.hits) / number_of_reads, 3) if number_of_reads else 0.0
+            }
+
+
+class ZohoContentCacheEntry():
+    """
+    Content being downloaded: written to a temporary file, and only added to the cache by commit
+    """
+    def __init__(self, content_cache, item_id, modified_time):
+        self.content_cache = content_cache
+        self.item_id = item_id
+        self.modified_time = modified_time
+        file_descriptor, self.temporary_path = tempfile.mkstemp(dir=content_cache.directory, prefix=TEMPORARY_PREFIX)
+        self.file = os.fdopen(file_descriptor, "wb")
+        self.size = 0
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self.file.close()
+        try:
+            self.content_cache.store(self.temporary_path, self.item_id, self.modified_time, self.size)
+        except Exception as error:
+            logger.warning("Could not cache item %s: %s", self.item_id, error)
+            remove_file(self.temporary_path)
+
+    def abort(self):
+        self.file.close()
+        remove_file(self.temporary_path)
+
+
+def get_item_hash(item_id):
+    return hashlib.sha1("{}".format(item_id).encode("utf-8")).hexdigest()
+
+
+def remove_file(file_path):
+    try:
+        os.remove(file_path)
+        return True
+    except OSError:
+        return False
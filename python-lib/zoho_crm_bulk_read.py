@@ -0,0 +1,197 @@
+import csv
+import io
+import random
+import sys
+import tempfile
+import time
+import zipfile
+from safe_logger import SafeLogger
+from zoho_crm_metadata import ZohoCRMMetadata
+
+
+logger = SafeLogger("zoho CRM bulk read")
+BULK_READ_URL = "https://www.zohoapis.com/crm/bulk/v7/read"
+DEFAULT_POLL_DELAY = 5
+DEFAULT_MAX_POLL_DELAY = 60
+DEFAULT_JOB_TIMEOUT = 6 * 3600
+DOWNLOAD_CHUNK_SIZE = 1048576
+DEFAULT_BULK_THRESHOLD = 100000
+JOB_COMPLETED = "COMPLETED"
+JOB_FAILED = "FAILURE"
+NUMBER_TYPES = {
+    "integer": int,
+    "bigint": int,
+    "double": float,
+    "currency": float,
+    "decimal": float,
+    "percent": float
+}
+LOOKUP_TYPES = ["lookup", "ownerlookup", "userlookup"]
+MULTI_VALUE_TYPES = ["multiselectpicklist"]
+MULTI_VALUE_SEPARATOR = ";"
+
+
+class ZohoCRMBulkReader():
+    """
+    Exports a module through the Bulk Read API: a job is created, polled until completed,
+    and its zipped CSV result is downloaded to a temporary file and parsed row by row.
+    Each job returns up to 200,000 records, so one job is created per page of results.
+    The CSV values are converted with the fields metadata, so that rows are typed as with the records API.
+    With a checkpoint, the next page is saved once the rows of each job are consumed.
+    """
+    def __init__(self, client, bulk_read_url=None, poll_delay=None, max_poll_delay=None, job_timeout=None):
+        self.client = client
+        self.metadata = ZohoCRMMetadata(client)
+        self.bulk_read_url = bulk_read_url or BULK_READ_URL
+        self.poll_delay = poll_delay or DEFAULT_POLL_DELAY
+        self.max_poll_delay = max_poll_delay or DEFAULT_MAX_POLL_DELAY
+        self.job_timeout = job_timeout or DEFAULT_JOB_TIMEOUT
+
+    def get_next_row(self, module, fields=None, checkpoint=None):
+        data_types = {field.get("api_name"): field.get("data_type") for field in self.metadata.get_fields(module)}
+        checkpoint_state = (checkpoint.load() if checkpoint else None) or {}
+        page = checkpoint_state.get("page", 1)
+        rows_emitted = checkpoint_state.get("rows_emitted", 0)
+        if checkpoint_state:
+            logger.info("Resuming from checkpoint", checkpoint=checkpoint_state)
+        while True:
+            job_id = self.create_job(module, fields, page)
+            job_result = self.wait_for_job(job_id)
+            logger.info("Job %s completed, %s records", job_id, job_result.get("count"))
+            for row in self.get_next_row_from_result(job_id):
+                rows_emitted += 1
+                yield get_typed_row(row, data_types)
+            if not job_result.get("more_records"):
+                break
+            page += 1
+            if checkpoint:
+                checkpoint.save({"page": page, "rows_emitted": rows_emitted})
+        if checkpoint:
+            checkpoint.clear()
+
+    def create_job(self, module, fields, page):
+        query = {
+            "module": {"api_name": module},
+            "page": page
+        }
+        if fields:
+            query["fields"] = get_field_list(fields)
+        response = self.client.post(None, url=self.bulk_read_url, json={"query": query})
+        try:
+            job_id = response.get("data", [])[0].get("details", {}).get("id")
+        except Exception:
+            job_id = None
+        if not job_id:
+            raise Exception("Could not create bulk read job for {}: {}".format(module, response))
+        logger.info("Job %s created for %s page %s", job_id, module, page)
+        return job_id
+
+    def wait_for_job(self, job_id):
+        delay = self.poll_delay
+        deadline = time.time() + self.job_timeout
+        while True:
+            response = self.client.get(None, url="{}/{}".format(self.bulk_read_url, job_id))
+            job = (response.get("data") or [{}])[0]
+            state = job.get("state")
+            if state == JOB_COMPLETED:
+                return job.get("result", {})
+            if state == JOB_FAILED:
+                raise Exception("Bulk read job {} failed: {}".format(job_id, job))
+            if time.time() + delay > deadline:
+                raise Exception("Bulk read job {} still {} after {}s".format(job_id, state, self.job_timeout))
+            logger.info("Job %s is %s, next check in %ss", job_id, state, delay)
+            time.sleep(delay * random.uniform(0.8, 1.2))
+            delay = min(delay * 2, self.max_poll_delay)
+
+    def get_next_row_from_result(self, job_id):
+        # The archive goes to disk: a zip can only be read once its central directory, at the end, is available
+        with tempfile.TemporaryFile() as archive_file:
+            response = self.client.get(None, url="{}/{}/result".format(self.bulk_read_url, job_id), raw=True, stream=True)
+            try:
+                if response.status_code >= 400:
+                    raise Exception("Error {} while downloading bulk read result {}".format(response.status_code, job_id))
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    archive_file.write(chunk)
+            finally:
+                response.close()
+            archive_file.seek(0)
+            for row in get_next_row_from_archive(archive_file):
+                yield row
+
+
+def get_record_count(client, module):
+    response = client.get("{}/actions/count".format(module))
+    return int(response.get("count", 0))
+
+
+def get_next_row_from_archive(archive_file):
+    set_csv_field_size_limit()
+    with zipfile.ZipFile(archive_file) as archive:
+        for file_name in archive.namelist():
+            if not file_name.lower().endswith(".csv"):
+                continue
+            with archive.open(file_name) as csv_file:
+                text_file = io.TextIOWrapper(csv_file, encoding="utf-8", newline="")
+                for row in csv.DictReader(text_file):
+                    yield row
+
+
+def set_csv_field_size_limit():
+    # Multi-line text fields can be much larger than csv's default 128 kB limit
+    field_size_limit = sys.maxsize
+    while True:
+        try:
+            csv.field_size_limit(field_size_limit)
+            return
+        except OverflowError:
+            field_size_limit = int(field_size_limit / 10)
+
+
+def get_typed_row(row, data_types):
+    """
+    Converts the text values of a CSV row to the values the records API returns.
+    Lookups are exported as their id, with their other attributes in columns such as Owner.name.
+    """
+    typed_row = {}
+    lookup_attributes = []
+    for column, value in row.items():
+        field_name, _, attribute = column.partition(".")
+        if attribute:
+            lookup_attributes.append((field_name, attribute, value))
+        elif column == "id":
+            typed_row[column] = value
+        else:
+            typed_row[column] = get_typed_value(value, data_types.get(column))
+    for field_name, attribute, value in lookup_attributes:
+        lookup = typed_row.get(field_name)
+        if isinstance(lookup, dict) and value:
+            lookup[attribute] = value
+    return typed_row
+
+
+def get_typed_value(value, data_type):
+    if value is None or value == "":
+        return None
+    if data_type in NUMBER_TYPES:
+        try:
+            return NUMBER_TYPES[data_type](value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            # Formatted numbers or text formula results are kept as they were exported rather than failing the read
+            return value
+    if data_type == "boolean":
+        return value.lower() == "true"
+    if data_type in LOOKUP_TYPES:
+        return {"id": value}
+    if data_type in MULTI_VALUE_TYPES:
+        return value.split(MULTI_VALUE_SEPARATOR)
+    return value
+
+
+def get_field_list(fields):
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return [field.strip() for field in fields if field.strip()]
@@ -0,0 +1,68 @@
+from zoho_crm_metadata import MAX_FIELDS_PER_REQUEST
+from zoho_crm_pagination import ZohoCRMPagination
+from zoho_crm_incremental import DELETED_COLUMN
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho CRM field groups")
+# Records fetched by id in one request, a divider of the page size
+# so that a page is never checkpointed before all its rows went out
+MAX_IDS_PER_REQUEST = 100
+
+
+class ZohoCRMFieldGroupReader():
+    """
+    Adds the fields that did not fit in the first request to rows read from a module.
+    The records API and COQL return at most 50 fields, the other fields are fetched
+    by record id, 100 records and 50 fields at a time, and merged into the rows.
+    """
+    def __init__(self, client, module, field_groups):
+        """
+        :param client: APIClient of the CRM
+        :param field_groups: lists of at most MAX_FIELDS_PER_REQUEST fields missing from the rows
+        """
+        self.client = client
+        self.module = module
+        self.field_groups = field_groups
+
+    def get_next_row(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == MAX_IDS_PER_REQUEST:
+                # Yielded before the next row is pulled, the page is complete downstream before being saved
+                for completed_row in self.complete(batch):
+                    yield completed_row
+                batch = []
+        for completed_row in self.complete(batch):
+            yield completed_row
+
+    def complete(self, rows):
+        rows_by_id = {
+            row.get("id"): row for row in rows
+            if row.get("id") and not row.get(DELETED_COLUMN)
+        }
+        if not rows_by_id:
+            return rows
+        record_ids = ",".join(rows_by_id.keys())
+        for fields in self.field_groups:
+            for record in self.client.get_next_row(
+                self.module,
+                data_path=["data"],
+                params={"ids": record_ids, "fields": ",".join(fields)},
+                # The read being completed is still paging with the client's own pagination
+                pagination=ZohoCRMPagination()
+            ):
+                row = rows_by_id.get(record.get("id"))
+                if row is not None:
+                    row.update(record)
+        return rows
+
+
+def get_field_groups(fields, max_number_of_fields=MAX_FIELDS_PER_REQUEST):
+    """
+    Splits the fields into groups small enough for one request, the first group being read with the records
+    """
+    if not fields:
+        return [fields]
+    return [fields[index:index + max_number_of_fields] for index in range(0, len(fields), max_number_of_fields)]
@@ -0,0 +1,106 @@
+import datetime
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho CRM incremental")
+MODIFIED_TIME_FIELD = "Modified_Time"
+DELETED_COLUMN = "zoho_deleted"
+DELETED_TIME_COLUMN = "zoho_deleted_time"
+
+
+class ZohoCRMIncrementalSync():
+    """
+    Reads only the records modified since the previous complete read of a module,
+    followed by the records deleted since then.
+    The high water mark of Modified_Time is only saved by commit, once the caller has consumed every row.
+    state_key identifies the saved mark, by default the table and module.
+    """
+    def __init__(self, client, state_store, table, endpoint, prefetch_depth=None, state_key=None):
+        self.client = client
+        self.state_store = state_store
+        self.table = table
+        self.endpoint = endpoint
+        self.prefetch_depth = prefetch_depth
+        self.state_key = state_key
+        self.high_water_mark = None
+        self.new_high_water_mark = None
+        self.is_complete = False
+
+    def get_state_key(self):
+        if self.state_key:
+            return self.state_key
+        return {"table": self.table, "endpoint": self.endpoint.get("endpoint")}
+
+    def get_next_row(self):
+        state = self.state_store.load(self.get_state_key()) or {}
+        self.high_water_mark = state.get("high_water_mark")
+        self.new_high_water_mark = self.high_water_mark
+        self.is_complete = False
+        headers = None
+        if self.high_water_mark:
+            logger.info("Reading %s records modified since %s", self.table, self.high_water_mark)
+            headers = {"If-Modified-Since": self.high_water_mark}
+        else:
+            logger.info("No previous sync for %s, reading every record", self.table)
+        module = self.endpoint.get("endpoint")
+        for row in self.client.get_next_row(
+            module,
+            data_path=self.endpoint.get("data_path"),
+            params=get_params_with_modified_time(self.endpoint.get("params")),
+            prefetch_depth=self.prefetch_depth,
+            headers=headers
+        ):
+            self.update_high_water_mark(row.get(MODIFIED_TIME_FIELD))
+            row[DELETED_COLUMN] = False
+            yield row
+        if self.high_water_mark:
+            for deleted_record in self.client.get_next_row(
+                "{}/deleted".format(module),
+                data_path=["data"],
+                params={"type": "all"},
+                headers=headers
+            ):
+                if not deleted_record.get("id"):
+                    raise Exception("Unexpected answer listing the deleted {} records: {}".format(self.table, deleted_record))
+                yield {
+                    "id": deleted_record.get("id"),
+                    DELETED_COLUMN: True,
+                    DELETED_TIME_COLUMN: deleted_record.get("deleted_time")
+                }
+        self.is_complete = True
+
+    def update_high_water_mark(self, modified_time):
+        if not modified_time:
+            return
+        if self.new_high_water_mark is None or parse_zoho_datetime(modified_time) > parse_zoho_datetime(self.new_high_water_mark):
+            self.new_high_water_mark = modified_time
+
+    def commit(self):
+        if not self.is_complete:
+            logger.warning("Read of %s did not reach its end, keeping the previous high water mark", self.table)
+            return
+        if self.new_high_water_mark == self.high_water_mark:
+            return
+        logger.info("Saving high water mark %s for %s", self.new_high_water_mark, self.table)
+        self.state_store.save(self.get_state_key(), {"high_water_mark": self.new_high_water_mark})
+
+
+def get_params_with_modified_time(params):
+    params = dict(params or {})
+    fields = params.get("fields")
+    if fields and MODIFIED_TIME_FIELD not in fields.split(","):
+        params["fields"] = "{},{}".format(fields, MODIFIED_TIME_FIELD)
+    return params
+
+
+def parse_zoho_datetime(value):
+    # Zoho sends ISO 8601 date times with their offset, such as 2024-05-02T10:11:12+05:30
+    return datetime.datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S") - get_utc_offset(value[19:])
+
+
+def get_utc_offset(suffix):
+    if not suffix or suffix == "Z":
+        return datetime.timedelta(0)
+    sign = -1 if suffix[0] == "-" else 1
+    hours, minutes = suffix[1:].split(":")
+    return sign * datetime.timedelta(hours=int(hours), minutes=int(minutes))
@@ -0,0 +1,94 @@
+import hashlib
+from zoho_cache import LRUCache
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho CRM metadata")
+DEFAULT_METADATA_TTL = 3600
+MAX_FIELDS_PER_REQUEST = 50
+DSS_TYPES = {
+    "integer": "int",
+    "bigint": "bigint",
+    "double": "double",
+    "currency": "double",
+    "decimal": "double",
+    "percent": "double",
+    "boolean": "boolean",
+    "date": "date",
+    "datetime": "date",
+    "lookup": "object",
+    "ownerlookup": "object",
+    "userlookup": "object",
+    "multiselectpicklist": "array",
+    "multiselectlookup": "array",
+    "multiuserlookup": "array",
+    "subform": "array"
+}
+
+metadata_cache = LRUCache(max_size=200, ttl=DEFAULT_METADATA_TTL)
+
+
+class ZohoCRMMetadata():
+    """
+    Modules and fields definitions of a CRM org, cached for the whole process
+    """
+    def __init__(self, client):
+        self.client = client
+        self.org_key = get_token_hash(client.client.auth)
+
+    def get_modules(self):
+        cache_key = (self.org_key, "modules")
+        modules = metadata_cache.get(cache_key)
+        if modules is None:
+            response = self.client.get("settings/modules")
+            modules = [module for module in response.get("modules", []) if module.get("api_supported", True)]
+            metadata_cache.set(cache_key, modules)
+        return modules
+
+    def get_fields(self, module):
+        cache_key = (self.org_key, "fields", module)
+        fields = metadata_cache.get(cache_key)
+        if fields is None:
+            response = self.client.get("settings/fields", params={"module": module})
+            fields = response.get("fields", [])
+            logger.info("%s fields in module %s", len(fields), module)
+            metadata_cache.set(cache_key, fields)
+        return fields
+
+    def get_current_user_id(self):
+        """
+        Identifies the Zoho account the token belongs to
+        """
+        cache_key = (self.org_key, "current_user")
+        user_id = metadata_cache.get(cache_key)
+        if user_id is None:
+            response = self.client.get("users", params={"type": "CurrentUser"})
+            users = response.get("users") or [{}]
+            user_id = users[0].get("id")
+            if not user_id:
+                raise Exception("Could not identify the Zoho user of the preset: {}".format(response))
+            metadata_cache.set(cache_key, user_id)
+        return user_id
+
+    def get_field_names(self, module):
+        return [field.get("api_name") for field in self.get_fields(module)]
+
+    def get_schema(self, module, field_names=None):
+        fields = self.get_fields(module)
+        if field_names:
+            fields_by_name = {field.get("api_name"): field for field in fields}
+            fields = [fields_by_name[field_name] for field_name in field_names if field_name in fields_by_name]
+        columns = [{"name": "id", "type": "string"}]
+        for field in fields:
+            if field.get("api_name") == "id":
+                continue
+            columns.append({
+                "name": field.get("api_name"),
+                "type": DSS_TYPES.get(field.get("data_type"), "string")
+            })
+        return {"columns": columns}
+
+
+def get_token_hash(auth):
+    access_token = getattr(auth, "access_token", None)
+    return hashlib.sha256("{}".format(access_token).encode("utf-8")).hexdigest()
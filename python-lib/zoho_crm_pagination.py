@@ -2,7 +2,8 @@ from safe_logger import SafeLogger
 
 
 logger = SafeLogger("zoho pagination", ["password"])
-DEFAULT_PAGE_SIZE = 10000
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 200
 
 
 class ZohoCRMPagination():
@@ -25,25 +26,55 @@ class ZohoCRMPagination():
         self.page_offset = None
         self.next_page_token = None
         self.page = 0
+        self.sort_by = None
+        self.sort_order = None
 
-    def has_next_page(self, response, items_retrieved):
-        if response is None:
-            logger.info("ZohoPagination:has_next_page:initialisation")
+    def has_next_page(self, json_response, items_retrieved):
+        if json_response is None:
+            logger.debug("ZohoPagination:has_next_page:initialisation")
             self.page_offset = 0
+            self.page = 0
+            self.next_page_token = None
+            self.sort_by = None
+            self.sort_order = None
             return True
-        json_response = response.json()
-        self.next_page_token = json_response.get("info", {}).get("next_page_token", None)
-        page = json_response.get("info", {}).get("page")
+        info = json_response.get("info") or {}
+        self.next_page_token = info.get("next_page_token", None)
+        self.sort_by = info.get("sort_by")
+        self.sort_order = info.get("sort_order")
+        page = info.get("page")
         if page:
             self.page = int(page)
-        return json_response.get("info", {}).get("more_records", False)
+        return info.get("more_records", False)
 
     def get_paging_parameters(self, current_params):
-        logger.info("ZohoPagination:get_paging_parameters")
-        # params = {"pageToken": "{}".format(self.next_page_token)}
+        current_params["per_page"] = min(self.batch_size, MAX_PAGE_SIZE)
+        if self.next_page_token:
+            # Page numbers stop at 2,000 records, the token goes all the way and both can't be sent together
+            current_params.pop("page", None)
+            current_params["page_token"] = self.next_page_token
+            return current_params
+        current_params.pop("page_token", None)
+        current_params.pop("page", None)
         next_page = None
         if self.page and isinstance(self.page, int):
             next_page = self.page + 1
         if next_page:
             current_params["page"] = next_page
         return current_params
+
+    def get_checkpoint(self, has_next_page):
+        return {
+            "has_next_page": has_next_page,
+            "page": self.page,
+            "next_page_token": self.next_page_token,
+            "sort_by": self.sort_by,
+            "sort_order": self.sort_order
+        }
+
+    def restore_checkpoint(self, state):
+        self.page = state.get("page", 0)
+        self.next_page_token = state.get("next_page_token")
+        self.sort_by = state.get("sort_by")
+        self.sort_order = state.get("sort_order")
+        return state.get("has_next_page", False)
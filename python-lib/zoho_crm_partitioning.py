@@ -0,0 +1,182 @@
+import datetime
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from safe_logger import SafeLogger
+from json_decoder import decode_response
+from zoho_crm_incremental import parse_zoho_datetime
+
+
+logger = SafeLogger("zoho CRM partitioning")
+MODIFIED_MONTH_DIMENSION = "modified_month"
+COQL_PAGE_SIZE = 2000
+DEFAULT_PARTITION_WORKERS = 4
+PARALLEL_BATCH_SIZE = 200
+PARALLEL_QUEUE_SIZE = 16
+PARALLEL_POLL_INTERVAL = 0.1
+
+
+class ZohoCRMCOQLReader():
+    """
+    Reads the records of a module matching a COQL criteria.
+    Pages are chained on the record id rather than on an offset, which COQL caps.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def get_next_row(self, module, fields, criteria=None):
+        select_fields = get_select_fields(fields)
+        last_id = 0
+        while True:
+            conditions = [criteria] if criteria else []
+            conditions.append("id > {}".format(last_id))
+            select_query = "select {} from {} where {} order by id asc limit {}".format(
+                ", ".join(select_fields),
+                module,
+                and_criteria(conditions),
+                COQL_PAGE_SIZE
+            )
+            rows = self.query(select_query)
+            for row in rows:
+                yield row
+            if len(rows) < COQL_PAGE_SIZE:
+                return
+            last_id = rows[-1].get("id")
+
+    def get_oldest_modified_time(self, module):
+        rows = self.query("select Modified_Time from {} where id is not null order by Modified_Time asc limit 1".format(module))
+        if not rows:
+            return None
+        return rows[0].get("Modified_Time")
+
+    def query(self, select_query):
+        logger.info("query", select_query=select_query)
+        # A query only reads, it can be sent again
+        response = self.client.post("coql", json={"select_query": select_query}, raw=True, is_idempotent=True)
+        if response.status_code == 204:
+            # No content: nothing matches the query
+            return []
+        if response.status_code >= 400:
+            raise Exception("COQL query failed with error {}: {}".format(response.status_code, response.content))
+        return decode_response(response).get("data", [])
+
+
+def get_select_fields(fields):
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    select_fields = ["id"]
+    for field in fields or []:
+        field = field.strip()
+        if field and field not in select_fields:
+            select_fields.append(field)
+    return select_fields
+
+
+def and_criteria(conditions):
+    # COQL needs parentheses as soon as more than two conditions are combined
+    criteria = conditions[0]
+    for condition in conditions[1:]:
+        criteria = "({} and {})".format(criteria, condition)
+    return criteria
+
+
+def get_partitioning_schema():
+    return {
+        "dimensions": [
+            {
+                "name": MODIFIED_MONTH_DIMENSION,
+                "type": "time",
+                "params": {"period": "MONTH"}
+            }
+        ]
+    }
+
+
+def get_month_partition_criteria(partition_id):
+    start, end = get_month_bounds(partition_id)
+    return "(Modified_Time >= '{}' and Modified_Time < '{}')".format(start, end)
+
+
+def get_month_bounds(partition_id):
+    year, month = [int(token) for token in partition_id.split("-")[:2]]
+    start = datetime.datetime(year, month, 1)
+    if month == 12:
+        end = datetime.datetime(year + 1, 1, 1)
+    else:
+        end = datetime.datetime(year, month + 1, 1)
+    return format_coql_datetime(start), format_coql_datetime(end)
+
+
+def format_coql_datetime(date_time):
+    return date_time.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def get_month_partition_ids(first_modified_time, last_date=None):
+    """
+    Lists the YYYY-MM partitions from the UTC month of first_modified_time to the month of last_date (now in UTC by default)
+    """
+    if not first_modified_time:
+        return []
+    last_date = last_date or datetime.datetime.utcnow()
+    # The partitions are UTC months, the org sends its local time
+    first_date = parse_zoho_datetime(first_modified_time)
+    year, month = first_date.year, first_date.month
+    partition_ids = []
+    while (year, month) <= (last_date.year, last_date.month):
+        partition_ids.append("{:04d}-{:02d}".format(year, month))
+        month += 1
+        if month > 12:
+            month = 1
+            year += 1
+    return partition_ids
+
+
+def get_next_row_in_parallel(row_generator_factories, max_workers=None):
+    """
+    Runs each factory's row generator in a pool of threads and yields their rows as they come.
+    The order of the rows between generators is not kept.
+    """
+    max_workers = max_workers or DEFAULT_PARTITION_WORKERS
+    batches = queue.Queue(maxsize=PARALLEL_QUEUE_SIZE)
+    stop_event = threading.Event()
+
+    def put(batch):
+        while not stop_event.is_set():
+            try:
+                batches.put(batch, timeout=PARALLEL_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(row_generator_factory):
+        batch = []
+        for row in row_generator_factory():
+            batch.append(row)
+            if len(batch) >= PARALLEL_BATCH_SIZE:
+                if not put(batch):
+                    return
+                batch = []
+        if batch:
+            put(batch)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(produce, row_generator_factory) for row_generator_factory in row_generator_factories]
+    try:
+        while True:
+            try:
+                batch = batches.get(timeout=PARALLEL_POLL_INTERVAL)
+            except queue.Empty:
+                for future in futures:
+                    if future.done() and future.exception():
+                        raise future.exception()
+                if all(future.done() for future in futures) and batches.empty():
+                    break
+                continue
+            for row in batch:
+                yield row
+    finally:
+        stop_event.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
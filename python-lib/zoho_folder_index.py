@@ -0,0 +1,49 @@
+import threading
+
+
+class ZohoFolderIndex():
+    """
+    Name to children lookup table of one WorkDrive folder.
+    The listing is consumed lazily, page by page, only until the requested name is found,
+    and every child seen on the way is indexed for the following lookups.
+    """
+    def __init__(self, next_child):
+        self.next_child = next_child
+        self.children_by_name = {}
+        self.is_complete = False
+        self.has_failed = False
+        self.lock = threading.Lock()
+
+    def find(self, name, can_be_file=False):
+        with self.lock:
+            item = self.lookup(name, can_be_file)
+            if item or self.is_complete:
+                return item
+            if self.has_failed:
+                raise Exception("Listing of the folder failed, '{}' cannot be looked up".format(name))
+            try:
+                for child in self.next_child:
+                    child_name = self.add(child)
+                    if child_name == name and is_matching(child, can_be_file):
+                        return child
+            except Exception:
+                # Only part of the children are known, a missing name does not mean it does not exist
+                self.has_failed = True
+                raise
+            self.is_complete = True
+            return None
+
+    def lookup(self, name, can_be_file):
+        for child in self.children_by_name.get(name, []):
+            if is_matching(child, can_be_file):
+                return child
+        return None
+
+    def add(self, child):
+        child_name = child.get("attributes", {}).get("display_html_name")
+        self.children_by_name.setdefault(child_name, []).append(child)
+        return child_name
+
+
+def is_matching(item, can_be_file):
+    return can_be_file or item.get("attributes", {}).get("type") == "folder"
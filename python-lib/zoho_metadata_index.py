@@ -0,0 +1,139 @@
+import json
+import sqlite3
+import threading
+import time
+from zoho_cache import LRUCache, DEFAULT_CACHE_SIZE
+from json_decoder import loads
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho metadata index")
+DATABASE_TIMEOUT = 30
+INSERT_BATCH_SIZE = 1000
+
+
+class ZohoMetadataIndex():
+    """
+    WorkDrive folder listings kept in a SQLite database, as (parent_id, name) -> item, between jobs.
+    The listing of a folder is valid as long as the folder's modified_time_in_millisecond is the one
+    it had when it was listed, so an unchanged folder costs one call to check it instead of a full listing.
+    Checked modified times are trusted for validation_ttl seconds within the process.
+    """
+    def __init__(self, database_path, validation_ttl=None):
+        self.database_path = database_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_path, timeout=DATABASE_TIMEOUT, check_same_thread=False)
+        self.create_tables()
+        self.checked_modified_times = LRUCache(max_size=DEFAULT_CACHE_SIZE, ttl=validation_ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def create_tables(self):
+        with self.lock, self.connection:
+            # Several jobs can share the database, WAL lets them read while one of them writes
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS folders ("
+                "folder_id TEXT PRIMARY KEY, modified_time INTEGER, indexed_at REAL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "parent_id TEXT, name TEXT, item_id TEXT, type TEXT, size INTEGER, modified_time INTEGER, item TEXT, "
+                "PRIMARY KEY (parent_id, name, item_id))"
+            )
+
+    def get_checked_modified_time(self, folder_id):
+        return self.checked_modified_times.get(folder_id)
+
+    def set_checked_modified_time(self, folder_id, modified_time):
+        if modified_time is None:
+            return
+        self.checked_modified_times.set(folder_id, modified_time)
+
+    def is_fresh(self, folder_id, modified_time):
+        if modified_time is None:
+            return False
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT modified_time FROM folders WHERE folder_id = ?", (folder_id,)
+            ).fetchone()
+        is_fresh = row is not None and row[0] == modified_time
+        if is_fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return is_fresh
+
+    def find_child(self, folder_id, name, can_be_file=False):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT type, item FROM items WHERE parent_id = ? AND name = ? ORDER BY rowid", (folder_id, name)
+            ).fetchall()
+        for item_type, item in rows:
+            if can_be_file or item_type == "folder":
+                return loads(item)
+        return None
+
+    def get_children(self, folder_id):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT item FROM items WHERE parent_id = ? ORDER BY rowid", (folder_id,)
+            ).fetchall()
+        return [loads(row[0]) for row in rows]
+
+    def set_children(self, folder_id, modified_time, children):
+        """
+        Replaces the indexed listing of folder_id by the complete listing children
+        """
+        if modified_time is None:
+            return
+        rows = [get_item_row(folder_id, child) for child in children]
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM items WHERE parent_id = ?", (folder_id,))
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO items (parent_id, name, item_id, type, size, modified_time, item) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows[start:start + INSERT_BATCH_SIZE]
+                )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO folders (folder_id, modified_time, indexed_at) VALUES (?, ?, ?)",
+                (folder_id, modified_time, time.time())
+            )
+
+    def invalidate(self, folder_id):
+        self.checked_modified_times.invalidate(folder_id)
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM folders WHERE folder_id = ?", (folder_id,))
+
+    def get_stats(self):
+        return {
+            "fresh_folders": self.hits,
+            "stale_folders": self.misses,
+            "checked_modified_times": self.checked_modified_times.get_stats()
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def get_item_row(parent_id, item):
+    attributes = item.get("attributes", {})
+    return (
+        parent_id,
+        attributes.get("display_html_name"),
+        item.get("id"),
+        attributes.get("type"),
+        int(attributes.get("storage_info", {}).get("size_in_bytes") or 0),
+        get_modified_time(item),
+        json.dumps(item)
+    )
+
+
+def get_modified_time(item):
+    modified_time = item.get("attributes", {}).get("modified_time_in_millisecond")
+    try:
+        return int(modified_time)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from safe_logger import SafeLogger
+from json_decoder import decode_response
+
+
+logger = SafeLogger("zoho mutation batch")
+DEFAULT_MUTATION_BATCH_SIZE = 50
+TRASHED_STATUS = "51"
+
+
+class ZohoMutationBatch():
+    """
+    Attribute changes of WorkDrive items (status, parent, name), sent in multi-item PATCH files requests
+    of up to max_batch_size items. Changes of the same item are merged into one entry,
+    so a rename and a move cost a single update.
+    """
+    def __init__(self, client, max_batch_size=None):
+        self.client = client
+        self.max_batch_size = max_batch_size or DEFAULT_MUTATION_BATCH_SIZE
+        self.lock = threading.Lock()
+        self.number_of_requests = 0
+        self.number_of_mutations = 0
+
+    def update(self, mutations):
+        """
+        Sends the (item_id, attributes) changes right away, and returns the result of each item
+        as a dict with id, is_successful and error
+        """
+        merged_mutations = OrderedDict()
+        for item_id, attributes in mutations:
+            merged_mutations.setdefault(item_id, {}).update(attributes)
+        item_ids = list(merged_mutations.keys())
+        results = []
+        for start in range(0, len(item_ids), self.max_batch_size):
+            batch = [(item_id, merged_mutations[item_id]) for item_id in item_ids[start:start + self.max_batch_size]]
+            results.extend(self.send(batch))
+        failed_results = [result for result in results if not result.get("is_successful")]
+        logger.info("update", mutations=len(results), failed=len(failed_results), requests=self.number_of_requests)
+        return results
+
+    def send(self, batch):
+        with self.lock:
+            self.number_of_requests += 1
+            self.number_of_mutations += len(batch)
+        response = self.client.patch(
+            "files",
+            json={
+                "data": [
+                    {
+                        "attributes": attributes,
+                        "id": item_id,
+                        "type": "files"
+                    } for item_id, attributes in batch
+                ]
+            },
+            raw=True
+        )
+        if response is None:
+            return [get_result(item_id, error="No response") for item_id, _ in batch]
+        try:
+            json_response = decode_response(response)
+        except ValueError:
+            json_response = {}
+        if response.status_code >= 400 and not json_response.get("data"):
+            error = get_error_message(json_response) or "Error {}".format(response.status_code)
+            return [get_result(item_id, error=error) for item_id, _ in batch]
+        return get_results(batch, json_response)
+
+
+def get_results(batch, json_response):
+    data = json_response.get("data") or []
+    if isinstance(data, dict):
+        data = [data]
+    updated_item_ids = set(item.get("id") for item in data)
+    errors_by_item_id = {}
+    for error in json_response.get("errors") or []:
+        errors_by_item_id[error.get("id")] = error.get("title") or error.get("detail") or "{}".format(error)
+    results = []
+    for item_id, _ in batch:
+        if item_id in errors_by_item_id or (updated_item_ids and item_id not in updated_item_ids):
+            results.append(get_result(item_id, error=errors_by_item_id.get(item_id, "Not updated")))
+        else:
+            results.append(get_result(item_id))
+    return results
+
+
+def get_result(item_id, error=None):
+    return {"id": item_id, "is_successful": error is None, "error": error}
+
+
+def get_error_message(json_response):
+    errors = json_response.get("errors") or []
+    if not errors:
+        return None
+    return "; ".join("{}".format(error.get("title") or error) for error in errors)
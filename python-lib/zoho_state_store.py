@@ -0,0 +1,71 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho state store")
+
+
+class ZohoStateStore():
+    """
+    Small JSON documents kept on disk between runs, one file per key.
+    Files are replaced atomically so a crashed run never leaves a half written state.
+    """
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        self.lock = threading.Lock()
+
+    def load(self, key):
+        file_path = self.get_file_path(key)
+        if not os.path.isfile(file_path):
+            return None
+        try:
+            with open(file_path, "r") as file:
+                return json.load(file)
+        except Exception as error:
+            logger.warning("Could not read state %s: %s", file_path, error)
+            return None
+
+    def save(self, key, state):
+        file_path = self.get_file_path(key)
+        with self.lock:
+            file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=".{}".format(self.prefix))
+            try:
+                with os.fdopen(file_descriptor, "w") as file:
+                    json.dump(state, file)
+                os.replace(temporary_path, file_path)
+            except Exception:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+                raise
+
+    @contextlib.contextmanager
+    def locked(self, key):
+        """
+        Holds an exclusive lock on key, shared with the other threads and jobs, around a load, change and save
+        """
+        with open("{}.lock".format(self.get_file_path(key)), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def delete(self, key):
+        file_path = self.get_file_path(key)
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+    def get_file_path(self, key):
+        return os.path.join(self.directory, "{}_{}.json".format(self.prefix, get_key_hash(key)))
+
+
+def get_key_hash(key):
+    serialized_key = json.dumps(key, sort_keys=True)
+    return hashlib.sha1(serialized_key.encode("utf-8")).hexdigest()
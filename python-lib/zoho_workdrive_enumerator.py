@@ -0,0 +1,72 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho enumerator")
+DEFAULT_ENUMERATION_WORKERS = 8
+
+
+class ZohoWorkDriveEnumerator():
+    """
+    Breadth first walk of a WorkDrive folder tree.
+    Folders of the same level are listed concurrently by a pool of threads.
+    """
+    def __init__(self, client, max_workers=None):
+        self.client = client
+        self.max_workers = max_workers or DEFAULT_ENUMERATION_WORKERS
+
+    def get_next_file(self, root_folder, first_non_empty=False):
+        """
+        Yields (folder_path, item) for every file below root_folder.
+        If first_non_empty, stops after the first file with a non zero size.
+        """
+        if first_non_empty:
+            for folder_path, item in self.get_next_file_lazily(root_folder):
+                yield folder_path, item
+                if get_item_size(item) > 0:
+                    logger.info("get_next_file:first non empty file found")
+                    return
+            return
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        pending_listings = deque()
+        number_of_folders = 0
+        try:
+            pending_listings.append(executor.submit(self.list_folder, root_folder.get("id"), ""))
+            while pending_listings:
+                folder_path, children = pending_listings.popleft().result()
+                number_of_folders += 1
+                for child in children:
+                    attributes = child.get("attributes", {})
+                    if attributes.get("type") == "folder":
+                        child_path = folder_path + "/" + attributes.get("display_html_name")
+                        pending_listings.append(executor.submit(self.list_folder, child.get("id"), child_path))
+                    else:
+                        yield folder_path, child
+        finally:
+            for pending_listing in pending_listings:
+                pending_listing.cancel()
+            executor.shutdown(wait=False)
+            logger.info("get_next_file:folders listed", number_of_folders=number_of_folders)
+
+    def get_next_file_lazily(self, root_folder):
+        # Serial walk where listing pages are only requested when the consumer gets to them,
+        # so that stopping early costs no more API calls than needed
+        pending_folders = deque([(root_folder.get("id"), "")])
+        while pending_folders:
+            folder_id, folder_path = pending_folders.popleft()
+            for child in self.client.get_next_folder_item(folder_id):
+                attributes = child.get("attributes", {})
+                if attributes.get("type") == "folder":
+                    pending_folders.append((child.get("id"), folder_path + "/" + attributes.get("display_html_name")))
+                else:
+                    yield folder_path, child
+
+    def list_folder(self, folder_id, folder_path):
+        children = list(self.client.get_next_folder_item(folder_id))
+        return folder_path, children
+
+
+def get_item_size(item):
+    size = item.get("attributes", {}).get("storage_info", {}).get("size_in_bytes")
+    return int(size or 0)
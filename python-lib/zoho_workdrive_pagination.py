@@ -11,9 +11,9 @@ class ZohoWorkdrivePagination():
         self.number_of_tries = None
         self.page_offset = None
 
-    def has_next_page(self, response, items_retrieved):
-        if response is None:
-            logger.info("ZohoPagination:has_next_page:initialisation")
+    def has_next_page(self, json_response, items_retrieved):
+        if json_response is None:
+            logger.debug("ZohoPagination:has_next_page:initialisation")
             self.page_offset = 0
             return True
         if items_retrieved == self.batch_size:
@@ -21,8 +21,15 @@ class ZohoWorkdrivePagination():
         return False
 
     def get_paging_parameters(self, current_params):
-        logger.info("ZohoPagination:get_paging_parameters")
         current_params["page[limit]"] = self.batch_size
         current_params["page[offset]"] = self.page_offset
-        self.page_offset = self.page_offset + 1
+        # The offset counts items, not pages
+        self.page_offset = self.page_offset + self.batch_size
         return current_params
+
+    def get_checkpoint(self, has_next_page):
+        return {"has_next_page": has_next_page, "page_offset": self.page_offset}
+
+    def restore_checkpoint(self, state):
+        self.page_offset = state.get("page_offset", 0)
+        return state.get("has_next_page", False)
@@ -0,0 +1,165 @@
+import time
+from safe_logger import SafeLogger
+from zoho_client import ZohoClient
+from zoho_common import get_state_directory, get_secrets, get_secret_value
+from zoho_state_store import ZohoStateStore
+
+
+logger = SafeLogger("zoho workdrive snapshot")
+SNAPSHOT_STATE_PREFIX = "workdrive_snapshot"
+
+
+class ZohoWorkDriveSnapshot():
+    """
+    Keeps the result of the last complete enumeration of a folder (path, size and last modified time of each file),
+    and the files added, changed and removed by each enumeration since the changes were last cleared.
+    Changes accumulate over the enumerations, so that the many enumerations of one job do not hide them.
+    """
+    def __init__(self, state_store, key):
+        self.state_store = state_store
+        self.key = key
+
+    def get_snapshot_key(self):
+        return {"snapshot": self.key}
+
+    def get_changes_key(self):
+        return {"changes": self.key}
+
+    def update(self, paths):
+        """
+        Replaces the snapshot by the enumerated paths, adds the differences to the pending changes and returns them
+        """
+        current_files = {path.get("path"): [path.get("size"), path.get("lastModified")] for path in paths}
+        # Jobs enumerating the same folder at once would otherwise lose each other's changes
+        with self.state_store.locked(self.get_changes_key()):
+            previous_snapshot = self.state_store.load(self.get_snapshot_key())
+            previous_files = previous_snapshot.get("files") if previous_snapshot else None
+            previous_enumerated_at = previous_snapshot.get("enumerated_at") if previous_snapshot else None
+            # Strictly increasing, as clear_changes tells the enumerations apart by their time
+            enumerated_at = max(int(time.time() * 1000), (previous_enumerated_at or 0) + 1)
+            new_changes = get_changes(previous_files, current_files)
+            enumerations = self.load_enumerations()
+            if enumerations and is_empty(enumerations[-1]) and is_empty(new_changes):
+                # Enumerations without any change only move the end of the last one
+                enumerations[-1]["enumerated_at"] = enumerated_at
+            else:
+                new_changes.update({"enumerated_at": enumerated_at, "previous_enumerated_at": previous_enumerated_at})
+                enumerations.append(new_changes)
+            self.state_store.save(self.get_snapshot_key(), {"files": current_files, "enumerated_at": enumerated_at})
+            self.state_store.save(self.get_changes_key(), {"enumerations": enumerations})
+        logger.info(
+            "update", added=len(new_changes.get("added")), changed=len(new_changes.get("changed")),
+            removed=len(new_changes.get("removed")), is_first_enumeration=previous_snapshot is None
+        )
+        return get_merged_changes(enumerations)
+
+    def get_changes(self):
+        """
+        Files added, changed and removed between the enumeration at previous_enumerated_at,
+        the last one before the changes were cleared, and the latest one at enumerated_at.
+        None before the first enumeration.
+        """
+        return get_merged_changes(self.load_enumerations())
+
+    def clear_changes(self, enumerated_at):
+        """
+        Marks the changes returned with enumerated_at as processed.
+        Changes found by later enumerations, while they were being processed, are kept for the next time.
+        """
+        if enumerated_at is None:
+            return
+        with self.state_store.locked(self.get_changes_key()):
+            enumerations = [
+                enumeration for enumeration in self.load_enumerations()
+                if enumeration.get("enumerated_at") > enumerated_at
+            ]
+            if enumerations:
+                self.state_store.save(self.get_changes_key(), {"enumerations": enumerations})
+            else:
+                self.state_store.delete(self.get_changes_key())
+
+    def load_enumerations(self):
+        pending_changes = self.state_store.load(self.get_changes_key()) or {}
+        return pending_changes.get("enumerations", [])
+
+
+def get_workdrive_snapshot(folder_id, path, account_id=None, state_directory=None):
+    """
+    Snapshot of path, below the WorkDrive folder folder_id, as kept by the file system provider with
+    "Track changes between enumerations". account_id is the Zoho user of the connection,
+    by default the one of the Zoho credential of the current DSS user. From a recipe:
+
+        snapshot_module = dataiku.import_from_plugin("zoho", "zoho_workdrive_snapshot")
+        snapshot = snapshot_module.get_workdrive_snapshot(folder_id, "/path/of/the/folder")
+        changes = snapshot.get_changes()
+        ...
+        snapshot.clear_changes(changes.get("enumerated_at"))
+    """
+    state_directory = state_directory or get_state_directory({})
+    return ZohoWorkDriveSnapshot(
+        ZohoStateStore(state_directory, SNAPSHOT_STATE_PREFIX),
+        {"account": account_id or get_current_account_id(), "folder_id": folder_id, "path": path}
+    )
+
+
+def get_current_account_id():
+    access_token = get_secret_value(get_secrets())
+    return ZohoClient(access_token=access_token, endpoint="workdrive").get_current_user_id()
+
+
+def get_merged_changes(enumerations):
+    if not enumerations:
+        return None
+    changes = None
+    for enumeration in enumerations:
+        changes = merge_changes(changes, enumeration)
+    changes["enumerated_at"] = enumerations[-1].get("enumerated_at")
+    return changes
+
+
+def is_empty(changes):
+    return not (changes.get("added") or changes.get("changed") or changes.get("removed"))
+
+
+def get_changes(previous_files, current_files):
+    if previous_files is None:
+        return {"added": sorted(current_files), "changed": [], "removed": []}
+    added = []
+    changed = []
+    for path, file_details in current_files.items():
+        previous_file_details = previous_files.get(path)
+        if previous_file_details is None:
+            added.append(path)
+        elif list(previous_file_details) != list(file_details):
+            changed.append(path)
+    removed = [path for path in previous_files if path not in current_files]
+    return {"added": sorted(added), "changed": sorted(changed), "removed": sorted(removed)}
+
+
+def merge_changes(pending_changes, new_changes):
+    """
+    Changes from the pending ones' starting point to the new ones' end
+    """
+    if pending_changes is None:
+        return dict(new_changes)
+    added = set(pending_changes.get("added", []))
+    changed = set(pending_changes.get("changed", []))
+    removed = set(pending_changes.get("removed", []))
+    for path in new_changes.get("added"):
+        if path in removed:
+            removed.discard(path)
+            changed.add(path)
+        else:
+            added.add(path)
+    for path in new_changes.get("changed"):
+        if path not in added:
+            changed.add(path)
+    for path in new_changes.get("removed"):
+        if path in added:
+            added.discard(path)
+        else:
+            changed.discard(path)
+            removed.add(path)
+    merged_changes = dict(pending_changes)
+    merged_changes.update({"added": sorted(added), "changed": sorted(changed), "removed": sorted(removed)})
+    return merged_changes
@@ -0,0 +1,43 @@
+from zoho_client import ZohoClient
+from zoho_common import get_zoho_token
+from zoho_crm_metadata import ZohoCRMMetadata
+from safe_logger import SafeLogger
+
+
+logger = SafeLogger("zoho CRM modules", ["zoho_oauth"])
+STATIC_CHOICES = [
+    {"value": "users", "label": "Users"},
+    {"value": "apis", "label": "APIs"}
+]
+LEGACY_TABLES = {
+    "Contacts": "contacts",
+    "Events": "events"
+}
+
+
+def do(payload, config, plugin_config, inputs):
+    if payload.get("parameterName") != "table":
+        return {"choices": []}
+    choices = list(STATIC_CHOICES)
+    access_token = get_zoho_token(config)
+    if not access_token:
+        return {"choices": choices}
+    try:
+        metadata = ZohoCRMMetadata(ZohoClient(
+            access_token=access_token,
+            endpoint="crm",
+            rate_limit=config.get("rate_limit"),
+            rate_limit_burst=config.get("rate_limit_burst")
+        ))
+        modules = metadata.get_modules()
+    except Exception as error:
+        logger.error("Could not list the CRM modules: %s", error)
+        return {"choices": choices + [{"value": table, "label": module} for module, table in LEGACY_TABLES.items()]}
+    for module in modules:
+        api_name = module.get("api_name")
+        choices.append({
+            # contacts and events keep their former values so that existing datasets still match
+            "value": LEGACY_TABLES.get(api_name, api_name),
+            "label": module.get("plural_label") or api_name
+        })
+    return {"choices": choices}
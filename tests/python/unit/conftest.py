@@ -0,0 +1,52 @@
+import importlib.util
+import os
+import sys
+import pytest
+
+PLUGIN_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+sys.path.insert(0, os.path.join(PLUGIN_ROOT, "python-lib"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import rate_limiter  # noqa: E402
+import session_registry  # noqa: E402
+import zoho_crm_metadata  # noqa: E402
+from zoho_simulator import ZohoSimulator, build_simulator_session  # noqa: E402
+
+
+ACCESS_TOKEN = "simulated-token"
+# The simulator has no quota, the tests and benchmarks measure the client rather than the default rate limit
+NO_RATE_LIMIT = 0
+
+
+@pytest.fixture
+def zoho_simulator(monkeypatch):
+    """
+    Running simulator, to which every Zoho request of the test is sent.
+    The shared sessions, rate limiters and caches of the process are reset around each test.
+    """
+    simulator = ZohoSimulator().start()
+    monkeypatch.setattr(session_registry, "build_session", lambda pool_size: build_simulator_session(simulator.url, pool_size))
+    monkeypatch.setattr(session_registry, "sessions", type(session_registry.sessions)())
+    monkeypatch.setattr(rate_limiter, "rate_limiters", {})
+    zoho_crm_metadata.metadata_cache.clear()
+    yield simulator
+    simulator.stop()
+
+
+@pytest.fixture
+def zoho_config(tmp_path):
+    return {
+        "zoho_oauth": {"zoho_oauth": ACCESS_TOKEN},
+        "state_directory": str(tmp_path),
+        "rate_limit": NO_RATE_LIMIT
+    }
+
+
+def load_plugin_module(module_name, relative_path):
+    """
+    Imports a connector or file system provider, whose file names are not valid module names
+    """
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(PLUGIN_ROOT, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
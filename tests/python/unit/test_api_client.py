@@ -0,0 +1,211 @@
+import pytest
+import requests
+import threading
+import time
+import urllib3
+from api_client import get_prefetched
+from rate_limiter import is_retryable
+from zoho_client import ZohoClient
+from zoho_checkpoint import ZohoCheckpoint
+from zoho_state_store import ZohoStateStore
+from zoho_simulator import ROOT_FOLDER_ID
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+CONTACTS_PATH = "www.zohoapis.com/crm/v7/Contacts"
+
+
+def get_crm_client(access_token=ACCESS_TOKEN, **kwargs):
+    return ZohoClient(access_token=access_token, endpoint="crm", rate_limit=NO_RATE_LIMIT, **kwargs)
+
+
+def read_contacts(client, **kwargs):
+    return client.client.get_next_row("Contacts", data_path=["data"], params={"fields": "Last_Name"}, **kwargs)
+
+
+def get_record_ids(zoho_simulator, module="Contacts"):
+    return [record.get("id") for record in zoho_simulator.records.get(module)]
+
+
+def test_get_next_row_follows_page_tokens(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 1000)
+    record_ids = [row.get("id") for row in read_contacts(get_crm_client())]
+    assert record_ids == get_record_ids(zoho_simulator)
+    page_tokens = [params.get("page_token") for _, path, params in zoho_simulator.requests if path == CONTACTS_PATH]
+    assert page_tokens == [None, "token-200", "token-400", "token-600", "token-800"]
+
+
+def test_expired_token_is_refreshed_and_page_replayed(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 1000)
+    refreshed_tokens = []
+
+    def refresh_token():
+        refreshed_tokens.append("fresh-token")
+        return "fresh-token"
+    client = get_crm_client(access_token="expiring-token", token_refresher=refresh_token)
+    record_ids = []
+    for row in read_contacts(client):
+        record_ids.append(row.get("id"))
+        if len(record_ids) == 300:
+            # The token expires in the middle of the read
+            zoho_simulator.rejected_tokens.add("expiring-token")
+    assert record_ids == get_record_ids(zoho_simulator)
+    assert refreshed_tokens == ["fresh-token"]
+
+
+def test_token_is_refreshed_once_for_concurrent_requests(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 10)
+    zoho_simulator.rejected_tokens.add("expired-token")
+    refresh_calls = []
+
+    def refresh_token():
+        refresh_calls.append(threading.current_thread().name)
+        return "fresh-token"
+    client = get_crm_client(access_token="expired-token", token_refresher=refresh_token)
+    counts = []
+
+    def count_records():
+        counts.append(client.get("Contacts/actions/count").get("count"))
+    threads = [threading.Thread(target=count_records) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counts == [10] * 8
+    assert len(refresh_calls) == 1
+
+
+def test_interrupted_read_resumes_from_checkpoint(zoho_simulator, tmp_path):
+    zoho_simulator.set_records("Contacts", 1000)
+    checkpoint = ZohoCheckpoint(ZohoStateStore(str(tmp_path), "crm_checkpoint"), {"table": "contacts"})
+    rows = read_contacts(get_crm_client(), checkpoint=checkpoint)
+    for _ in range(450):
+        next(rows)
+    # The read stops in the middle of the third page, only the first two are saved as done
+    rows.close()
+    assert checkpoint.load().get("rows_emitted") == 400
+    del zoho_simulator.requests[:]
+    record_ids = [row.get("id") for row in read_contacts(get_crm_client(), checkpoint=checkpoint)]
+    assert record_ids == get_record_ids(zoho_simulator)[400:]
+    assert zoho_simulator.requests[0][2].get("page_token") == "token-400"
+    assert checkpoint.load() is None
+
+
+def test_throttled_requests_are_retried(zoho_simulator):
+    zoho_simulator.throttle_every = 3
+    zoho_simulator.set_records("Contacts", 1000)
+    record_ids = [row.get("id") for row in read_contacts(get_crm_client())]
+    assert record_ids == get_record_ids(zoho_simulator)
+    assert zoho_simulator.number_of_throttled_requests > 0
+
+
+def test_read_fails_once_retries_are_exhausted(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 1000)
+    zoho_simulator.add_failure(lambda method, path, params: params.get("page_token") == "token-400")
+    record_ids = []
+    with pytest.raises(Exception, match="Error 503"):
+        for row in read_contacts(get_crm_client()):
+            record_ids.append(row.get("id"))
+    assert len(record_ids) == 400
+
+
+def test_get_raises_on_error_answer(zoho_simulator):
+    zoho_simulator.add_failure(lambda method, path, params: path.endswith("/count"), status_code=400)
+    with pytest.raises(Exception, match="Error 400"):
+        get_crm_client().get("Contacts/actions/count")
+
+
+def test_post_is_not_sent_again_after_a_server_error(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 10)
+    zoho_simulator.add_failure(lambda method, path, params: method == "POST", status_code=502, times=1)
+    client = get_crm_client()
+    # The job may have been created before the gateway failed, sending it again could create a second one
+    with pytest.raises(Exception, match="Error 502"):
+        client.post(None, url="https://www.zohoapis.com/crm/bulk/v7/read", json={"query": {"module": {"api_name": "Contacts"}}})
+    assert len([request for request in zoho_simulator.requests if request[0] == "POST"]) == 1
+    assert zoho_simulator.bulk_jobs == {}
+
+
+def test_post_is_sent_again_after_a_throttling_answer(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 10)
+    zoho_simulator.add_failure(lambda method, path, params: method == "POST", status_code=429, times=1)
+    get_crm_client().post(None, url="https://www.zohoapis.com/crm/bulk/v7/read", json={"query": {"module": {"api_name": "Contacts"}}})
+    assert len(zoho_simulator.bulk_jobs) == 1
+
+
+def test_idempotent_post_and_get_are_sent_again_after_a_server_error(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 10)
+    zoho_simulator.add_failure(lambda method, path, params: method == "GET", status_code=502, times=1)
+    zoho_simulator.add_failure(lambda method, path, params: method == "POST", status_code=502, times=1)
+    client = get_crm_client()
+    assert client.get("Contacts/actions/count").get("count") == 10
+    response = client.post("coql", json={"select_query": "select Last_Name from Contacts where id is not null"}, raw=True, is_idempotent=True)
+    assert response.status_code == 200
+    assert len(zoho_simulator.requests) == 4
+
+
+def test_is_retryable_on_connection_errors():
+    connection_error = requests.exceptions.ConnectionError(
+        urllib3.exceptions.MaxRetryError(None, "/", reason=urllib3.exceptions.NewConnectionError(None, "refused"))
+    )
+    assert is_retryable(None, is_idempotent=False, error=connection_error)
+    # The request may have been processed when the connection broke while waiting for the answer
+    assert not is_retryable(None, is_idempotent=False, error=requests.exceptions.ConnectionError("Connection aborted"))
+    assert is_retryable(None, is_idempotent=True, error=requests.exceptions.ConnectionError("Connection aborted"))
+
+
+def test_raw_answer_errors_are_left_to_the_caller(zoho_simulator, caplog):
+    file_id = zoho_simulator.add_file(ROOT_FOLDER_ID, "empty.csv").get("id")
+    client = ZohoClient(access_token=ACCESS_TOKEN, endpoint="workdrive", rate_limit=NO_RATE_LIMIT)
+    response = client.get(None, url="https://download.zoho.com/v1/workdrive/download/{}".format(file_id), raw=True, headers={"Range": "bytes=0-99"})
+    assert response.status_code == 416
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
+
+
+def test_prefetched_rows_are_complete_and_in_order(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 1000)
+    record_ids = [row.get("id") for row in read_contacts(get_crm_client(), prefetch_depth=2)]
+    assert record_ids == get_record_ids(zoho_simulator)
+
+
+def test_page_error_reaches_the_consumer(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 1000)
+    zoho_simulator.add_failure(lambda method, path, params: params.get("page_token") == "token-400", status_code=400)
+    record_ids = []
+    with pytest.raises(Exception, match="Error 400"):
+        for row in read_contacts(get_crm_client(), prefetch_depth=2):
+            record_ids.append(row.get("id"))
+    assert len(record_ids) == 400
+
+
+def test_producer_stops_when_the_consumer_stops():
+    produced_items = []
+    producer_closed = threading.Event()
+
+    def produce():
+        try:
+            for index in range(1000):
+                produced_items.append(index)
+                yield index
+        finally:
+            producer_closed.set()
+    items = get_prefetched(produce(), 2)
+    assert [next(items) for _ in range(3)] == [0, 1, 2]
+    items.close()
+    assert producer_closed.wait(timeout=5)
+    # Only the items up to the depth were fetched ahead
+    time.sleep(0.3)
+    assert len(produced_items) <= 3 + 2 + 1
+
+
+def test_checkpoints_follow_the_consumed_pages(zoho_simulator, tmp_path):
+    zoho_simulator.set_records("Contacts", 1000)
+    checkpoint = ZohoCheckpoint(ZohoStateStore(str(tmp_path), "crm_checkpoint"), {"table": "contacts"})
+    rows = read_contacts(get_crm_client(), checkpoint=checkpoint, prefetch_depth=2)
+    for _ in range(450):
+        next(rows)
+    # Pages ahead were fetched, but only the two consumed ones are saved
+    time.sleep(0.3)
+    assert checkpoint.load().get("rows_emitted") == 400
+    rows.close()
+    assert checkpoint.load().get("pagination").get("next_page_token") == "token-400"
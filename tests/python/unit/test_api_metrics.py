@@ -0,0 +1,66 @@
+import json
+from api_metrics import APIMetrics, get_endpoint_key, get_percentile
+
+
+FILE_URL = "https://www.zohoapis.com/workdrive/api/v1/files/{}/files"
+
+
+class Request():
+    def __init__(self, headers=None):
+        self.headers = headers or {}
+
+
+class Response():
+    def __init__(self, status_code, content=b"", headers=None, request_headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.request = Request(request_headers)
+
+
+def get_metrics():
+    metrics = APIMetrics("workdrive")
+    for index in range(1, 101):
+        # Latencies of 10 ms to 1 s, on as many folders
+        metrics.record_request(FILE_URL.format("folder{:08d}".format(index)), index / 100.0, Response(200, b"0123456789"))
+    metrics.record_request(FILE_URL.format("folder00000001"), 2.0, Response(429))
+    metrics.record_retry(FILE_URL.format("folder00000001"))
+    metrics.record_throttle_wait(1.5)
+    metrics.record_request("https://download.zoho.com/v1/workdrive/download/file00000001", 0.2)
+    metrics.record_request(
+        "https://upload.zoho.com/workdrive-api/v1/stream/upload", 0.3,
+        Response(200, headers={"Content-Length": "1000"}, request_headers={"Content-Length": "5000"}), is_streamed=True
+    )
+    metrics.record_page(FILE_URL.format("folder00000001"), 50, 0.01)
+    return metrics
+
+
+def test_summary_per_endpoint():
+    summary = get_metrics().get_summary()
+    assert (summary.get("requests"), summary.get("retries"), summary.get("throttle_wait")) == (103, 1, 1.5)
+    assert (summary.get("bytes_received"), summary.get("bytes_sent")) == (2000, 5000)
+    listings = summary.get("endpoints").get("www.zohoapis.com/workdrive/api/v1/files/{id}/files")
+    assert listings.get("requests") == 101
+    assert listings.get("status_codes") == {"200": 100, "429": 1}
+    assert (listings.get("retries"), listings.get("pages"), listings.get("rows")) == (1, 1, 50)
+    assert (listings.get("p50"), listings.get("p95"), listings.get("p99")) == (0.51, 0.96, 1.0)
+    downloads = summary.get("endpoints").get("download.zoho.com/v1/workdrive/download/{id}")
+    assert (downloads.get("requests"), downloads.get("errors")) == (1, 1)
+
+
+def test_get_percentile():
+    latencies = [index / 100.0 for index in range(1, 101)]
+    assert [get_percentile(latencies, percentile) for percentile in [50, 95, 99]] == [0.5, 0.95, 0.99]
+    assert get_percentile([], 50) == 0.0
+
+
+def test_get_endpoint_key():
+    assert get_endpoint_key("https://www.zohoapis.com/crm/v7/Contacts?page=2") == "www.zohoapis.com/crm/v7/Contacts"
+    assert get_endpoint_key(FILE_URL.format("abcdef123456")) == "www.zohoapis.com/workdrive/api/v1/files/{id}/files"
+
+
+def test_summary_is_exported(tmp_path):
+    export_path = str(tmp_path / "metrics" / "workdrive.json")
+    summary = get_metrics().log_summary(export_path=export_path)
+    with open(export_path) as file:
+        assert json.load(file) == summary
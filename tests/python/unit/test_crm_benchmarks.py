@@ -0,0 +1,56 @@
+import pytest
+from zoho_client import ZohoClient
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT, load_plugin_module
+
+
+CONTACTS_FIELDS = "Last_Name,Email"
+
+
+def get_client():
+    return ZohoClient(access_token=ACCESS_TOKEN, endpoint="crm", rate_limit=NO_RATE_LIMIT)
+
+
+@pytest.mark.parametrize("prefetch_depth", [0, 2])
+def test_get_next_row(benchmark, zoho_simulator, prefetch_depth):
+    zoho_simulator.latency = 0.01
+    zoho_simulator.set_records("Contacts", 5000)
+    client = get_client()
+
+    def read_rows():
+        return sum(1 for row in client.client.get_next_row(
+            "Contacts", data_path=["data"], params={"fields": CONTACTS_FIELDS}, prefetch_depth=prefetch_depth
+        ))
+    assert benchmark(read_rows) == 5000
+
+
+def test_get_next_row_with_default_rate_limit(benchmark, zoho_simulator):
+    # The shipped limit, whose burst only covers the first half of the 40 pages
+    zoho_simulator.set_records("Contacts", 8000)
+
+    def read_rows():
+        client = ZohoClient(access_token=ACCESS_TOKEN, endpoint="crm")
+        return sum(1 for row in client.client.get_next_row("Contacts", data_path=["data"], params={"fields": CONTACTS_FIELDS}))
+    assert benchmark.pedantic(read_rows, rounds=1, iterations=1) == 8000
+
+
+def test_get_next_row_with_throttling(benchmark, zoho_simulator):
+    zoho_simulator.throttle_every = 4
+    zoho_simulator.set_records("Contacts", 5000)
+    client = get_client()
+
+    def read_rows():
+        return sum(1 for row in client.client.get_next_row("Contacts", data_path=["data"], params={"fields": CONTACTS_FIELDS}))
+    assert benchmark(read_rows) == 5000
+    assert zoho_simulator.number_of_throttled_requests > 0
+
+
+def test_generate_rows(benchmark, zoho_simulator, zoho_config):
+    pytest.importorskip("dataiku.connector")
+    connector_module = load_plugin_module("zoho_crm_connector", "python-connectors/zoho_crm/connector.py")
+    zoho_simulator.set_records("Contacts", 10000)
+    config = dict(zoho_config, table="contacts", read_mode="rest")
+    connector = connector_module.ZohoCRMConnector(config, {})
+
+    def generate_rows():
+        return sum(1 for row in connector.generate_rows())
+    assert benchmark(generate_rows) == 10000
@@ -0,0 +1,47 @@
+import io
+import pytest
+from zoho_simulator import ROOT_FOLDER_ID
+from conftest import load_plugin_module
+
+
+@pytest.fixture
+def fs_provider(zoho_simulator, zoho_config):
+    pytest.importorskip("dataiku.fsprovider")
+    provider_module = load_plugin_module("zoho_workdrive_fs_provider", "python-fs-providers/zoho_workdrive/fs-provider.py")
+    provider = provider_module.ZohoWorkDriveFSProvider("", dict(zoho_config, folder_id=ROOT_FOLDER_ID, mutation_batch_size=2), {})
+    yield provider
+    provider.close()
+
+
+def test_delete_recursive_of_the_root_trashes_its_content(zoho_simulator, fs_provider):
+    zoho_simulator.add_folder(ROOT_FOLDER_ID, "folder")
+    for index in range(4):
+        zoho_simulator.add_file(ROOT_FOLDER_ID, "file_{}.csv".format(index))
+    assert fs_provider.delete_recursive("/") == 4
+    assert zoho_simulator.children.get(ROOT_FOLDER_ID) == []
+    assert len([request for request in zoho_simulator.requests if request[0] == "PATCH"]) == 3
+
+
+def test_failed_move_raises_with_the_path(zoho_simulator, fs_provider):
+    zoho_simulator.add_file(ROOT_FOLDER_ID, "file.csv")
+    zoho_simulator.add_failure(lambda method, path, params: method == "PATCH", status_code=400)
+    with pytest.raises(Exception, match="Could not move '/file.csv'"):
+        fs_provider.move("/file.csv", "/renamed.csv")
+
+
+def test_read_with_a_limit_only_downloads_the_first_bytes(zoho_simulator, fs_provider):
+    zoho_simulator.add_file(ROOT_FOLDER_ID, "file.csv", content=b"0123456789" * 100)
+    stream = io.BytesIO()
+    fs_provider.read("/file.csv", stream, 25)
+    assert stream.getvalue() == b"0123456789" * 2 + b"01234"
+    download_requests = [request for request in zoho_simulator.requests if request[1].startswith("download.zoho.com")]
+    assert len(download_requests) == 1
+
+
+def test_read_of_an_empty_file_with_a_limit(zoho_simulator, fs_provider, caplog):
+    zoho_simulator.add_file(ROOT_FOLDER_ID, "empty.csv")
+    stream = io.BytesIO()
+    # The range of an empty file is not satisfiable, which is an expected answer
+    fs_provider.read("/empty.csv", stream, 100)
+    assert stream.getvalue() == b""
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
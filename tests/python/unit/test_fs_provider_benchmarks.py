@@ -0,0 +1,65 @@
+import io
+import os
+import pytest
+from zoho_simulator import ROOT_FOLDER_ID
+from conftest import load_plugin_module
+
+
+def get_fs_provider(zoho_config, **options):
+    pytest.importorskip("dataiku.fsprovider")
+    provider_module = load_plugin_module("zoho_workdrive_fs_provider", "python-fs-providers/zoho_workdrive/fs-provider.py")
+    return provider_module.ZohoWorkDriveFSProvider("", dict(zoho_config, folder_id=ROOT_FOLDER_ID, **options), {})
+
+
+@pytest.fixture
+def fs_provider(zoho_simulator, zoho_config):
+    provider = get_fs_provider(zoho_config)
+    yield provider
+    provider.close()
+
+
+def test_stat(benchmark, zoho_simulator, fs_provider):
+    zoho_simulator.build_tree(depth=3, folders_per_folder=3, files_per_folder=20)
+    stat = benchmark(fs_provider.stat, "/folder_1/folder_1/folder_1/file_10.csv")
+    assert not stat.get("isDirectory")
+
+
+def test_enumerate(benchmark, zoho_simulator, fs_provider):
+    zoho_simulator.latency = 0.005
+    zoho_simulator.build_tree(depth=3, folders_per_folder=4, files_per_folder=60)
+    paths = benchmark(fs_provider.enumerate, "/", False)
+    assert len(paths) == 85 * 60
+
+
+def test_read(benchmark, zoho_simulator, fs_provider):
+    file_size = 16 * 1048576
+    zoho_simulator.add_file(ROOT_FOLDER_ID, "data.csv", os.urandom(file_size))
+
+    def read():
+        stream = io.BytesIO()
+        fs_provider.read("/data.csv", stream, None)
+        return stream.tell()
+    assert benchmark(read) == file_size
+
+
+def test_read_from_content_cache(benchmark, zoho_simulator, zoho_config):
+    file_size = 16 * 1048576
+    zoho_simulator.add_file(ROOT_FOLDER_ID, "data.csv", os.urandom(file_size))
+    provider = get_fs_provider(zoho_config, content_cache=True)
+
+    def read():
+        stream = io.BytesIO()
+        provider.read("/data.csv", stream, None)
+        return stream.tell()
+    assert read() == file_size
+    number_of_requests = zoho_simulator.number_of_requests
+    assert benchmark(read) == file_size
+    assert zoho_simulator.number_of_requests == number_of_requests
+    provider.close()
+
+
+@pytest.mark.parametrize("file_size", [1048576, 16 * 1048576])
+def test_write(benchmark, zoho_simulator, fs_provider, file_size):
+    content = os.urandom(file_size)
+    benchmark(lambda: fs_provider.write("/data.csv", io.BytesIO(content)))
+    assert fs_provider.stat("/data.csv").get("size") == file_size
@@ -0,0 +1,47 @@
+import json
+import os
+import pytest
+import json_decoder
+from zoho_crm_pagination import ZohoCRMPagination
+
+
+RECORDED_PAGE_PATH = os.path.join(os.path.dirname(__file__), "resources", "crm_contacts_page.json")
+
+
+@pytest.fixture(scope="module")
+def recorded_page():
+    with open(RECORDED_PAGE_PATH, "rb") as file:
+        return file.read()
+
+
+def test_decode_with_json(benchmark, recorded_page):
+    document = benchmark(json.loads, recorded_page)
+    assert len(document.get("data")) == 200
+
+
+def test_decode_with_json_decoder(benchmark, recorded_page):
+    benchmark.extra_info["backend"] = json_decoder.get_backend()
+    document = benchmark(json_decoder.loads, recorded_page)
+    assert len(document.get("data")) == 200
+
+
+def test_page_parsed_twice(benchmark, recorded_page):
+    # Former behaviour: rows and paging info were each read from their own parse of the body
+    pagination = ZohoCRMPagination()
+
+    def read_page():
+        rows = json.loads(recorded_page).get("data")
+        pagination.has_next_page(json.loads(recorded_page), len(rows))
+        return rows
+    assert len(benchmark(read_page)) == 200
+
+
+def test_page_parsed_once(benchmark, recorded_page):
+    pagination = ZohoCRMPagination()
+
+    def read_page():
+        document = json_decoder.loads(recorded_page)
+        rows = document.get("data")
+        pagination.has_next_page(document, len(rows))
+        return rows
+    assert len(benchmark(read_page)) == 200
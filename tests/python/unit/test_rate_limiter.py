@@ -0,0 +1,36 @@
+import time
+import rate_limiter
+from rate_limiter import TokenBucket, get_rate_limiter, DEFAULT_RATE
+
+
+def test_rate_is_limited_after_the_burst():
+    token_bucket = TokenBucket(rate=50, burst=5)
+    start = time.time()
+    for _ in range(15):
+        token_bucket.acquire()
+    # 10 tokens above the burst, at 50 per second
+    assert 0.15 < time.time() - start < 1
+
+
+def test_no_client_side_limit():
+    token_bucket = TokenBucket(rate=0)
+    start = time.time()
+    for _ in range(1000):
+        token_bucket.acquire()
+    assert time.time() - start < 0.5
+
+
+def test_no_client_side_limit_follows_the_server_headers():
+    token_bucket = TokenBucket(rate=0)
+    token_bucket.update_from_headers({"X-RATELIMIT-REMAINING": "20", "X-RATELIMIT-RESET": "2"})
+    assert token_bucket.rate == 10
+    token_bucket.update_from_headers({"X-RATELIMIT-REMAINING": "0", "X-RATELIMIT-RESET": "1"})
+    assert token_bucket.paused_until > time.time()
+
+
+def test_rate_limiters_are_shared_by_name_and_limits(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "rate_limiters", {})
+    assert get_rate_limiter("crm") is get_rate_limiter("crm")
+    assert get_rate_limiter("crm").rate == DEFAULT_RATE
+    assert get_rate_limiter("crm", rate=0) is not get_rate_limiter("crm")
+    assert get_rate_limiter("crm", rate=0).rate == 0
@@ -0,0 +1,64 @@
+import logging
+from safe_logger import SafeLogger, get_debug_sampling_rate, DEBUG_SAMPLING_RATE_VARIABLE
+
+
+class FormattingCounter():
+    def __init__(self):
+        self.number_of_formats = 0
+
+    def __str__(self):
+        self.number_of_formats += 1
+        return "value"
+
+
+def get_messages(caplog):
+    return [record.getMessage() for record in caplog.records]
+
+
+def test_tokens_in_messages_are_masked(caplog):
+    caplog.set_level(logging.INFO, logger="test safe logger")
+    logger = SafeLogger("test safe logger")
+    logger.info("Sent %s", {"Authorization": "Zoho-oauthtoken 1000.secret.token"})
+    logger.info("Refreshing with refresh_token=1000.refresh.secret&client_id=id")
+    messages = get_messages(caplog)
+    assert "1000.secret.token" not in messages[0]
+    assert "Zoho-oauthtoken HASHED_SECRET" in messages[0]
+    assert messages[1] == "test safe logger - Refreshing with refresh_token=HASHED_SECRET&client_id=id"
+
+
+def test_forbidden_keys_in_fields_are_masked(caplog):
+    caplog.set_level(logging.INFO, logger="test safe logger")
+    logger = SafeLogger("test safe logger", ["zoho_oauth"])
+    config = {"folder_id": "me", "zoho_oauth": {"zoho_oauth": "secret-token"}}
+    logger.info("Starting", config=config, access_token="secret-token", password="secret")
+    message = get_messages(caplog)[0]
+    assert "secret" not in message.replace("HASHED_SECRET", "")
+    assert "'folder_id': 'me'" in message
+    assert "access_token=HASHED_SECRET" in message
+    # The configuration itself is left untouched
+    assert config.get("zoho_oauth") == {"zoho_oauth": "secret-token"}
+
+
+def test_args_are_only_formatted_when_the_level_is_enabled(caplog):
+    caplog.set_level(logging.INFO, logger="test safe logger")
+    logger = SafeLogger("test safe logger")
+    counter = FormattingCounter()
+    logger.debug("Not logged %s", counter, field=counter)
+    assert counter.number_of_formats == 0
+    assert get_messages(caplog) == []
+    logger.info("Logged %s", counter, field=counter)
+    assert counter.number_of_formats == 2
+    assert get_messages(caplog) == ["test safe logger - Logged value field=value"]
+
+
+def test_debug_sampling(monkeypatch, caplog):
+    caplog.set_level(logging.DEBUG, logger="test safe logger")
+    monkeypatch.setenv(DEBUG_SAMPLING_RATE_VARIABLE, "0")
+    assert not SafeLogger("test safe logger").should_sample()
+    monkeypatch.setenv(DEBUG_SAMPLING_RATE_VARIABLE, "1")
+    assert SafeLogger("test safe logger").should_sample()
+    monkeypatch.setenv(DEBUG_SAMPLING_RATE_VARIABLE, "not a number")
+    assert get_debug_sampling_rate() == 1.0
+    caplog.set_level(logging.INFO, logger="test safe logger")
+    # Nothing is traced when debug is off
+    assert not SafeLogger("test safe logger").should_sample()
@@ -0,0 +1,160 @@
+import io
+import os
+import pytest
+from zoho_cache import LRUCache
+from zoho_client import ZohoClient
+from zoho_chunk_uploader import ZohoChunkUploader
+from zoho_workdrive_enumerator import ZohoWorkDriveEnumerator
+from zoho_metadata_index import ZohoMetadataIndex
+from zoho_mutation_batch import TRASHED_STATUS
+from zoho_simulator import ROOT_FOLDER_ID
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+WIDE_FOLDER_SIZES = [1000, 10000] + ([100000] if os.environ.get("ZOHO_LARGE_BENCHMARKS") else [])
+DOWNLOAD_CHUNK_SIZE = 1048576
+
+
+def get_client(with_cache=True):
+    return ZohoClient(
+        access_token=ACCESS_TOKEN,
+        endpoint="workdrive",
+        rate_limit=NO_RATE_LIMIT,
+        path_cache=LRUCache() if with_cache else None,
+        folder_index_cache=LRUCache(max_size=100) if with_cache else None
+    )
+
+
+@pytest.mark.parametrize("with_cache", [False, True])
+def test_get_item_from_path(benchmark, zoho_simulator, with_cache):
+    zoho_simulator.build_tree(depth=4, folders_per_folder=3, files_per_folder=20)
+    client = get_client(with_cache)
+    path = "/folder_2/folder_2/folder_2/folder_2/file_19.csv"
+    item = benchmark(client.get_item_from_path, ROOT_FOLDER_ID, path)
+    assert item.get("attributes").get("name") == "file_19.csv"
+
+
+@pytest.mark.parametrize("number_of_children", WIDE_FOLDER_SIZES)
+def test_get_item_from_path_in_wide_folder(benchmark, zoho_simulator, number_of_children):
+    # Every lookup of a new name in the same folder, as when stat is called for each file of a partitioned dataset
+    folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "wide")
+    for index in range(number_of_children):
+        zoho_simulator.add_file(folder.get("id"), "file_{}.csv".format(index), b"")
+    client = get_client()
+    file_names = iter(["/wide/file_{}.csv".format(index) for index in range(number_of_children - 1, -1, -1)])
+
+    def get_next_item():
+        return client.get_item_from_path(ROOT_FOLDER_ID, next(file_names))
+    item = benchmark.pedantic(get_next_item, rounds=min(100, number_of_children), iterations=1)
+    assert item.get("attributes").get("type") == "file"
+
+
+def test_enumerate_with_metadata_index(benchmark, zoho_simulator, tmp_path):
+    # Each round is a new job: the process caches are cold, the listings come from the previous jobs' index
+    zoho_simulator.latency = 0.005
+    zoho_simulator.build_tree(depth=3, folders_per_folder=4, files_per_folder=60)
+    database_path = str(tmp_path / "workdrive_index.sqlite")
+
+    def enumerate_files():
+        metadata_index = ZohoMetadataIndex(database_path, validation_ttl=300)
+        client = ZohoClient(access_token=ACCESS_TOKEN, endpoint="workdrive", rate_limit=NO_RATE_LIMIT, metadata_index=metadata_index)
+        try:
+            return list(ZohoWorkDriveEnumerator(client).get_next_file({"id": ROOT_FOLDER_ID}))
+        finally:
+            metadata_index.close()
+    enumerate_files()
+    files = benchmark(enumerate_files)
+    assert len(files) == 85 * 60
+
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_enumerate(benchmark, zoho_simulator, max_workers):
+    zoho_simulator.latency = 0.005
+    zoho_simulator.build_tree(depth=3, folders_per_folder=4, files_per_folder=60)
+    enumerator = ZohoWorkDriveEnumerator(get_client(), max_workers=max_workers)
+
+    def enumerate_files():
+        return list(enumerator.get_next_file({"id": ROOT_FOLDER_ID}))
+    files = benchmark(enumerate_files)
+    assert len(files) == 85 * 60
+
+
+def test_enumerate_with_throttling(benchmark, zoho_simulator):
+    zoho_simulator.throttle_every = 5
+    zoho_simulator.build_tree(depth=2, folders_per_folder=3, files_per_folder=60)
+    enumerator = ZohoWorkDriveEnumerator(get_client())
+
+    def enumerate_files():
+        return list(enumerator.get_next_file({"id": ROOT_FOLDER_ID}))
+    files = benchmark(enumerate_files)
+    assert len(files) == 13 * 60
+    assert zoho_simulator.number_of_throttled_requests > 0
+
+
+@pytest.mark.parametrize("file_size", [1048576, 16 * 1048576])
+def test_read(benchmark, zoho_simulator, file_size):
+    item = zoho_simulator.add_file(ROOT_FOLDER_ID, "data.csv", os.urandom(file_size))
+    client = get_client()
+    download_url = "https://download.zoho.com/v1/workdrive/download/{}".format(item.get("id"))
+
+    def read():
+        stream = io.BytesIO()
+        response = client.get(None, url=download_url, raw=True, stream=True)
+        try:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                stream.write(chunk)
+        finally:
+            response.close()
+        return stream.tell()
+    assert benchmark(read) == file_size
+
+
+@pytest.mark.parametrize("file_size", [1048576, 16 * 1048576])
+def test_write(benchmark, zoho_simulator, file_size):
+    client = get_client()
+    content = os.urandom(file_size)
+
+    uploader = ZohoChunkUploader(client)
+
+    def write():
+        return uploader.upload_stream(io.BytesIO(content), file_size, "data.csv", ROOT_FOLDER_ID)
+    benchmark(write)
+    assert len(zoho_simulator.children.get(ROOT_FOLDER_ID)) > 0
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_write_upload_session(benchmark, zoho_simulator, max_workers):
+    zoho_simulator.latency = 0.01
+    zoho_simulator.upload_chunk_size = 1048576
+    client = get_client()
+    file_size = 16 * 1048576
+    content = io.BytesIO(os.urandom(file_size))
+    uploader = ZohoChunkUploader(client, max_workers=max_workers)
+    benchmark(uploader.upload_session, content, file_size, "data.csv", ROOT_FOLDER_ID)
+    uploaded_file = zoho_simulator.children.get(ROOT_FOLDER_ID)[-1]
+    assert uploaded_file.get("attributes").get("storage_info").get("size_in_bytes") == file_size
+
+
+@pytest.mark.parametrize("mutation_batch_size", [1, 50])
+def test_delete(benchmark, zoho_simulator, mutation_batch_size):
+    # As when DSS clears an output folder
+    zoho_simulator.latency = 0.005
+    number_of_files = 500
+
+    def setup():
+        zoho_simulator.reset_tree()
+        for index in range(number_of_files):
+            zoho_simulator.add_file(ROOT_FOLDER_ID, "file_{}.csv".format(index), b"")
+        client = ZohoClient(
+            access_token=ACCESS_TOKEN,
+            endpoint="workdrive",
+            rate_limit=NO_RATE_LIMIT,
+            mutation_batch_size=mutation_batch_size
+        )
+        items = list(client.get_next_folder_item(ROOT_FOLDER_ID))
+        return (client, items), {}
+
+    def delete(client, items):
+        return client.update_items([(item.get("id"), {"status": TRASHED_STATUS}) for item in items])
+    benchmark.pedantic(delete, setup=setup, rounds=3)
+    assert zoho_simulator.children.get(ROOT_FOLDER_ID) == []
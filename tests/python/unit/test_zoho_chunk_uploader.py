@@ -0,0 +1,50 @@
+import io
+import os
+import tempfile
+import pytest
+from zoho_client import ZohoClient
+from zoho_chunk_uploader import ZohoChunkUploader
+from zoho_simulator import ROOT_FOLDER_ID
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+def get_uploader():
+    return ZohoChunkUploader(ZohoClient(access_token=ACCESS_TOKEN, endpoint="workdrive", rate_limit=NO_RATE_LIMIT))
+
+
+def test_stream_upload_keeps_the_spool_in_memory(zoho_simulator):
+    content = os.urandom(100000)
+    with tempfile.SpooledTemporaryFile(max_size=1048576) as spool:
+        spool.write(content)
+        spool.seek(0)
+        get_uploader().upload_stream(spool, len(content), "data.csv", ROOT_FOLDER_ID)
+        assert not spool._rolled
+    uploaded_file = zoho_simulator.children.get(ROOT_FOLDER_ID)[-1]
+    assert uploaded_file.get("attributes").get("name") == "data.csv"
+    assert uploaded_file.get("attributes").get("storage_info").get("size_in_bytes") == len(content)
+
+
+def test_stream_upload_raises_on_error(zoho_simulator):
+    zoho_simulator.add_failure(lambda method, path, params: method == "POST", status_code=400)
+    with pytest.raises(Exception, match="Error 400 while uploading 'data.csv'"):
+        get_uploader().upload_stream(io.BytesIO(b"a,b\n1,2\n"), 8, "data.csv", ROOT_FOLDER_ID)
+    assert zoho_simulator.children.get(ROOT_FOLDER_ID) == []
+
+
+def test_upload_session_sends_every_chunk(zoho_simulator):
+    zoho_simulator.upload_chunk_size = 1000
+    content = os.urandom(4500)
+    get_uploader().upload_session(io.BytesIO(content), len(content), "data.bin", ROOT_FOLDER_ID)
+    uploaded_file = zoho_simulator.children.get(ROOT_FOLDER_ID)[-1]
+    assert uploaded_file.get("attributes").get("storage_info").get("size_in_bytes") == len(content)
+
+
+def test_failed_chunk_is_retried_max_chunk_retries_times(zoho_simulator):
+    zoho_simulator.upload_chunk_size = 1000
+    content = os.urandom(2500)
+    zoho_simulator.add_failure(lambda method, path, params: path.startswith("/workdrive-api"), status_code=503)
+    uploader = ZohoChunkUploader(ZohoClient(access_token=ACCESS_TOKEN, endpoint="workdrive", rate_limit=NO_RATE_LIMIT), max_chunk_retries=1)
+    with pytest.raises(Exception, match="failed for chunks at offsets \\[0, 1000, 2000\\]"):
+        uploader.upload_session(io.BytesIO(content), len(content), "data.bin", ROOT_FOLDER_ID)
+    # One retry layer: each chunk is sent once, then retried once
+    assert len([request for request in zoho_simulator.requests if request[1].startswith("upload.zoho.com")]) == 6
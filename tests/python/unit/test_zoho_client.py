@@ -0,0 +1,97 @@
+import pytest
+from zoho_cache import LRUCache
+from zoho_client import ZohoClient
+from zoho_mutation_batch import TRASHED_STATUS
+from zoho_simulator import ROOT_FOLDER_ID
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+def get_client(**kwargs):
+    return ZohoClient(
+        access_token=ACCESS_TOKEN,
+        endpoint="workdrive",
+        rate_limit=NO_RATE_LIMIT,
+        path_cache=LRUCache(),
+        folder_index_cache=LRUCache(max_size=100),
+        **kwargs
+    )
+
+
+def test_get_item_from_path_in_folder_of_several_pages(zoho_simulator):
+    folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "data")
+    items = [zoho_simulator.add_file(folder.get("id"), "file_{}.csv".format(index)) for index in range(120)]
+    client = get_client()
+    assert client.get_item_from_path(ROOT_FOLDER_ID, "/data/file_119.csv").get("id") == items[119].get("id")
+    assert client.get_item_from_path(ROOT_FOLDER_ID, "/data/file_0.csv").get("id") == items[0].get("id")
+    with pytest.raises(Exception, match="not found"):
+        client.get_item_from_path(ROOT_FOLDER_ID, "/data/file_120.csv")
+
+
+def test_failed_listing_is_listed_again(zoho_simulator):
+    folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "data")
+    items = [zoho_simulator.add_file(folder.get("id"), "file_{}.csv".format(index)) for index in range(120)]
+    zoho_simulator.add_failure(lambda method, path, params: int(params.get("page[offset]", 0)) > 0)
+    client = get_client()
+    with pytest.raises(Exception, match="Error 503"):
+        client.get_item_from_path(ROOT_FOLDER_ID, "/data/file_119.csv")
+    zoho_simulator.clear_failures()
+    assert client.get_item_from_path(ROOT_FOLDER_ID, "/data/file_119.csv").get("id") == items[119].get("id")
+
+
+def test_invalidate_path_drops_the_item_and_its_descendants(zoho_simulator):
+    folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "a")
+    sub_folder = zoho_simulator.add_folder(folder.get("id"), "b")
+    zoho_simulator.add_file(sub_folder.get("id"), "file.csv")
+    zoho_simulator.add_file(folder.get("id"), "c.csv")
+    zoho_simulator.add_file(ROOT_FOLDER_ID, "d.csv")
+    client = get_client()
+    for path in ["/a/b/file.csv", "/a/c.csv", "/d.csv"]:
+        client.get_item_from_path(ROOT_FOLDER_ID, path)
+    assert client.invalidate_path(ROOT_FOLDER_ID, "/a") == 4
+    assert client.path_cache.peek((ROOT_FOLDER_ID, "/d.csv")) is not None
+    assert client.path_cache.peek((ROOT_FOLDER_ID, "/a/b")) is None
+
+
+def test_replaced_file_is_found_once_its_path_is_invalidated(zoho_simulator):
+    folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "a")
+    old_item = zoho_simulator.add_file(folder.get("id"), "c.csv")
+    client = get_client()
+    assert client.get_item_from_path(ROOT_FOLDER_ID, "/a/c.csv").get("id") == old_item.get("id")
+    zoho_simulator.children[folder.get("id")].remove(old_item)
+    new_item = zoho_simulator.add_file(folder.get("id"), "c.csv")
+    # Still cached until invalidated, along with the listing of its folder
+    assert client.get_item_from_path(ROOT_FOLDER_ID, "/a/c.csv").get("id") == old_item.get("id")
+    client.invalidate_path(ROOT_FOLDER_ID, "/a/c.csv")
+    assert client.get_item_from_path(ROOT_FOLDER_ID, "/a/c.csv").get("id") == new_item.get("id")
+
+
+def test_update_items_reports_each_item(zoho_simulator):
+    folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "archive")
+    items = [zoho_simulator.add_file(ROOT_FOLDER_ID, "file_{}.csv".format(index)) for index in range(3)]
+    client = get_client()
+    results = client.update_items([
+        (items[0].get("id"), {"status": TRASHED_STATUS}),
+        (items[1].get("id"), {"name": "renamed.csv"}),
+        (items[1].get("id"), {"parent_id": folder.get("id")})
+    ])
+    assert results == [
+        {"id": items[0].get("id"), "is_successful": True, "error": None},
+        {"id": items[1].get("id"), "is_successful": True, "error": None}
+    ]
+    assert [child.get("id") for child in zoho_simulator.children.get(ROOT_FOLDER_ID)] == [folder.get("id"), items[2].get("id")]
+    assert zoho_simulator.children.get(folder.get("id")) == [items[1]]
+    assert items[1].get("attributes").get("name") == "renamed.csv"
+    # The rename and the move of the same item went in one entry of one request
+    assert len([request for request in zoho_simulator.requests if request[0] == "PATCH"]) == 1
+
+
+def test_update_items_reports_the_failed_items(zoho_simulator):
+    items = [zoho_simulator.add_file(ROOT_FOLDER_ID, "file_{}.csv".format(index)) for index in range(5)]
+    client = get_client(mutation_batch_size=2)
+    mutations = [(item.get("id"), {"status": TRASHED_STATUS}) for item in items]
+    mutations.insert(2, ("unknown-id", {"status": TRASHED_STATUS}))
+    results = client.update_items(mutations)
+    assert [result.get("is_successful") for result in results] == [True, True, False, True, True, True]
+    assert results[2].get("id") == "unknown-id"
+    assert zoho_simulator.children.get(ROOT_FOLDER_ID) == []
+    assert len([request for request in zoho_simulator.requests if request[0] == "PATCH"]) == 3
@@ -0,0 +1,49 @@
+import pytest
+from zoho_common import get_state_key, get_secret_key, get_secret_value
+
+
+CONFIG = {
+    "zoho_oauth": {"zoho_oauth": "token"},
+    "table": "contacts",
+    "fields": "Last_Name,Email",
+    "prefetch_depth": 2
+}
+
+SECRETS = [
+    {"key": "other-plugin.sso.default.my_zoho_oauth", "value": "other-plugin-token"},
+    {"key": "zoho.sso.sales.zoho_oauth", "value": "sales-token"},
+    {"key": "zoho.sso.support.zoho_oauth", "value": "support-token"}
+]
+
+
+def test_secret_of_the_preset_is_found_by_its_key():
+    secret_key = get_secret_key(SECRETS, "support-token")
+    assert secret_key == "zoho.sso.support.zoho_oauth"
+    refreshed_secrets = [dict(secret, value="refreshed-" + secret.get("value")) for secret in SECRETS]
+    assert get_secret_value(refreshed_secrets, secret_key) == "refreshed-support-token"
+
+
+def test_secret_without_known_key_must_be_the_only_zoho_credential():
+    assert get_secret_value(SECRETS[:2]) == "sales-token"
+    with pytest.raises(Exception, match="2 Zoho credentials"):
+        get_secret_value(SECRETS)
+
+
+def test_state_key_ignores_secrets_and_tuning_parameters(monkeypatch):
+    monkeypatch.setenv("DKU_CURRENT_PROJECT_KEY", "PROJECT")
+    state_key = get_state_key(CONFIG, "user_1", table="contacts")
+    assert state_key["table"] == "contacts"
+    assert state_key["connection"] == "user_1"
+    assert state_key["project"] == "PROJECT"
+    assert "token" not in "{}".format(state_key)
+    other_config = dict(CONFIG, zoho_oauth={"zoho_oauth": "refreshed-token"}, prefetch_depth=0)
+    assert get_state_key(other_config, "user_1", table="contacts") == state_key
+
+
+def test_state_key_changes_with_what_is_read(monkeypatch):
+    monkeypatch.setenv("DKU_CURRENT_PROJECT_KEY", "PROJECT")
+    state_key = get_state_key(CONFIG, "user_1", table="contacts")
+    assert get_state_key(CONFIG, "user_2", table="contacts") != state_key
+    assert get_state_key(dict(CONFIG, fields="Last_Name"), "user_1", table="contacts") != state_key
+    monkeypatch.setenv("DKU_CURRENT_PROJECT_KEY", "OTHER_PROJECT")
+    assert get_state_key(CONFIG, "user_1", table="contacts") != state_key
@@ -0,0 +1,78 @@
+from zoho_client import ZohoClient
+from zoho_checkpoint import ZohoCheckpoint
+from zoho_state_store import ZohoStateStore
+from zoho_crm_bulk_read import ZohoCRMBulkReader, get_typed_row
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+def get_bulk_reader():
+    return ZohoCRMBulkReader(ZohoClient(access_token=ACCESS_TOKEN, endpoint="crm", rate_limit=NO_RATE_LIMIT), poll_delay=0.01)
+
+
+def test_module_is_exported_one_job_per_page(zoho_simulator):
+    zoho_simulator.bulk_page_size = 400
+    zoho_simulator.set_records("Contacts", 1000)
+    record_ids = [record.get("id") for record in zoho_simulator.records.get("Contacts")]
+    rows = list(get_bulk_reader().get_next_row("Contacts", fields=["Last_Name", "Owner", "Annual_Revenue"]))
+    assert [row.get("id") for row in rows] == record_ids
+    assert rows[1] == {"id": record_ids[1], "Last_Name": "Name 1", "Owner": {"id": "5725767000000400001"}, "Annual_Revenue": 1000.0}
+    created_jobs = [request for request in zoho_simulator.requests if request[0] == "POST"]
+    assert len(created_jobs) == 3
+
+
+def test_large_text_values_are_parsed(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 3)
+    description = "Line of a long description\n" * 10000
+    zoho_simulator.update_record("Contacts", zoho_simulator.records.get("Contacts")[1].get("id"), Description=description)
+    rows = list(get_bulk_reader().get_next_row("Contacts", fields="Description"))
+    contacts = zoho_simulator.records.get("Contacts")
+    assert [row.get("Description") for row in rows] == [contacts[0].get("Description"), description, contacts[2].get("Description")]
+    assert len(rows) == 3
+
+
+def test_interrupted_export_resumes_from_the_last_job(zoho_simulator, tmp_path):
+    zoho_simulator.bulk_page_size = 400
+    zoho_simulator.set_records("Contacts", 1000)
+    record_ids = [record.get("id") for record in zoho_simulator.records.get("Contacts")]
+    checkpoint = ZohoCheckpoint(ZohoStateStore(str(tmp_path), "crm_checkpoint"), {"table": "contacts"})
+    rows = get_bulk_reader().get_next_row("Contacts", fields="Last_Name", checkpoint=checkpoint)
+    for _ in range(450):
+        next(rows)
+    rows.close()
+    assert checkpoint.load() == {"page": 2, "rows_emitted": 400}
+    del zoho_simulator.requests[:]
+    rows = list(get_bulk_reader().get_next_row("Contacts", fields="Last_Name", checkpoint=checkpoint))
+    assert [row.get("id") for row in rows] == record_ids[400:]
+    created_jobs = [request for request in zoho_simulator.requests if request[0] == "POST"]
+    assert len(created_jobs) == 2
+    assert checkpoint.load() is None
+
+
+def test_get_typed_row():
+    data_types = {
+        "Owner": "ownerlookup", "Annual_Revenue": "currency", "No_of_Employees": "integer",
+        "Email_Opt_Out": "boolean", "Interests": "multiselectpicklist", "Last_Name": "text", "Score": "double"
+    }
+    row = {
+        "id": "5725767000000000001", "Owner": "5725767000000400001", "Owner.name": "Owner",
+        "Annual_Revenue": "1000.5", "No_of_Employees": "12", "Email_Opt_Out": "true",
+        "Interests": "Golf;Sailing", "Last_Name": "", "Score": "1,250.00 USD"
+    }
+    assert get_typed_row(row, data_types) == {
+        "id": "5725767000000000001",
+        "Owner": {"id": "5725767000000400001", "name": "Owner"},
+        "Annual_Revenue": 1000.5,
+        "No_of_Employees": 12,
+        "Email_Opt_Out": True,
+        "Interests": ["Golf", "Sailing"],
+        "Last_Name": None,
+        "Score": "1,250.00 USD"
+    }
+
+
+def test_non_numeric_value_does_not_stop_the_export(zoho_simulator):
+    zoho_simulator.set_records("Contacts", 3)
+    record_ids = [record.get("id") for record in zoho_simulator.records.get("Contacts")]
+    zoho_simulator.update_record("Contacts", record_ids[1], Annual_Revenue="Not disclosed")
+    rows = list(get_bulk_reader().get_next_row("Contacts", fields=["Annual_Revenue"]))
+    assert [row.get("Annual_Revenue") for row in rows] == [0.0, "Not disclosed", 2000.0]
@@ -0,0 +1,20 @@
+import pytest
+from conftest import load_plugin_module
+
+
+@pytest.fixture
+def connector_module():
+    pytest.importorskip("dataiku.connector")
+    return load_plugin_module("zoho_crm_connector", "python-connectors/zoho_crm/connector.py")
+
+
+def test_wide_module_rows_match_the_schema(zoho_simulator, zoho_config, connector_module):
+    zoho_simulator.add_custom_fields(70)
+    zoho_simulator.set_records("Contacts", 450)
+    connector = connector_module.ZohoCRMConnector(dict(zoho_config, table="Contacts", read_mode="rest"), {})
+    schema = connector.get_read_schema()
+    column_names = sorted(column.get("name") for column in schema.get("columns"))
+    assert len(column_names) == 80
+    rows = list(connector.generate_rows(dataset_schema=schema))
+    assert len(rows) == 450
+    assert all(sorted(row.keys()) == column_names for row in rows)
@@ -0,0 +1,32 @@
+from zoho_client import ZohoClient
+from zoho_crm_metadata import ZohoCRMMetadata
+from zoho_crm_field_groups import ZohoCRMFieldGroupReader, get_field_groups
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+def test_get_field_groups():
+    fields = ["Field_{}".format(index) for index in range(120)]
+    assert [len(field_groups) for field_groups in get_field_groups(fields)] == [50, 50, 20]
+    assert get_field_groups(["Last_Name"]) == [["Last_Name"]]
+    assert get_field_groups(None) == [None]
+
+
+def test_rows_of_a_wide_module_have_every_field_of_the_schema(zoho_simulator):
+    zoho_simulator.add_custom_fields(70)
+    zoho_simulator.set_records("Contacts", 450)
+    client = ZohoClient(access_token=ACCESS_TOKEN, endpoint="crm", rate_limit=NO_RATE_LIMIT)
+    metadata = ZohoCRMMetadata(client)
+    field_names = metadata.get_field_names("Contacts")
+    schema = metadata.get_schema("Contacts", field_names=field_names)
+    assert len(schema.get("columns")) == 80
+    field_groups = get_field_groups(field_names)
+    rows = list(ZohoCRMFieldGroupReader(client.client, "Contacts", field_groups[1:]).get_next_row(client.client.get_next_row(
+        "Contacts", data_path=["data"], params={"fields": ",".join(field_groups[0])}
+    )))
+    assert len(rows) == 450
+    column_names = [column.get("name") for column in schema.get("columns")]
+    assert all(sorted(row.keys()) == sorted(column_names) for row in rows)
+    assert rows[449].get("Custom_Field_70") == "Custom_Field_70 of {}".format(zoho_simulator.records.get("Contacts")[449].get("id"))
+    # Three pages, then one request per group of 50 fields for each 100 records
+    by_id_requests = [request for request in zoho_simulator.requests if "ids" in request[2]]
+    assert len(by_id_requests) == 5
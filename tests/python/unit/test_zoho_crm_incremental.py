@@ -0,0 +1,74 @@
+import pytest
+from zoho_client import ZohoClient
+from zoho_state_store import ZohoStateStore
+from zoho_crm_incremental import ZohoCRMIncrementalSync, DELETED_COLUMN, DELETED_TIME_COLUMN
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+ENDPOINT = {"endpoint": "Contacts", "data_path": ["data"], "params": {"fields": "Last_Name"}}
+
+
+def get_incremental_sync(state_store, state_key=None):
+    client = ZohoClient(access_token=ACCESS_TOKEN, endpoint="crm", rate_limit=NO_RATE_LIMIT)
+    return ZohoCRMIncrementalSync(client.client, state_store, "contacts", ENDPOINT, state_key=state_key)
+
+
+def test_only_changes_since_the_last_complete_read_are_returned(zoho_simulator, tmp_path):
+    zoho_simulator.set_records("Contacts", 300, modified_time="2024-05-01T10:00:00+00:00")
+    record_ids = [record.get("id") for record in zoho_simulator.records.get("Contacts")]
+    state_store = ZohoStateStore(str(tmp_path), "crm_sync")
+    first_sync = get_incremental_sync(state_store)
+    assert len(list(first_sync.get_next_row())) == 300
+    first_sync.commit()
+
+    zoho_simulator.update_record("Contacts", record_ids[10], Last_Name="Changed", Modified_Time="2024-05-02T15:30:00+05:30")
+    zoho_simulator.delete_record("Contacts", record_ids[20], "2024-05-02T11:00:00+00:00")
+    second_sync = get_incremental_sync(state_store)
+    assert list(second_sync.get_next_row()) == [
+        {"id": record_ids[10], "Last_Name": "Changed", "Modified_Time": "2024-05-02T15:30:00+05:30", DELETED_COLUMN: False},
+        {"id": record_ids[20], DELETED_COLUMN: True, DELETED_TIME_COLUMN: "2024-05-02T11:00:00+00:00"}
+    ]
+    contacts_requests = [request for request in zoho_simulator.requests if request[1].endswith("/Contacts")]
+    assert len(contacts_requests) == 3
+
+
+def test_uncommitted_read_is_read_again(zoho_simulator, tmp_path):
+    zoho_simulator.set_records("Contacts", 300, modified_time="2024-05-01T10:00:00+00:00")
+    state_store = ZohoStateStore(str(tmp_path), "crm_sync")
+    assert len(list(get_incremental_sync(state_store).get_next_row())) == 300
+    assert len(list(get_incremental_sync(state_store).get_next_row())) == 300
+
+
+def test_partial_read_does_not_move_the_mark(zoho_simulator, tmp_path):
+    zoho_simulator.set_records("Contacts", 300, modified_time="2024-05-01T10:00:00+00:00")
+    state_store = ZohoStateStore(str(tmp_path), "crm_sync")
+    incremental_sync = get_incremental_sync(state_store)
+    rows = incremental_sync.get_next_row()
+    for _ in range(250):
+        next(rows)
+    rows.close()
+    incremental_sync.commit()
+    assert state_store.load(incremental_sync.get_state_key()) is None
+
+
+def test_marks_are_kept_per_state_key(zoho_simulator, tmp_path):
+    zoho_simulator.set_records("Contacts", 300, modified_time="2024-05-01T10:00:00+00:00")
+    state_store = ZohoStateStore(str(tmp_path), "crm_sync")
+    incremental_sync = get_incremental_sync(state_store, state_key={"table": "contacts", "connection": "1"})
+    list(incremental_sync.get_next_row())
+    incremental_sync.commit()
+    assert len(list(get_incremental_sync(state_store, state_key={"table": "contacts", "connection": "2"}).get_next_row())) == 300
+
+
+def test_unexpected_deleted_records_answer_fails_the_read(zoho_simulator, tmp_path):
+    zoho_simulator.set_records("Contacts", 10, modified_time="2024-05-01T10:00:00+00:00")
+    state_store = ZohoStateStore(str(tmp_path), "crm_sync")
+    first_sync = get_incremental_sync(state_store)
+    list(first_sync.get_next_row())
+    first_sync.commit()
+    zoho_simulator.deleted_records["Contacts"].append({"code": "INTERNAL_ERROR", "deleted_time": "2024-05-02T10:00:00+00:00"})
+    second_sync = get_incremental_sync(state_store)
+    with pytest.raises(Exception, match="Unexpected answer"):
+        list(second_sync.get_next_row())
+    second_sync.commit()
+    assert state_store.load(second_sync.get_state_key()) == {"high_water_mark": "2024-05-01T10:00:00+00:00"}
@@ -0,0 +1,67 @@
+import datetime
+import zoho_crm_partitioning
+from zoho_client import ZohoClient
+from zoho_crm_partitioning import (
+    ZohoCRMCOQLReader, get_month_partition_ids, get_month_partition_criteria, get_next_row_in_parallel
+)
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+def set_records_over_four_months(zoho_simulator, number_of_records):
+    zoho_simulator.set_records("Contacts", number_of_records)
+    for index, record in enumerate(zoho_simulator.records.get("Contacts")):
+        record["Modified_Time"] = "2024-{:02d}-15T10:00:00+00:00".format(index % 4 + 1)
+    return [record.get("id") for record in zoho_simulator.records.get("Contacts")]
+
+
+def test_get_month_partition_ids():
+    assert get_month_partition_ids("2023-11-30T10:00:00+00:00", last_date=datetime.datetime(2024, 2, 1)) == [
+        "2023-11", "2023-12", "2024-01", "2024-02"
+    ]
+    assert get_month_partition_ids(None) == []
+
+
+def test_get_month_partition_ids_starts_at_the_utc_month():
+    # Org local time ahead of UTC, the oldest record was modified on the last day of the previous month in UTC
+    assert get_month_partition_ids("2024-01-01T02:00:00+05:30", last_date=datetime.datetime(2024, 1, 15)) == [
+        "2023-12", "2024-01"
+    ]
+    assert get_month_partition_ids("2024-01-31T22:00:00-05:00", last_date=datetime.datetime(2024, 2, 15)) == ["2024-02"]
+
+
+def test_get_month_partition_criteria():
+    assert get_month_partition_criteria("2023-12") == (
+        "(Modified_Time >= '2023-12-01T00:00:00+00:00' and Modified_Time < '2024-01-01T00:00:00+00:00')"
+    )
+
+
+def test_partitions_cover_every_record(zoho_simulator, monkeypatch):
+    # Small pages, so that each partition is read in several pages chained on the record id
+    monkeypatch.setattr(zoho_crm_partitioning, "COQL_PAGE_SIZE", 100)
+    record_ids = set_records_over_four_months(zoho_simulator, 1000)
+    reader = ZohoCRMCOQLReader(ZohoClient(access_token=ACCESS_TOKEN, endpoint="crm", rate_limit=NO_RATE_LIMIT))
+    oldest_modified_time = reader.get_oldest_modified_time("Contacts")
+    assert oldest_modified_time == "2024-01-15T10:00:00+00:00"
+    partition_ids = get_month_partition_ids(oldest_modified_time, last_date=datetime.datetime(2024, 4, 30))
+    assert partition_ids == ["2024-01", "2024-02", "2024-03", "2024-04"]
+    rows_by_partition = {
+        partition_id: list(reader.get_next_row("Contacts", ["Last_Name"], criteria=get_month_partition_criteria(partition_id)))
+        for partition_id in partition_ids
+    }
+    assert [len(rows) for rows in rows_by_partition.values()] == [250, 250, 250, 250]
+    assert sorted(row.get("id") for rows in rows_by_partition.values() for row in rows) == sorted(record_ids)
+
+
+def test_partitions_read_in_parallel(zoho_simulator, monkeypatch):
+    monkeypatch.setattr(zoho_crm_partitioning, "COQL_PAGE_SIZE", 100)
+    record_ids = set_records_over_four_months(zoho_simulator, 1000)
+    reader = ZohoCRMCOQLReader(ZohoClient(access_token=ACCESS_TOKEN, endpoint="crm", rate_limit=NO_RATE_LIMIT))
+
+    def get_row_generator_factory(partition_id):
+        criteria = get_month_partition_criteria(partition_id)
+        return lambda: reader.get_next_row("Contacts", ["Last_Name"], criteria=criteria)
+    rows = get_next_row_in_parallel(
+        [get_row_generator_factory(partition_id) for partition_id in ["2024-01", "2024-02", "2024-03", "2024-04"]],
+        max_workers=4
+    )
+    assert sorted(row.get("id") for row in rows) == sorted(record_ids)
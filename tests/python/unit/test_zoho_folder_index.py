@@ -0,0 +1,28 @@
+import pytest
+from zoho_folder_index import ZohoFolderIndex
+
+
+def get_next_child(names, error_after=None):
+    for index, name in enumerate(names):
+        if index == error_after:
+            raise Exception("Listing failed")
+        yield {"id": "id_{}".format(name), "attributes": {"display_html_name": name, "type": "file"}}
+
+
+def test_find_lists_only_until_the_name_is_found():
+    folder_index = ZohoFolderIndex(get_next_child(["a", "b", "c"]))
+    assert folder_index.find("b", can_be_file=True).get("id") == "id_b"
+    assert not folder_index.is_complete
+    assert folder_index.find("a", can_be_file=True).get("id") == "id_a"
+    assert folder_index.find("d", can_be_file=True) is None
+    assert folder_index.is_complete
+
+
+def test_failed_listing_is_not_complete():
+    folder_index = ZohoFolderIndex(get_next_child(["a", "b", "c"], error_after=2))
+    with pytest.raises(Exception, match="Listing failed"):
+        folder_index.find("c", can_be_file=True)
+    assert not folder_index.is_complete
+    assert folder_index.find("a", can_be_file=True).get("id") == "id_a"
+    with pytest.raises(Exception, match="cannot be looked up"):
+        folder_index.find("c", can_be_file=True)
@@ -0,0 +1,39 @@
+from zoho_client import ZohoClient
+from zoho_workdrive_enumerator import ZohoWorkDriveEnumerator
+from zoho_simulator import ROOT_FOLDER_ID
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+def get_enumerator():
+    return ZohoWorkDriveEnumerator(ZohoClient(access_token=ACCESS_TOKEN, endpoint="workdrive", rate_limit=NO_RATE_LIMIT))
+
+
+def get_listing_requests(zoho_simulator):
+    return [request for request in zoho_simulator.requests if request[1].endswith("/files") and request[0] == "GET"]
+
+
+def test_first_non_empty_stops_at_the_first_non_empty_file(zoho_simulator):
+    for index in range(60):
+        zoho_simulator.add_file(ROOT_FOLDER_ID, "empty_{}.csv".format(index))
+    empty_folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "empty")
+    for index in range(60):
+        zoho_simulator.add_file(empty_folder.get("id"), "empty_{}.csv".format(index))
+    data_folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "data")
+    zoho_simulator.add_file(data_folder.get("id"), "data.csv", b"a,b\n1,2\n")
+    for index in range(100):
+        zoho_simulator.add_file(data_folder.get("id"), "more_{}.csv".format(index), b"a,b\n")
+    other_folder = zoho_simulator.add_folder(ROOT_FOLDER_ID, "other")
+    zoho_simulator.build_tree(depth=2, parent_id=other_folder.get("id"))
+    files = list(get_enumerator().get_next_file(zoho_simulator.items.get(ROOT_FOLDER_ID), first_non_empty=True))
+    assert len(files) == 121
+    assert files[-1][0] == "/data"
+    assert files[-1][1].get("attributes").get("display_html_name") == "data.csv"
+    # Pages of 50 items: two for the root and the empty folder, only the first one of data, none below other
+    assert len(get_listing_requests(zoho_simulator)) == 5
+
+
+def test_full_enumeration_lists_every_folder(zoho_simulator):
+    zoho_simulator.build_tree(depth=2, folders_per_folder=3, files_per_folder=10)
+    files = list(get_enumerator().get_next_file(zoho_simulator.items.get(ROOT_FOLDER_ID)))
+    assert len(files) == 130
+    assert len(get_listing_requests(zoho_simulator)) == 13
@@ -0,0 +1,89 @@
+import threading
+from zoho_client import ZohoClient
+from zoho_workdrive_snapshot import get_workdrive_snapshot, merge_changes
+from zoho_simulator import CURRENT_USER_ID
+from conftest import ACCESS_TOKEN, NO_RATE_LIMIT
+
+
+ACCOUNT_ID = "account"
+
+
+def get_paths(files):
+    return [{"path": path, "size": size, "lastModified": 1000} for path, size in files.items()]
+
+
+def get_snapshot(tmp_path, account_id=ACCOUNT_ID):
+    return get_workdrive_snapshot("me", "/data", account_id=account_id, state_directory=str(tmp_path))
+
+
+def get_change_lists(changes):
+    return changes.get("added"), changes.get("changed"), changes.get("removed")
+
+
+def test_changes_accumulate_until_cleared(tmp_path):
+    snapshot = get_snapshot(tmp_path)
+    assert snapshot.get_changes() is None
+    snapshot.update(get_paths({"/a.csv": 1, "/b.csv": 2}))
+    snapshot.clear_changes(snapshot.get_changes().get("enumerated_at"))
+    snapshot.update(get_paths({"/a.csv": 1, "/b.csv": 3, "/c.csv": 4}))
+    # Enumerating again without any change keeps the changes found before
+    snapshot.update(get_paths({"/a.csv": 1, "/b.csv": 3, "/c.csv": 4}))
+    changes = snapshot.get_changes()
+    assert get_change_lists(changes) == (["/c.csv"], ["/b.csv"], [])
+    snapshot.clear_changes(changes.get("enumerated_at"))
+    snapshot.update(get_paths({"/b.csv": 3, "/c.csv": 4}))
+    assert get_change_lists(get_snapshot(tmp_path).get_changes()) == ([], [], ["/a.csv"])
+
+
+def test_changes_found_while_processing_are_kept(tmp_path):
+    snapshot = get_snapshot(tmp_path)
+    snapshot.update(get_paths({"/a.csv": 1}))
+    changes = snapshot.get_changes()
+    assert get_change_lists(changes) == (["/a.csv"], [], [])
+    # The recipe processing the changes enumerates the folder again
+    snapshot.update(get_paths({"/a.csv": 1, "/b.csv": 2}))
+    snapshot.clear_changes(changes.get("enumerated_at"))
+    changes = snapshot.get_changes()
+    assert get_change_lists(changes) == (["/b.csv"], [], [])
+    snapshot.clear_changes(changes.get("enumerated_at"))
+    assert snapshot.get_changes() is None
+
+
+def test_concurrent_updates_keep_every_change(tmp_path):
+    get_snapshot(tmp_path).update(get_paths({}))
+
+    def update(index):
+        # Each job sees the files of the previous ones plus its own
+        get_snapshot(tmp_path).update(get_paths({"/{}.csv".format(other): 1 for other in range(index + 1)}))
+    threads = [threading.Thread(target=update, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = get_snapshot(tmp_path)
+    # Starting from an empty folder, the files added are the ones of the last enumeration
+    last_files = snapshot.state_store.load(snapshot.get_snapshot_key()).get("files")
+    assert snapshot.get_changes().get("added") == sorted(last_files)
+    assert len(snapshot.load_enumerations()) == 9
+
+
+def test_snapshots_are_kept_per_account(tmp_path):
+    get_snapshot(tmp_path, account_id="first").update(get_paths({"/a.csv": 1}))
+    assert get_snapshot(tmp_path, account_id="second").get_changes() is None
+
+
+def test_account_is_the_user_of_the_credential(zoho_simulator, tmp_path, monkeypatch):
+    import zoho_workdrive_snapshot
+    monkeypatch.setattr(zoho_workdrive_snapshot, "get_secrets", lambda: [{"key": "zoho.zoho_oauth", "value": ACCESS_TOKEN}])
+    get_snapshot(tmp_path, account_id=CURRENT_USER_ID).update(get_paths({"/a.csv": 1}))
+    snapshot = get_workdrive_snapshot("me", "/data", state_directory=str(tmp_path))
+    assert get_change_lists(snapshot.get_changes()) == (["/a.csv"], [], [])
+    assert ZohoClient(access_token=ACCESS_TOKEN, rate_limit=NO_RATE_LIMIT).get_current_user_id() == CURRENT_USER_ID
+
+
+def test_merge_changes():
+    pending_changes = {"added": ["/a.csv"], "changed": ["/b.csv"], "removed": ["/c.csv"], "previous_enumerated_at": 1}
+    new_changes = {"added": ["/c.csv"], "changed": ["/a.csv"], "removed": ["/a.csv", "/b.csv"]}
+    assert merge_changes(pending_changes, new_changes) == {
+        "added": [], "changed": ["/c.csv"], "removed": ["/b.csv"], "previous_enumerated_at": 1
+    }
@@ -0,0 +1,625 @@
+import csv
+import datetime
+import io
+import json
+import re
+import threading
+import time
+import uuid
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+
+ROOT_FOLDER_ID = "root"
+MODIFIED_TIME_IN_MILLISECOND = 1700000000000
+DEFAULT_WORKDRIVE_PAGE_SIZE = 50
+DEFAULT_CRM_MAX_PAGE_SIZE = 200
+DEFAULT_UPLOAD_CHUNK_SIZE = 1048576
+DEFAULT_BULK_PAGE_SIZE = 200000
+MAX_CRM_FIELDS_PER_REQUEST = 50
+MAX_CRM_IDS_PER_REQUEST = 100
+CURRENT_USER_ID = "5725767000000400001"
+CRM_FIELDS = [
+    ("Last_Name", "text"), ("First_Name", "text"), ("Email", "email"), ("Phone", "phone"),
+    ("Description", "textarea"), ("Owner", "ownerlookup"), ("Annual_Revenue", "currency"),
+    ("Modified_Time", "datetime"), ("Created_Time", "datetime")
+]
+COQL_QUERY = re.compile(
+    r"^select (?P<fields>.+?) from (?P<module>\w+)(?: where (?P<criteria>.+?))?"
+    r"(?: order by (?P<order_by>\w+)(?: (?P<sort_order>asc|desc))?)?(?: limit (?P<limit>\d+))?$",
+    re.IGNORECASE
+)
+COQL_CONDITION = re.compile(r"(\w+)\s*(>=|<=|!=|>|<|=)\s*('[^']*'|[\w.:+-]+)|(\w+) is not null", re.IGNORECASE)
+COMPARISONS = {
+    ">=": lambda left, right: left >= right,
+    "<=": lambda left, right: left <= right,
+    "!=": lambda left, right: left != right,
+    ">": lambda left, right: left > right,
+    "<": lambda left, right: left < right,
+    "=": lambda left, right: left == right
+}
+
+
+class ZohoSimulator():
+    """
+    Local HTTP server answering like the WorkDrive and CRM APIs, from an in memory folder tree and record set.
+    Requests sent to the Zoho hosts are routed to it by the session returned by get_session,
+    the host becoming the first element of the path: http://127.0.0.1:port/www.zohoapis.com/crm/v7/Contacts
+    """
+    def __init__(self, latency=0, workdrive_page_size=DEFAULT_WORKDRIVE_PAGE_SIZE, crm_max_page_size=DEFAULT_CRM_MAX_PAGE_SIZE,
+                 upload_chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE, throttle_every=0, bulk_page_size=DEFAULT_BULK_PAGE_SIZE):
+        """
+        :param latency: seconds added to every answer
+        :param throttle_every: every throttle_every-th request is answered with a 429, 0 to never throttle
+        :param bulk_page_size: number of records exported by each bulk read job
+        """
+        self.latency = latency
+        self.workdrive_page_size = workdrive_page_size
+        self.crm_max_page_size = crm_max_page_size
+        self.upload_chunk_size = upload_chunk_size
+        self.throttle_every = throttle_every
+        self.bulk_page_size = bulk_page_size
+        self.bulk_job_polls = 1
+        self.lock = threading.Lock()
+        self.number_of_requests = 0
+        self.number_of_throttled_requests = 0
+        self.failures = []
+        self.rejected_tokens = set()
+        self.requests = []
+        self.items = {}
+        self.children = {}
+        self.contents = {}
+        self.upload_sessions = {}
+        self.records = {}
+        self.crm_fields = list(CRM_FIELDS)
+        self.deleted_records = {}
+        self.bulk_jobs = {}
+        self.reset_tree()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        simulator = self
+
+        class Handler(ZohoRequestHandler):
+            pass
+        Handler.simulator = simulator
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def reset_tree(self):
+        self.items = {ROOT_FOLDER_ID: build_item(ROOT_FOLDER_ID, "", "folder", None)}
+        self.children = {ROOT_FOLDER_ID: []}
+        self.contents = {}
+
+    def add_folder(self, parent_id, name):
+        return self.add_item(parent_id, name, "folder")
+
+    def add_file(self, parent_id, name, content=b""):
+        item = self.add_item(parent_id, name, "file", size=len(content))
+        self.contents[item.get("id")] = content
+        return item
+
+    def add_item(self, parent_id, name, item_type, size=0):
+        with self.lock:
+            item_id = uuid.uuid4().hex
+            item = build_item(item_id, name, item_type, parent_id, size)
+            self.items[item_id] = item
+            self.children.setdefault(parent_id, []).append(item)
+            touch(self.items.get(parent_id))
+            if item_type == "folder":
+                self.children[item_id] = []
+            return item
+
+    def build_tree(self, depth=2, folders_per_folder=3, files_per_folder=10, file_size=1024, parent_id=ROOT_FOLDER_ID):
+        """
+        Adds a balanced tree: each folder down to depth holds folders_per_folder folders and files_per_folder files
+        """
+        content = b"x" * file_size
+        for file_index in range(files_per_folder):
+            self.add_file(parent_id, "file_{}.csv".format(file_index), content)
+        if depth <= 0:
+            return
+        for folder_index in range(folders_per_folder):
+            folder = self.add_folder(parent_id, "folder_{}".format(folder_index))
+            self.build_tree(depth - 1, folders_per_folder, files_per_folder, file_size, folder.get("id"))
+
+    def set_records(self, module, number_of_records, modified_time=None):
+        self.records[module] = [build_record(index, modified_time) for index in range(number_of_records)]
+        self.deleted_records[module] = []
+        self.set_custom_field_values(self.records[module])
+
+    def add_custom_fields(self, number_of_fields):
+        """
+        Widens every module with text fields named Custom_Field_1, Custom_Field_2...
+        """
+        first_index = len(self.crm_fields) - len(CRM_FIELDS) + 1
+        self.crm_fields += [("Custom_Field_{}".format(index), "text") for index in range(first_index, first_index + number_of_fields)]
+        for records in self.records.values():
+            self.set_custom_field_values(records)
+
+    def set_custom_field_values(self, records):
+        for api_name, _ in self.crm_fields[len(CRM_FIELDS):]:
+            for record in records:
+                record[api_name] = "{} of {}".format(api_name, record.get("id"))
+
+    def update_record(self, module, record_id, **fields):
+        for record in self.records.get(module):
+            if record.get("id") == record_id:
+                record.update(fields)
+                return record
+        return None
+
+    def delete_record(self, module, record_id, deleted_time):
+        self.records[module] = [record for record in self.records.get(module) if record.get("id") != record_id]
+        self.deleted_records.setdefault(module, []).append({
+            "id": record_id,
+            "type": "recycle",
+            "deleted_time": deleted_time,
+            "deleted_by": {"name": "Owner", "id": CURRENT_USER_ID}
+        })
+
+    def add_failure(self, predicate, status_code=503, times=None):
+        """
+        Answers status_code to the requests for which predicate(method, path, params) is true,
+        times times or until the failures are cleared
+        """
+        self.failures.append({"predicate": predicate, "status_code": status_code, "times": times})
+
+    def clear_failures(self):
+        self.failures = []
+
+    def get_failure(self, method, path, params):
+        with self.lock:
+            for failure in self.failures:
+                if failure.get("times") == 0 or not failure.get("predicate")(method, path, params):
+                    continue
+                if failure.get("times"):
+                    failure["times"] -= 1
+                return failure.get("status_code")
+        return None
+
+    def should_throttle(self):
+        with self.lock:
+            self.number_of_requests += 1
+            if self.throttle_every and self.number_of_requests % self.throttle_every == 0:
+                self.number_of_throttled_requests += 1
+                return True
+            return False
+
+    def handle(self, method, host, path, params, headers, body):
+        """
+        Returns (status_code, headers, body) for the request
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests.append((method, host + path, dict(params)))
+        if self.should_throttle():
+            return 429, {"Retry-After": "0"}, get_json_body({"code": "TOO_MANY_REQUESTS"})
+        if get_token(headers) in self.rejected_tokens:
+            return 401, {}, get_json_body({"code": "INVALID_TOKEN", "message": "invalid oauth token"})
+        failure_status_code = self.get_failure(method, path, params)
+        if failure_status_code:
+            return failure_status_code, {"Retry-After": "0"}, get_json_body({"code": "SIMULATED_ERROR"})
+        path_tokens = [path_token for path_token in path.split("/") if path_token]
+        if host == "download.zoho.com":
+            return self.download(path_tokens[-1], headers)
+        if host == "upload.zoho.com":
+            return self.upload(headers, body)
+        if path_tokens[:3] == ["workdrive", "api", "v1"]:
+            return self.handle_workdrive(method, path_tokens[3:], params, body)
+        if path_tokens[:4] == ["crm", "bulk", "v7", "read"]:
+            return self.handle_bulk_read(method, path_tokens[4:], body)
+        if path_tokens[:2] == ["crm", "v7"]:
+            return self.handle_crm(method, path_tokens[2:], params, headers, body)
+        return 404, {}, get_json_body({"code": "NOT_FOUND"})
+
+    def handle_workdrive(self, method, path_tokens, params, body=None):
+        if method == "GET" and path_tokens == ["users", "me"]:
+            return 200, {}, get_json_body({"data": {"id": CURRENT_USER_ID, "type": "users", "attributes": {"display_name": "Owner"}}})
+        if method == "GET" and len(path_tokens) == 3 and path_tokens[0] == "files" and path_tokens[2] == "files":
+            children = self.children.get(path_tokens[1])
+            if children is None:
+                return 404, {}, get_json_body({"errors": [{"title": "Invalid resource id"}]})
+            limit = min(int(params.get("page[limit]", self.workdrive_page_size)), self.workdrive_page_size)
+            offset = int(params.get("page[offset]", 0))
+            return 200, {}, get_json_body({"data": children[offset:offset + limit]})
+        if method == "GET" and len(path_tokens) == 2 and path_tokens[0] == "files":
+            item = self.items.get(path_tokens[1])
+            if item is None:
+                return 404, {}, get_json_body({"errors": [{"title": "Invalid resource id"}]})
+            return 200, {}, get_json_body({"data": item})
+        if method == "PATCH" and path_tokens == ["files"]:
+            return self.update_items(json.loads(body or b"{}").get("data", []))
+        if method == "POST" and path_tokens == ["uploadsession", "create"]:
+            upload_id = uuid.uuid4().hex
+            self.upload_sessions[upload_id] = {
+                "file_name": params.get("file_name"),
+                "parent_id": params.get("parent_id"),
+                "size": int(params.get("size", 0)),
+                "chunks": {}
+            }
+            return 200, {}, get_json_body({"upload_id": upload_id, "chunk_size": self.upload_chunk_size})
+        if method == "POST" and path_tokens == ["uploadsession", "commit"]:
+            upload_session = self.upload_sessions.pop(params.get("upload-id"), None)
+            if upload_session is None:
+                return 400, {}, get_json_body({"errors": [{"title": "Unknown upload id"}]})
+            chunks = upload_session.get("chunks")
+            content = b"".join(chunks[offset] for offset in sorted(chunks))
+            if len(content) != upload_session.get("size"):
+                return 400, {}, get_json_body({"errors": [{"title": "Incomplete upload"}]})
+            item = self.add_file(upload_session.get("parent_id"), upload_session.get("file_name"), content)
+            return 200, {}, get_json_body({"data": [item]})
+        return 404, {}, get_json_body({"code": "NOT_FOUND"})
+
+    def update_items(self, updates):
+        updated_items = []
+        errors = []
+        with self.lock:
+            for update in updates:
+                item = self.items.get(update.get("id"))
+                if item is None:
+                    errors.append({"id": update.get("id"), "title": "Invalid resource id"})
+                    continue
+                attributes = item.get("attributes")
+                changes = update.get("attributes", {})
+                parent_id = attributes.get("parent_id")
+                if changes.get("status") == "51" or "parent_id" in changes:
+                    self.children[parent_id] = [child for child in self.children.get(parent_id, []) if child is not item]
+                    touch(self.items.get(parent_id))
+                if "name" in changes:
+                    attributes["name"] = attributes["display_html_name"] = changes.get("name")
+                    touch(self.items.get(parent_id))
+                if "parent_id" in changes and changes.get("status") != "51":
+                    attributes["parent_id"] = changes.get("parent_id")
+                    self.children.setdefault(changes.get("parent_id"), []).append(item)
+                    touch(self.items.get(changes.get("parent_id")))
+                updated_items.append(item)
+        document = {"data": updated_items}
+        if errors:
+            document["errors"] = errors
+        return 200, {}, get_json_body(document)
+
+    def download(self, item_id, headers):
+        content = self.contents.get(item_id)
+        if content is None:
+            return 404, {}, b""
+        range_header = headers.get("Range")
+        if not range_header:
+            return 200, {"Content-Type": "application/octet-stream"}, content
+        first_byte, last_byte = range_header.replace("bytes=", "").split("-")
+        first_byte = int(first_byte)
+        if first_byte >= len(content):
+            return 416, {}, b""
+        last_byte = min(int(last_byte), len(content) - 1) if last_byte else len(content) - 1
+        return 206, {"Content-Type": "application/octet-stream"}, content[first_byte:last_byte + 1]
+
+    def upload(self, headers, body):
+        upload_id = headers.get("upload-id")
+        if upload_id:
+            upload_session = self.upload_sessions.get(upload_id)
+            if upload_session is None:
+                return 400, {}, get_json_body({"errors": [{"title": "Unknown upload id"}]})
+            # Content-Range: bytes {first} - {end}/{size}
+            offset = int(headers.get("Content-Range").replace("bytes", "").split("-")[0])
+            with self.lock:
+                upload_session.get("chunks")[offset] = body
+            return 200, {}, get_json_body({"data": {"offset": offset}})
+        item = self.add_file(headers.get("x-parent_id"), headers.get("x-filename"), body)
+        return 200, {}, get_json_body({"data": [{"attributes": {"resource_id": item.get("id")}}]})
+
+    def handle_crm(self, method, path_tokens, params, headers, body=None):
+        if path_tokens == ["users"] and params.get("type") == "CurrentUser":
+            return 200, {}, get_json_body({"users": [{"id": CURRENT_USER_ID, "full_name": "Owner"}]})
+        if method == "POST" and path_tokens == ["coql"]:
+            return self.query(json.loads(body or b"{}").get("select_query", ""))
+        if path_tokens == ["settings", "modules"]:
+            return 200, {}, get_json_body({"modules": [
+                {"api_name": module, "plural_label": module, "api_supported": True} for module in self.records
+            ]})
+        if path_tokens == ["settings", "fields"]:
+            fields = [{"api_name": "id", "data_type": "bigint"}]
+            fields += [{"api_name": api_name, "data_type": data_type} for api_name, data_type in self.crm_fields]
+            return 200, {}, get_json_body({"fields": fields})
+        records = self.records.get(path_tokens[0])
+        if records is None:
+            return 400, {}, get_json_body({"code": "INVALID_MODULE"})
+        if path_tokens[1:] == ["actions", "count"]:
+            return 200, {}, get_json_body({"count": len(records)})
+        modified_since = headers.get("If-Modified-Since")
+        if path_tokens[1:] == ["deleted"]:
+            deleted_records = self.deleted_records.get(path_tokens[0], [])
+            if modified_since:
+                deleted_records = [
+                    record for record in deleted_records
+                    if parse_datetime(record.get("deleted_time")) > parse_datetime(modified_since)
+                ]
+            return self.get_page(deleted_records, params)
+        if len(path_tokens) > 1:
+            return 404, {}, get_json_body({"code": "NOT_FOUND"})
+        if len((params.get("fields") or "").split(",")) > MAX_CRM_FIELDS_PER_REQUEST:
+            return 400, {}, get_json_body({"code": "LIMIT_EXCEEDED", "details": {"by": "fields"}})
+        if params.get("ids"):
+            record_ids = params.get("ids").split(",")
+            if len(record_ids) > MAX_CRM_IDS_PER_REQUEST:
+                return 400, {}, get_json_body({"code": "LIMIT_EXCEEDED", "details": {"by": "ids"}})
+            records = [record for record in records if record.get("id") in record_ids]
+        if modified_since:
+            records = [
+                record for record in records
+                if parse_datetime(record.get("Modified_Time")) > parse_datetime(modified_since)
+            ]
+            if not records:
+                return 304, {}, b""
+        return self.get_page(records, params, params.get("fields"))
+
+    def get_page(self, records, params, fields=None):
+        per_page = min(int(params.get("per_page", self.crm_max_page_size)), self.crm_max_page_size)
+        if params.get("page_token"):
+            offset = int(params.get("page_token").replace("token-", ""))
+        else:
+            offset = (int(params.get("page", 1)) - 1) * per_page
+        page_records = records[offset:offset + per_page]
+        if not page_records:
+            return 204, {}, b""
+        if fields:
+            field_names = ["id"] + fields.split(",")
+            page_records = [{key: record.get(key) for key in field_names} for record in page_records]
+        more_records = offset + per_page < len(records)
+        return 200, {}, get_json_body({
+            "data": page_records,
+            "info": {
+                "per_page": per_page,
+                "count": len(page_records),
+                "page": offset // per_page + 1,
+                "more_records": more_records,
+                "next_page_token": "token-{}".format(offset + per_page) if more_records else None,
+                "sort_by": "id",
+                "sort_order": "desc"
+            }
+        })
+
+    def query(self, select_query):
+        match = COQL_QUERY.match(select_query.strip())
+        if not match or match.group("module") not in self.records:
+            return 400, {}, get_json_body({"code": "SYNTAX_ERROR", "message": select_query})
+        records = [record for record in self.records.get(match.group("module")) if is_matching_criteria(record, match.group("criteria"))]
+        order_by = match.group("order_by")
+        if order_by:
+            records.sort(key=lambda record: get_comparable(record.get(order_by)), reverse=(match.group("sort_order") or "").lower() == "desc")
+        limit = int(match.group("limit") or 200)
+        if not records:
+            return 204, {}, b""
+        field_names = [field.strip() for field in match.group("fields").split(",")]
+        return 200, {}, get_json_body({
+            "data": [{field_name: record.get(field_name) for field_name in field_names} for record in records[:limit]],
+            "info": {"count": min(limit, len(records)), "more_records": len(records) > limit}
+        })
+
+    def handle_bulk_read(self, method, path_tokens, body):
+        if method == "POST" and not path_tokens:
+            query = json.loads(body or b"{}").get("query", {})
+            job_id = uuid.uuid4().hex
+            self.bulk_jobs[job_id] = {
+                "module": query.get("module", {}).get("api_name"),
+                "fields": query.get("fields"),
+                "page": query.get("page", 1),
+                "polls_left": self.bulk_job_polls
+            }
+            return 201, {}, get_json_body({"data": [{"status": "success", "details": {"id": job_id, "state": "ADDED"}}]})
+        bulk_job = self.bulk_jobs.get(path_tokens[0]) if path_tokens else None
+        if bulk_job is None:
+            return 404, {}, get_json_body({"code": "INVALID_DATA"})
+        records = self.records.get(bulk_job.get("module"), [])
+        offset = (bulk_job.get("page") - 1) * self.bulk_page_size
+        page_records = records[offset:offset + self.bulk_page_size]
+        if path_tokens[1:] == ["result"]:
+            fields = bulk_job.get("fields") or [api_name for api_name, _ in self.crm_fields]
+            return 200, {"Content-Type": "application/zip"}, get_bulk_result(path_tokens[0], page_records, fields)
+        if bulk_job.get("polls_left"):
+            bulk_job["polls_left"] -= 1
+            return 200, {}, get_json_body({"data": [{"id": path_tokens[0], "state": "IN PROGRESS"}]})
+        return 200, {}, get_json_body({"data": [{
+            "id": path_tokens[0],
+            "state": "COMPLETED",
+            "result": {
+                "page": bulk_job.get("page"),
+                "count": len(page_records),
+                "more_records": offset + self.bulk_page_size < len(records)
+            }
+        }]})
+
+
+class ZohoRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    simulator = None
+
+    def do_GET(self):
+        self.answer("GET")
+
+    def do_POST(self):
+        self.answer("POST")
+
+    def do_PATCH(self):
+        self.answer("PATCH")
+
+    def answer(self, method):
+        parsed_url = urlparse(self.path)
+        host, _, path = parsed_url.path.lstrip("/").partition("/")
+        params = {key: values[-1] for key, values in parse_qs(parsed_url.query).items()}
+        body = self.read_body()
+        status_code, headers, content = self.simulator.handle(method, host, "/" + path, params, self.headers, body)
+        self.send_response(status_code)
+        headers.setdefault("Content-Type", "application/json")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if content and method != "HEAD":
+            self.wfile.write(content)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                chunk_size = int(self.rfile.readline().strip(), 16)
+                if not chunk_size:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(chunk_size))
+                self.rfile.readline()
+        content_length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(content_length) if content_length else b""
+
+    def log_message(self, format, *args):
+        # Keeps the benchmark output readable
+        pass
+
+
+class SimulatorAdapter(HTTPAdapter):
+    """
+    Sends the requests for any host to the simulator, through a pool of kept alive connections
+    """
+    def __init__(self, simulator_url, **kwargs):
+        self.simulator_url = simulator_url
+        super(SimulatorAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if not request.url.startswith(self.simulator_url):
+            parsed_url = urlparse(request.url)
+            request.url = "{}/{}{}{}".format(
+                self.simulator_url,
+                parsed_url.netloc,
+                parsed_url.path,
+                "?" + parsed_url.query if parsed_url.query else ""
+            )
+        return super(SimulatorAdapter, self).send(request, **kwargs)
+
+
+def build_simulator_session(simulator_url, pool_size):
+    session = Session()
+    adapter = SimulatorAdapter(simulator_url, pool_connections=10, pool_maxsize=pool_size, pool_block=False)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_item(item_id, name, item_type, parent_id, size=0):
+    return {
+        "id": item_id,
+        "type": "files",
+        "attributes": {
+            "name": name,
+            "display_html_name": name,
+            "type": item_type,
+            "parent_id": parent_id,
+            "is_folder": item_type == "folder",
+            "modified_time_in_millisecond": MODIFIED_TIME_IN_MILLISECOND,
+            "storage_info": {"size_in_bytes": size}
+        }
+    }
+
+
+def touch(item):
+    # A folder's modified time changes with its content, as on WorkDrive
+    if item is None:
+        return
+    attributes = item.get("attributes")
+    attributes["modified_time_in_millisecond"] = attributes.get("modified_time_in_millisecond") + 1
+
+
+def build_record(index, modified_time=None):
+    return {
+        "id": "{}".format(5725767000000000000 + index),
+        "Last_Name": "Name {}".format(index),
+        "First_Name": "First name {}".format(index),
+        "Email": "contact.{}@example.com".format(index),
+        "Phone": "+1 555 {:07d}".format(index),
+        "Description": "Description of contact {} ".format(index) * 4,
+        "Owner": {"name": "Owner", "id": "5725767000000400001", "email": "owner@example.com"},
+        "Annual_Revenue": 1000.0 * index,
+        "Modified_Time": modified_time or "2024-05-02T10:11:12+05:30",
+        "Created_Time": "2023-01-01T09:00:00+05:30"
+    }
+
+
+def get_json_body(document):
+    return json.dumps(document).encode("utf-8")
+
+
+def get_token(headers):
+    authorization = headers.get("Authorization") or ""
+    return authorization.split(" ")[-1] if authorization else None
+
+
+def parse_datetime(value):
+    return datetime.datetime.fromisoformat(value)
+
+
+def get_comparable(value):
+    # Ids compare as numbers and date times as instants, whatever their offset
+    if value is None:
+        return None
+    value = "{}".format(value).strip("'")
+    if value.isdigit():
+        return int(value)
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        return value
+
+
+def is_matching_criteria(record, criteria):
+    # Enough of COQL for the queries of the connector: conditions joined by and
+    for match in COQL_CONDITION.finditer(criteria or ""):
+        field_name, operator, value, not_null_field_name = match.groups()
+        if not_null_field_name:
+            if record.get(not_null_field_name) is None:
+                return False
+            continue
+        record_value = get_comparable(record.get(field_name))
+        if record_value is None or not COMPARISONS.get(operator)(record_value, get_comparable(value)):
+            return False
+    return True
+
+
+def get_bulk_result(job_id, records, fields=None):
+    # As exported by the Bulk Read API: one CSV file in a zip, every value as text and lookups as their id
+    field_names = ["id"] + [field for field in (fields or [name for name, _ in CRM_FIELDS]) if field != "id"]
+    csv_file = io.StringIO()
+    writer = csv.writer(csv_file)
+    writer.writerow(field_names)
+    for record in records:
+        writer.writerow([get_bulk_value(record.get(field_name)) for field_name in field_names])
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("{}.csv".format(job_id), csv_file.getvalue())
+    return archive.getvalue()
+
+
+def get_bulk_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return value.get("id")
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value